@@ -9,6 +9,7 @@ from core.utils.util import get_local_ip, validate_mcp_endpoint
 from core.http_server import SimpleHttpServer
 from core.websocket_server import WebSocketServer
 from core.utils.util import check_ffmpeg_installed
+from core.utils.audio_assets import preload_audio_assets
 
 TAG = __name__
 logger = setup_logging()
@@ -54,6 +55,9 @@ async def main():
         auth_key = str(uuid.uuid4().hex)
     config["server"]["auth_key"] = auth_key
 
+    # 后台预编码静态提示音，不阻塞服务启动
+    preload_task = asyncio.create_task(asyncio.to_thread(preload_audio_assets, config))
+
     # 添加 stdin 监控任务
     stdin_task = asyncio.create_task(monitor_stdin())
 
@@ -32,6 +32,7 @@ from core.providers.tools.unified_tool_handler import UnifiedToolHandler
 from plugins_func.loadplugins import auto_import_modules
 from plugins_func.register import Action, ActionResponse
 from core.auth import AuthMiddleware, AuthenticationError
+from core.utils.audio_pacer import PlayoutTracker
 from config.config_loader import get_private_config_from_api
 from core.providers.tts.dto.dto import ContentType, TTSMessageDTO, SentenceType
 from config.logger import setup_logging, build_module_string, update_module_string
@@ -125,6 +126,8 @@ class ConnectionHandler:
 
         # tts相关变量
         self.sentence_id = None
+        # 网络状况和客户端播放进度估计，用于决定下发音频的提前量
+        self.playout = PlayoutTracker(self.config.get("audio_pacing"))
 
         # iot相关变量
         self.iot_descriptors = {}
@@ -144,7 +147,7 @@ class ConnectionHandler:
         self.timeout_seconds = (
             int(self.config.get("close_connection_no_voice_time", 120)) + 60
         )  # 在原来第一道关闭的基础上加60秒，进行二道关闭
-        self.timeout_task = None
+        self.timeout_timer = None
 
         # {"mcp":true} 表示启用MCP功能
         self.features = None
@@ -188,8 +191,11 @@ class ConnectionHandler:
             # 初始化活动时间戳
             self.last_activity_time = time.time() * 1000
 
-            # 启动超时检查任务
-            self.timeout_task = asyncio.create_task(self._check_timeout())
+            # 在服务端的时间轮上设置超时定时器
+            if self.server is not None:
+                self.timeout_timer = self.server.timer_wheel.schedule(
+                    self.timeout_seconds, self._on_idle_timeout
+                )
 
             self.welcome_msg = self.config["xiaozhi"]
             self.welcome_msg["session_id"] = self.session_id
@@ -853,14 +859,10 @@ class ConnectionHandler:
     async def close(self, ws=None):
         """资源清理方法"""
         try:
-            # 取消超时任务
-            if self.timeout_task and not self.timeout_task.done():
-                self.timeout_task.cancel()
-                try:
-                    await self.timeout_task
-                except asyncio.CancelledError:
-                    pass
-                self.timeout_task = None
+            # 取消超时定时器
+            if self.timeout_timer:
+                self.timeout_timer.cancel()
+                self.timeout_timer = None
 
             # 清理工具处理器资源
             if hasattr(self, "func_handler") and self.func_handler:
@@ -939,6 +941,9 @@ class ConnectionHandler:
                 f"开始清理: TTS队列大小={self.tts.tts_text_queue.qsize()}, 音频队列大小={self.tts.tts_audio_queue.qsize()}"
             )
 
+            # 取消尚未开始的合成任务
+            self.tts.cancel_pending_synthesis()
+
             # 使用非阻塞方式清空队列
             for q in [
                 self.tts.tts_text_queue,
@@ -974,32 +979,22 @@ class ConnectionHandler:
         except Exception as e:
             self.logger.bind(tag=TAG).error(f"Chat and close error: {str(e)}")
 
-    async def _check_timeout(self):
-        """检查连接超时"""
+    def _on_idle_timeout(self):
+        """超时定时器到期，期间有过活动则按最后活动时间重新设置定时器，否则关闭连接"""
+        if self.stop_event.is_set() or self.timeout_timer is None:
+            return
+        # 活动时间戳在各处频繁更新，不在每次更新时重设定时器，到期时再检查
+        idle_seconds = time.time() - self.last_activity_time / 1000
+        if idle_seconds < self.timeout_seconds:
+            self.timeout_timer.reschedule(self.timeout_seconds - idle_seconds)
+            return
+        self.logger.bind(tag=TAG).info("连接超时，准备关闭")
+        # 设置停止事件，防止重复处理
+        self.stop_event.set()
+        return self._close_on_timeout()
+
+    async def _close_on_timeout(self):
         try:
-            while not self.stop_event.is_set():
-                # 检查是否超时（只有在时间戳已初始化的情况下）
-                if self.last_activity_time > 0.0:
-                    current_time = time.time() * 1000
-                    if (
-                        current_time - self.last_activity_time
-                        > self.timeout_seconds * 1000
-                    ):
-                        if not self.stop_event.is_set():
-                            self.logger.bind(tag=TAG).info("连接超时，准备关闭")
-                            # 设置停止事件，防止重复处理
-                            self.stop_event.set()
-                            # 使用 try-except 包装关闭操作，确保不会因为异常而阻塞
-                            try:
-                                await self.close(self.websocket)
-                            except Exception as close_error:
-                                self.logger.bind(tag=TAG).error(
-                                    f"超时关闭连接时出错: {close_error}"
-                                )
-                        break
-                # 每10秒检查一次，避免过于频繁
-                await asyncio.sleep(10)
-        except Exception as e:
-            self.logger.bind(tag=TAG).error(f"超时检查任务出错: {e}")
-        finally:
-            self.logger.bind(tag=TAG).info("超时检查任务已退出")
+            await self.close(self.websocket)
+        except Exception as close_error:
+            self.logger.bind(tag=TAG).error(f"超时关闭连接时出错: {close_error}")
@@ -3,15 +3,19 @@ import json
 import random
 import asyncio
 from core.utils.dialogue import Message
-from core.utils.util import audio_to_data
+from core.utils.audio_assets import get_audio_asset
 from core.handle.sendAudioHandle import sendAudioMessage, send_stt_message
-from core.utils.util import remove_punctuation_and_length, opus_datas_to_wav_bytes
+from core.utils.util import remove_punctuation_and_length
 from core.providers.tts.dto.dto import ContentType, SentenceType
 from core.providers.tools.device_mcp import (
     MCPClient,
     send_mcp_initialize_message,
     send_mcp_tools_list_request,
 )
+from core.providers.tools.device_mcp.mcp_tools_cache import (
+    get_firmware_fingerprint,
+    load_cached_tools,
+)
 from core.utils.wakeup_word import WakeupWordsConfig
 
 TAG = __name__
@@ -43,6 +47,12 @@ async def handleHelloMessage(conn, msg_json):
         if features.get("mcp"):
             conn.logger.bind(tag=TAG).info("客户端支持MCP")
             conn.mcp_client = MCPClient()
+            # 固件标识一致时直接使用缓存的工具列表，随后的tools/list在后台重新校验
+            conn.mcp_fingerprint = get_firmware_fingerprint(conn, msg_json)
+            if load_cached_tools(conn, conn.mcp_client, conn.mcp_fingerprint):
+                await conn.mcp_client.set_ready(True)
+                if conn.func_handler:
+                    conn.func_handler.tool_manager.refresh_tools()
             # 发送初始化
             asyncio.create_task(send_mcp_initialize_message(conn))
             # 发送mcp消息，获取tools列表
@@ -71,19 +81,21 @@ async def checkWakeupWords(conn, text):
     if not voice:
         voice = "default"
 
-    # 获取唤醒词回复配置
-    response = wakeup_words_config.get_wakeup_response(voice)
-    if not response or not response.get("file_path"):
+    # 获取唤醒词回复配置和音频，均来自内存
+    wakeup_audio = wakeup_words_config.get_wakeup_audio(voice)
+    if wakeup_audio:
+        response, opus_packets = wakeup_audio
+    else:
         response = {
             "voice": "default",
             "file_path": "config/assets/wakeup_words.wav",
             "time": 0,
             "text": "哈啰啊，我是小智啦，声音好听的台湾女孩一枚，超开心认识你耶，最近在忙啥，别忘了给我来点有趣的料哦，我超爱听八卦的啦",
         }
+        opus_packets, _ = get_audio_asset(response.get("file_path"))
 
     # 播放唤醒词回复
     conn.client_abort = False
-    opus_packets, _ = audio_to_data(response.get("file_path"))
 
     conn.logger.bind(tag=TAG).info(f"播放唤醒词回复: {response.get('text')}")
     await sendAudioMessage(conn, SentenceType.FIRST, opus_packets, response.get("text"))
@@ -129,12 +141,9 @@ async def wakeupWordsResponse(conn):
         # 获取当前音色
         voice = getattr(conn.tts, "voice", "default")
 
-        wav_bytes = opus_datas_to_wav_bytes(tts_result, sample_rate=16000)
+        # 更新回复，立即生效，wav文件和配置在后台写入
         file_path = wakeup_words_config.generate_file_path(voice)
-        with open(file_path, "wb") as f:
-            f.write(wav_bytes)
-        # 更新配置
-        wakeup_words_config.update_wakeup_response(voice, file_path, result)
+        wakeup_words_config.update_wakeup_response(voice, file_path, result, tts_result)
     finally:
         # 确保在任何情况下都释放锁
         if _wakeup_response_lock.locked():
@@ -5,7 +5,7 @@ from core.handle.abortHandle import handleAbortMessage
 import time
 import asyncio
 from core.handle.sendAudioHandle import SentenceType
-from core.utils.util import audio_to_data
+from core.utils.audio_assets import get_audio_asset
 
 TAG = __name__
 
@@ -60,6 +60,7 @@ async def startToChat(conn, text):
         return
 
     # 意图未被处理，继续常规聊天流程
+    conn.playout.mark_turn_start(conn.websocket)
     await send_stt_message(conn, text)
     conn.executor.submit(conn.chat, text)
 
@@ -95,7 +96,7 @@ async def max_out_size(conn):
     text = "不好意思，我现在有点事情要忙，明天这个时候我们再聊，约好了哦！明天不见不散，拜拜！"
     await send_stt_message(conn, text)
     file_path = "config/assets/max_output_size.wav"
-    opus_packets, _ = audio_to_data(file_path)
+    opus_packets, _ = get_audio_asset(file_path)
     conn.tts.tts_audio_queue.put((SentenceType.LAST, opus_packets, text))
     conn.close_after_chat = True
 
@@ -114,7 +115,7 @@ async def check_bind_device(conn):
 
         # 播放提示音
         music_path = "config/assets/bind_code.wav"
-        opus_packets, _ = audio_to_data(music_path)
+        opus_packets, _ = get_audio_asset(music_path)
         conn.tts.tts_audio_queue.put((SentenceType.FIRST, opus_packets, text))
 
         # 逐个播放数字
@@ -122,7 +123,7 @@ async def check_bind_device(conn):
             try:
                 digit = conn.bind_code[i]
                 num_path = f"config/assets/bind_code/{digit}.wav"
-                num_packets, _ = audio_to_data(num_path)
+                num_packets, _ = get_audio_asset(num_path)
                 conn.tts.tts_audio_queue.put((SentenceType.MIDDLE, num_packets, None))
             except Exception as e:
                 conn.logger.bind(tag=TAG).error(f"播放数字音频失败: {e}")
@@ -132,5 +133,5 @@ async def check_bind_device(conn):
         text = f"没有找到该设备的版本信息，请正确配置 OTA地址，然后重新编译固件。"
         await send_stt_message(conn, text)
         music_path = "config/assets/bind_not_found.wav"
-        opus_packets, _ = audio_to_data(music_path)
+        opus_packets, _ = get_audio_asset(music_path)
         conn.tts.tts_audio_queue.put((SentenceType.LAST, opus_packets, text))
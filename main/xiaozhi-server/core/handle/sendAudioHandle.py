@@ -1,36 +1,13 @@
 import json
-import asyncio
-import time
 from core.providers.tts.dto.dto import SentenceType
 from core.utils.util import get_string_no_punctuation_or_emoji, analyze_emotion
+from core.utils.emotion import emoji_map
+from core.utils.audio_assets import get_audio_asset
+from core.utils.audio_pacer import get_audio_pacer
 from loguru import logger
 
 TAG = __name__
 
-emoji_map = {
-    "neutral": "😶",
-    "happy": "🙂",
-    "laughing": "😆",
-    "funny": "😂",
-    "sad": "😔",
-    "angry": "😠",
-    "crying": "😭",
-    "loving": "😍",
-    "embarrassed": "😳",
-    "surprised": "😲",
-    "shocked": "😱",
-    "thinking": "🤔",
-    "winking": "😉",
-    "cool": "😎",
-    "relaxed": "😌",
-    "delicious": "🤤",
-    "kissy": "😘",
-    "confident": "😏",
-    "sleepy": "😴",
-    "silly": "😜",
-    "confused": "🙄",
-}
-
 
 async def sendAudioMessage(conn, sentenceType, audios, text):
     # 发送句子开始消息
@@ -62,6 +39,7 @@ async def sendAudioMessage(conn, sentenceType, audios, text):
 
     # 发送结束消息（如果是最后一个文本）
     if conn.llm_finish_task and sentenceType == SentenceType.LAST:
+        conn.logger.bind(tag=TAG).debug(f"播放统计: {conn.playout.get_stats()}")
         await send_tts_message(conn, "stop", None)
         conn.client_is_speaking = False
         if conn.close_after_chat:
@@ -72,39 +50,13 @@ async def sendAudioMessage(conn, sentenceType, audios, text):
 async def sendAudio(conn, audios, pre_buffer=True):
     if audios is None or len(audios) == 0:
         return
-    # 流控参数优化
-    frame_duration = 60  # 帧时长（毫秒），匹配 Opus 编码
-    start_time = time.perf_counter()
-    play_position = 0
-    last_reset_time = time.perf_counter()  # 记录最后的重置时间
-
-    # 仅当第一句话时执行预缓冲
-    if pre_buffer:
-        pre_buffer_frames = min(3, len(audios))
-        for i in range(pre_buffer_frames):
-            await conn.websocket.send(audios[i])
-        remaining_audios = audios[pre_buffer_frames:]
-    else:
-        remaining_audios = audios
-
-    # 播放剩余音频帧
-    for opus_packet in remaining_audios:
-        if conn.client_abort:
-            break
-
-        # 重置没有声音的状态
-        conn.last_activity_time = time.time() * 1000
-
-        # 计算预期发送时间
-        expected_time = start_time + (play_position / 1000)
-        current_time = time.perf_counter()
-        delay = expected_time - current_time
-        if delay > 0:
-            await asyncio.sleep(delay)
-
-        await conn.websocket.send(opus_packet)
-
-        play_position += frame_duration
+    # 第一句按网络状况预缓冲，之后每句只补足客户端缓冲区的差额，其余帧由全局节拍器按帧时长发送
+    conn.playout.sample_websocket(conn.websocket)
+    lead_frames, buffered = conn.playout.plan(pre_buffer)
+    stream = await get_audio_pacer(conn.config).play(
+        conn, audios, lead_frames, buffered
+    )
+    conn.playout.finish(stream)
 
 
 async def send_tts_message(conn, state, text=None):
@@ -121,7 +73,7 @@ async def send_tts_message(conn, state, text=None):
             stop_tts_notify_voice = conn.config.get(
                 "stop_tts_notify_voice", "config/assets/tts_notify.mp3"
             )
-            audios, _ = conn.tts.audio_to_opus_data(stop_tts_notify_voice)
+            audios, _ = get_audio_asset(stop_tts_notify_voice)
             await sendAudio(conn, audios)
         # 清除服务端讲话状态
         conn.clearSpeakStatus()
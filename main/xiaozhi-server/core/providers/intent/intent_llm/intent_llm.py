@@ -172,7 +172,7 @@ class IntentProvider(IntentProviderBase):
 
             self.promot = self.get_intent_system_prompt(functions)
 
-        music_config = initialize_music_handler(conn)
+        music_config = await initialize_music_handler(conn)
         music_file_names = music_config["music_file_names"]
         prompt_music = f"{self.promot}\n<musicNames>{music_file_names}\n</musicNames>"
 
@@ -44,3 +44,15 @@ class IotDescriptor:
                             "type": v["type"],
                         }
                 self.methods.append(method)
+
+        # 按小写名称建立属性和方法索引，查询和控制时无需遍历
+        self.property_index = {item["name"].lower(): item for item in self.properties}
+        self.method_index = {item["name"].lower(): item for item in self.methods}
+
+    def get_property(self, name):
+        """按名称（不区分大小写）获取属性"""
+        return self.property_index.get(name.lower())
+
+    def get_method(self, name):
+        """按名称（不区分大小写）获取方法"""
+        return self.method_index.get(name.lower())
@@ -1,8 +1,7 @@
 """设备端IoT工具执行器"""
 
 import json
-import asyncio
-from typing import Dict, Any
+from typing import Dict, Any, Tuple
 from ..base import ToolType, ToolDefinition, ToolExecutor
 from plugins_func.register import Action, ActionResponse
 
@@ -13,6 +12,8 @@ class DeviceIoTExecutor(ToolExecutor):
     def __init__(self, conn):
         self.conn = conn
         self.iot_tools: Dict[str, ToolDefinition] = {}
+        # 工具名称 -> (操作类型, 设备名称, 属性名/方法名)，注册时构建，调用时O(1)查找
+        self.tool_index: Dict[str, Tuple[str, str, str]] = {}
 
     async def execute(
         self, conn, tool_name: str, arguments: Dict[str, Any]
@@ -24,113 +25,89 @@ class DeviceIoTExecutor(ToolExecutor):
             )
 
         try:
-            # 解析工具名称，获取设备名和操作类型
-            if tool_name.startswith("get_"):
-                # 查询操作：get_devicename_property
-                parts = tool_name.split("_", 2)
-                if len(parts) >= 3:
-                    device_name = parts[1]
-                    property_name = parts[2]
-
-                    value = await self._get_iot_status(device_name, property_name)
-                    if value is not None:
-                        # 处理响应模板
-                        response_success = arguments.get(
-                            "response_success", "查询成功：{value}"
-                        )
-                        response = response_success.replace("{value}", str(value))
-
-                        return ActionResponse(
-                            action=Action.RESPONSE,
-                            response=response,
-                        )
-                    else:
-                        response_failure = arguments.get(
-                            "response_failure", f"无法获取{device_name}的状态"
-                        )
-                        return ActionResponse(
-                            action=Action.ERROR, response=response_failure
-                        )
-            else:
-                # 控制操作：devicename_method
-                parts = tool_name.split("_", 1)
-                if len(parts) >= 2:
-                    device_name = parts[0]
-                    method_name = parts[1]
-
-                    # 提取控制参数（排除响应参数）
-                    control_params = {
-                        k: v
-                        for k, v in arguments.items()
-                        if k not in ["response_success", "response_failure"]
-                    }
-
-                    # 发送IoT控制命令
-                    await self._send_iot_command(
-                        device_name, method_name, control_params
+            operation, device_name, member_name = self.tool_index[tool_name]
+            if operation == "get":
+                # 查询操作
+                value = self._get_iot_status(device_name, member_name)
+                if value is not None:
+                    # 处理响应模板
+                    response_success = arguments.get(
+                        "response_success", "查询成功：{value}"
                     )
-
-                    # 等待状态更新
-                    await asyncio.sleep(0.1)
-
-                    response_success = arguments.get("response_success", "操作成功")
-
-                    # 处理响应中的占位符
-                    for param_name, param_value in control_params.items():
-                        placeholder = "{" + param_name + "}"
-                        if placeholder in response_success:
-                            response_success = response_success.replace(
-                                placeholder, str(param_value)
-                            )
-                        if "{value}" in response_success:
-                            response_success = response_success.replace(
-                                "{value}", str(param_value)
-                            )
-                            break
+                    response = response_success.replace("{value}", str(value))
 
                     return ActionResponse(
-                        action=Action.REQLLM,
-                        result=response_success,
+                        action=Action.RESPONSE,
+                        response=response,
                     )
+                else:
+                    response_failure = arguments.get(
+                        "response_failure", f"无法获取{device_name}的状态"
+                    )
+                    return ActionResponse(action=Action.ERROR, response=response_failure)
+            else:
+                # 控制操作
+                # 提取控制参数（排除响应参数）
+                control_params = {
+                    k: v
+                    for k, v in arguments.items()
+                    if k not in ["response_success", "response_failure"]
+                }
+
+                # 发送IoT控制命令
+                await self._send_iot_command(device_name, member_name, control_params)
+
+                response_success = arguments.get("response_success", "操作成功")
+
+                # 处理响应中的占位符
+                for param_name, param_value in control_params.items():
+                    placeholder = "{" + param_name + "}"
+                    if placeholder in response_success:
+                        response_success = response_success.replace(
+                            placeholder, str(param_value)
+                        )
+                    if "{value}" in response_success:
+                        response_success = response_success.replace(
+                            "{value}", str(param_value)
+                        )
+                        break
 
-            return ActionResponse(action=Action.ERROR, response="无法解析IoT工具名称")
+                return ActionResponse(
+                    action=Action.REQLLM,
+                    result=response_success,
+                )
 
         except Exception as e:
             response_failure = arguments.get("response_failure", "操作失败")
             return ActionResponse(action=Action.ERROR, response=response_failure)
 
-    async def _get_iot_status(self, device_name: str, property_name: str):
+    def _get_iot_status(self, device_name: str, property_name: str):
         """获取IoT设备状态"""
-        for key, value in self.conn.iot_descriptors.items():
-            if key.lower() == device_name.lower():
-                for property_item in value.properties:
-                    if property_item["name"].lower() == property_name.lower():
-                        return property_item["value"]
-        return None
+        descriptor = self.conn.iot_descriptors.get(device_name)
+        if descriptor is None:
+            return None
+        property_item = descriptor.get_property(property_name)
+        return property_item["value"] if property_item else None
 
     async def _send_iot_command(
         self, device_name: str, method_name: str, parameters: Dict[str, Any]
     ):
         """发送IoT控制命令"""
-        for key, value in self.conn.iot_descriptors.items():
-            if key.lower() == device_name.lower():
-                for method in value.methods:
-                    if method["name"].lower() == method_name.lower():
-                        command = {
-                            "name": key,
-                            "method": method["name"],
-                        }
+        descriptor = self.conn.iot_descriptors.get(device_name)
+        method = descriptor.get_method(method_name) if descriptor else None
+        if method is None:
+            raise Exception(f"未找到设备{device_name}的方法{method_name}")
 
-                        if parameters:
-                            command["parameters"] = parameters
+        command = {
+            "name": device_name,
+            "method": method["name"],
+        }
 
-                        send_message = json.dumps(
-                            {"type": "iot", "commands": [command]}
-                        )
-                        await self.conn.websocket.send(send_message)
-                        return
+        if parameters:
+            command["parameters"] = parameters
 
-        raise Exception(f"未找到设备{device_name}的方法{method_name}")
+        send_message = json.dumps({"type": "iot", "commands": [command]})
+        await self.conn.websocket.send(send_message)
 
     def register_iot_tools(self, descriptors: list):
         """注册IoT工具"""
@@ -170,6 +147,7 @@ class DeviceIoTExecutor(ToolExecutor):
                         description=tool_desc,
                         tool_type=ToolType.DEVICE_IOT,
                     )
+                    self.tool_index[tool_name] = ("get", device_name, prop_name)
 
             # 注册控制工具
             if "methods" in descriptor:
@@ -228,10 +206,11 @@ class DeviceIoTExecutor(ToolExecutor):
                         description=tool_desc,
                         tool_type=ToolType.DEVICE_IOT,
                     )
+                    self.tool_index[tool_name] = ("call", device_name, method_name)
 
     def get_tools(self) -> Dict[str, ToolDefinition]:
         """获取所有设备端IoT工具"""
-        return self.iot_tools.copy()
+        return self.iot_tools
 
     def has_tool(self, tool_name: str) -> bool:
         """检查是否有指定的设备端IoT工具"""
@@ -64,20 +64,17 @@ async def handleIotDescriptors(conn, descriptors):
 async def handleIotStatus(conn, states):
     """处理物联网状态"""
     for state in states:
-        for key, value in conn.iot_descriptors.items():
-            if key == state["name"]:
-                for property_item in value.properties:
-                    for k, v in state["state"].items():
-                        if property_item["name"] == k:
-                            if type(v) != type(property_item["value"]):
-                                logger.bind(tag=TAG).error(
-                                    f"属性{property_item['name']}的值类型不匹配"
-                                )
-                                break
-                            else:
-                                property_item["value"] = v
-                                logger.bind(tag=TAG).info(
-                                    f"物联网状态更新: {key} , {property_item['name']} = {v}"
-                                )
-                            break
-                break
+        descriptor = conn.iot_descriptors.get(state["name"])
+        if descriptor is None:
+            continue
+        for k, v in state["state"].items():
+            property_item = descriptor.get_property(k)
+            if property_item is None or property_item["name"] != k:
+                continue
+            if type(v) != type(property_item["value"]):
+                logger.bind(tag=TAG).error(f"属性{property_item['name']}的值类型不匹配")
+            else:
+                property_item["value"] = v
+                logger.bind(tag=TAG).info(
+                    f"物联网状态更新: {state['name']} , {property_item['name']} = {v}"
+                )
@@ -1,6 +1,8 @@
 """设备端MCP客户端定义"""
 
+import json
 import asyncio
+import hashlib
 from concurrent.futures import Future
 from core.utils.util import sanitize_tool_name
 from config.logger import setup_logging
@@ -20,6 +22,10 @@ class MCPClient:
         self.next_id = 1
         self.lock = asyncio.Lock()
         self._cached_available_tools = None  # Cache for get_available_tools
+        # tools/list分页过程中暂存的工具，全部获取后再整体替换
+        self.pending_tools = {}
+        self.pending_name_mapping = {}
+        self.tools_hash = None
 
     def has_tool(self, name: str) -> bool:
         return name in self.tools
@@ -63,6 +69,46 @@ class MCPClient:
                 None  # Invalidate the cache when a tool is added
             )
 
+    async def add_pending_tool(self, tool_data: dict):
+        async with self.lock:
+            sanitized_name = sanitize_tool_name(tool_data["name"])
+            self.pending_tools[sanitized_name] = tool_data
+            self.pending_name_mapping[sanitized_name] = tool_data["name"]
+
+    async def commit_pending_tools(self) -> bool:
+        """用分页获取到的完整工具列表替换当前工具列表
+
+        Returns:
+            bool: 工具列表是否发生变化
+        """
+        async with self.lock:
+            tools, name_mapping = self.pending_tools, self.pending_name_mapping
+            self.pending_tools, self.pending_name_mapping = {}, {}
+
+            # 替换所有工具描述中的工具名称
+            for tool_data in tools.values():
+                if "description" in tool_data:
+                    description = tool_data["description"]
+                    for sanitized_name, original_name in name_mapping.items():
+                        description = description.replace(original_name, sanitized_name)
+                    tool_data["description"] = description
+
+            tools_hash = compute_tools_hash(tools)
+            changed = tools_hash != self.tools_hash
+            if changed:
+                self.tools = tools
+                self.name_mapping = name_mapping
+                self.tools_hash = tools_hash
+                self._cached_available_tools = None
+            return changed
+
+    def load_tools(self, tools: dict, name_mapping: dict, tools_hash: str):
+        """直接加载工具列表（用于从缓存恢复）"""
+        self.tools = tools
+        self.name_mapping = name_mapping
+        self.tools_hash = tools_hash
+        self._cached_available_tools = None
+
     async def get_next_id(self) -> int:
         async with self.lock:
             current_id = self.next_id
@@ -91,3 +137,9 @@ class MCPClient:
         async with self.lock:
             if id in self.call_results:
                 self.call_results.pop(id)
+
+
+def compute_tools_hash(tools: dict) -> str:
+    """计算工具列表的哈希值，用于判断设备工具是否变化"""
+    raw = json.dumps(tools, ensure_ascii=False, sort_keys=True)
+    return hashlib.md5(raw.encode("utf-8")).hexdigest()
@@ -0,0 +1,77 @@
+"""设备端MCP工具列表缓存
+
+设备重连时，如果固件标识与缓存一致，直接使用缓存的工具列表，MCP客户端立即可用；
+同时照常发送 initialize 和 tools/list 在后台重新校验，工具列表变化时再替换并更新缓存。
+"""
+
+import json
+import hashlib
+from config.logger import setup_logging
+from core.utils.ttl_cache import TTLCache
+from .mcp_client import MCPClient
+
+TAG = __name__
+logger = setup_logging()
+
+# device-id -> {fingerprint, tools_hash, tools, name_mapping}
+_tools_cache = TTLCache(
+    "device_mcp_tools", ttl=7 * 24 * 3600, maxsize=10000, persist=True
+)
+
+
+def get_firmware_fingerprint(conn, hello_msg: dict) -> str:
+    """根据连接头和hello消息生成固件标识，固件升级后标识随之变化"""
+    headers = conn.headers or {}
+    raw = json.dumps(
+        [
+            headers.get("user-agent", ""),
+            headers.get("protocol-version", ""),
+            hello_msg.get("version"),
+            hello_msg.get("features"),
+        ],
+        ensure_ascii=False,
+        sort_keys=True,
+    )
+    return hashlib.md5(raw.encode("utf-8")).hexdigest()
+
+
+def load_cached_tools(conn, mcp_client: MCPClient, fingerprint: str) -> bool:
+    """尝试从缓存加载设备工具列表
+
+    Returns:
+        bool: 是否命中缓存
+    """
+    if not conn.device_id:
+        return False
+    status, entry = _tools_cache.get(conn.device_id)
+    if status == "miss" or not entry or entry.get("fingerprint") != fingerprint:
+        return False
+    mcp_client.load_tools(entry["tools"], entry["name_mapping"], entry["tools_hash"])
+    logger.bind(tag=TAG).info(
+        f"设备 {conn.device_id} 使用缓存的MCP工具列表，工具数量: {len(entry['tools'])}"
+    )
+    return True
+
+
+def save_tools(conn, mcp_client: MCPClient, changed: bool = True):
+    """保存设备工具列表到缓存
+
+    每次保存都会把整个缓存写入磁盘，工具列表没有变化时只在缓存项剩余有效期不足一半时保存，
+    以延长经常连接的设备的有效期。
+    """
+    fingerprint = getattr(conn, "mcp_fingerprint", None)
+    if not conn.device_id or not fingerprint:
+        return
+    if not changed:
+        remaining = _tools_cache.remaining_ttl(conn.device_id)
+        if remaining is not None and remaining > _tools_cache.ttl / 2:
+            return
+    _tools_cache.set(
+        conn.device_id,
+        {
+            "fingerprint": fingerprint,
+            "tools_hash": mcp_client.tools_hash,
+            "tools": mcp_client.tools,
+            "name_mapping": mcp_client.name_mapping,
+        },
+    )
@@ -1,5 +1,11 @@
 """服务端插件工具模块"""
 
 from .plugin_executor import ServerPluginExecutor
+from .plugin_runner import PluginRunner, PluginTimeoutError, get_plugin_runner
 
-__all__ = ["ServerPluginExecutor"]
+__all__ = [
+    "ServerPluginExecutor",
+    "PluginRunner",
+    "PluginTimeoutError",
+    "get_plugin_runner",
+]
@@ -1,16 +1,67 @@
 """服务端插件工具执行器"""
 
-from typing import Dict, Any
+from typing import Dict, Any, List
 from ..base import ToolType, ToolDefinition, ToolExecutor
-from plugins_func.register import all_function_registry, Action, ActionResponse
+from plugins_func.register import (
+    all_function_registry,
+    get_registry_version,
+    Action,
+    ActionResponse,
+)
+from .plugin_runner import get_plugin_runner, PluginTimeoutError
+
+# 必要的函数，所有连接都会加载
+NECESSARY_FUNCTIONS = ["handle_exit_intent", "get_time", "get_lunar"]
+
+# 全局插件工具定义缓存，所有连接共享，注册表变化时重建
+_tool_definitions: Dict[str, ToolDefinition] = {}
+_tool_definitions_version = -1
+
+
+def get_plugin_tool_definitions() -> Dict[str, ToolDefinition]:
+    """获取全局注册表中所有插件的工具定义"""
+    global _tool_definitions, _tool_definitions_version
+    version = get_registry_version()
+    if _tool_definitions_version != version:
+        _tool_definitions = {
+            name: ToolDefinition(
+                name=name,
+                description=func_item.description,
+                tool_type=ToolType.SERVER_PLUGIN,
+            )
+            for name, func_item in all_function_registry.items()
+        }
+        _tool_definitions_version = version
+    return _tool_definitions
 
 
 class ServerPluginExecutor(ToolExecutor):
-    """服务端插件工具执行器"""
+    """服务端插件工具执行器，按连接配置的Intent.functions过滤全局注册表"""
 
     def __init__(self, conn):
         self.conn = conn
         self.config = conn.config
+        self.runner = get_plugin_runner(conn.config)
+        self.enabled_functions = self._get_enabled_functions()
+        self._tools: Dict[str, ToolDefinition] = {}
+        self._tools_version = -1
+
+    def _get_enabled_functions(self) -> List[str]:
+        """获取当前连接启用的插件函数名称"""
+        # 获取配置中的函数
+        config_functions = self.config["Intent"][
+            self.config["selected_module"]["Intent"]
+        ].get("functions", [])
+
+        # 转换为列表
+        if not isinstance(config_functions, list):
+            try:
+                config_functions = list(config_functions)
+            except TypeError:
+                config_functions = []
+
+        # 合并所有需要的函数
+        return list(dict.fromkeys(NECESSARY_FUNCTIONS + config_functions))
 
     async def execute(
         self, conn, tool_name: str, arguments: Dict[str, Any]
@@ -23,23 +74,28 @@ class ServerPluginExecutor(ToolExecutor):
             )
 
         try:
-            # 根据工具类型决定如何调用
+            # 根据工具类型决定如何调用，插件在独立的线程池中执行，不阻塞事件循环
             if hasattr(func_item, "type"):
                 func_type = func_item.type
                 if func_type.code in [4, 5]:  # SYSTEM_CTL, IOT_CTL (需要conn参数)
-                    result = func_item.func(conn, **arguments)
+                    result = await self.runner.run(func_item, conn, **arguments)
                 elif func_type.code == 2:  # WAIT
-                    result = func_item.func(**arguments)
+                    result = await self.runner.run(func_item, **arguments)
                 elif func_type.code == 3:  # CHANGE_SYS_PROMPT
-                    result = func_item.func(conn, **arguments)
+                    result = await self.runner.run(func_item, conn, **arguments)
                 else:
-                    result = func_item.func(**arguments)
+                    result = await self.runner.run(func_item, **arguments)
             else:
                 # 默认不传conn参数
-                result = func_item.func(**arguments)
+                result = await self.runner.run(func_item, **arguments)
 
             return result
 
+        except PluginTimeoutError:
+            return ActionResponse(
+                action=Action.ERROR,
+                response="请求超时了，请稍后再试",
+            )
         except Exception as e:
             return ActionResponse(
                 action=Action.ERROR,
@@ -47,38 +103,17 @@ class ServerPluginExecutor(ToolExecutor):
             )
 
     def get_tools(self) -> Dict[str, ToolDefinition]:
-        """获取所有注册的服务端插件工具"""
-        tools = {}
-
-        # 获取必要的函数
-        necessary_functions = ["handle_exit_intent", "get_time", "get_lunar"]
-
-        # 获取配置中的函数
-        config_functions = self.config["Intent"][
-            self.config["selected_module"]["Intent"]
-        ].get("functions", [])
-        
-        # 转换为列表
-        if not isinstance(config_functions, list):
-            try:
-                config_functions = list(config_functions)
-            except TypeError:
-                config_functions = []
-
-        # 合并所有需要的函数
-        all_required_functions = list(set(necessary_functions + config_functions))
-
-        for func_name in all_required_functions:
-            func_item = all_function_registry.get(func_name)
-            if func_item:
-                tools[func_name] = ToolDefinition(
-                    name=func_name,
-                    description=func_item.description,
-                    tool_type=ToolType.SERVER_PLUGIN,
-                )
-
-        return tools
+        """获取当前连接启用的服务端插件工具"""
+        if self._tools_version != get_registry_version():
+            definitions = get_plugin_tool_definitions()
+            self._tools = {
+                name: definitions[name]
+                for name in self.enabled_functions
+                if name in definitions
+            }
+            self._tools_version = get_registry_version()
+        return self._tools
 
     def has_tool(self, tool_name: str) -> bool:
         """检查是否有指定的服务端插件工具"""
-        return tool_name in all_function_registry
+        return tool_name in self.get_tools()
@@ -0,0 +1,243 @@
+"""服务端插件运行器
+
+同步插件（如天气、新闻等使用requests和BeautifulSoup的插件）放到独立的有界线程池中执行，
+避免阻塞事件循环；异步插件直接在事件循环中await。
+每个插件都有独立的超时时间和并发上限，排队等待也计入超时时间，
+并统计排队等待时间和执行时间，定期和发生超时时输出到日志。
+"""
+
+import time
+import asyncio
+import threading
+from typing import Dict, Any, Optional
+from concurrent.futures import ThreadPoolExecutor
+from config.logger import setup_logging
+
+TAG = __name__
+
+DEFAULT_MAX_WORKERS = 8
+DEFAULT_TIMEOUT = 30
+DEFAULT_MAX_CONCURRENCY = 4
+METRICS_LOG_INTERVAL = 300  # 输出插件执行统计的间隔（秒）
+
+
+class PluginTimeoutError(Exception):
+    """插件执行超时"""
+
+    pass
+
+
+class PluginMetrics:
+    """单个插件的执行统计"""
+
+    def __init__(self):
+        self.calls = 0
+        self.errors = 0
+        self.timeouts = 0
+        self.running = 0
+        self.total_wait_ms = 0.0
+        self.max_wait_ms = 0.0
+        self.total_exec_ms = 0.0
+        self.max_exec_ms = 0.0
+
+    def record_wait(self, wait_ms: float):
+        self.total_wait_ms += wait_ms
+        self.max_wait_ms = max(self.max_wait_ms, wait_ms)
+
+    def record_exec(self, exec_ms: float):
+        self.total_exec_ms += exec_ms
+        self.max_exec_ms = max(self.max_exec_ms, exec_ms)
+
+    def to_dict(self) -> Dict[str, Any]:
+        calls = self.calls or 1
+        return {
+            "calls": self.calls,
+            "errors": self.errors,
+            "timeouts": self.timeouts,
+            "running": self.running,
+            "avg_wait_ms": round(self.total_wait_ms / calls, 2),
+            "max_wait_ms": round(self.max_wait_ms, 2),
+            "avg_exec_ms": round(self.total_exec_ms / calls, 2),
+            "max_exec_ms": round(self.max_exec_ms, 2),
+        }
+
+
+class PluginRunner:
+    """服务端插件运行器，所有连接共享"""
+
+    def __init__(
+        self,
+        max_workers: int = DEFAULT_MAX_WORKERS,
+        default_timeout: float = DEFAULT_TIMEOUT,
+        default_max_concurrency: int = DEFAULT_MAX_CONCURRENCY,
+    ):
+        self.logger = setup_logging()
+        self.max_workers = max_workers
+        self.default_timeout = default_timeout
+        self.default_max_concurrency = default_max_concurrency
+        self.executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="plugin"
+        )
+        self._semaphores: Dict[str, asyncio.Semaphore] = {}
+        self._metrics: Dict[str, PluginMetrics] = {}
+        self._lock = threading.Lock()
+        self._last_log_time = time.monotonic()
+
+    def _get_semaphore(self, name: str, max_concurrency: int) -> asyncio.Semaphore:
+        semaphore = self._semaphores.get(name)
+        if semaphore is None:
+            semaphore = asyncio.Semaphore(max_concurrency)
+            self._semaphores[name] = semaphore
+        return semaphore
+
+    def _get_metrics(self, name: str) -> PluginMetrics:
+        with self._lock:
+            metrics = self._metrics.get(name)
+            if metrics is None:
+                metrics = PluginMetrics()
+                self._metrics[name] = metrics
+            return metrics
+
+    def _on_start(self, metrics: PluginMetrics, submit_time: float) -> float:
+        start_time = time.perf_counter()
+        with self._lock:
+            metrics.record_wait((start_time - submit_time) * 1000)
+            metrics.running += 1
+        return start_time
+
+    def _on_finish(self, metrics: PluginMetrics, start_time: float):
+        with self._lock:
+            metrics.running -= 1
+            metrics.record_exec((time.perf_counter() - start_time) * 1000)
+
+    async def run(self, func_item, *args, **kwargs):
+        """执行插件函数
+
+        Args:
+            func_item: 插件注册项（FunctionItem）
+            *args, **kwargs: 传给插件函数的参数
+
+        Raises:
+            PluginTimeoutError: 插件执行超时
+        """
+        name = func_item.name
+        timeout = func_item.timeout or self.default_timeout
+        max_concurrency = func_item.max_concurrency or self.default_max_concurrency
+        metrics = self._get_metrics(name)
+        semaphore = self._get_semaphore(name, max_concurrency)
+
+        submit_time = time.perf_counter()
+        with self._lock:
+            metrics.calls += 1
+        self._maybe_log_metrics()
+        try:
+            # 超时的同步插件在线程结束前一直占用名额，排队等待也计入超时时间
+            await asyncio.wait_for(semaphore.acquire(), timeout=timeout)
+        except asyncio.TimeoutError:
+            with self._lock:
+                metrics.record_wait((time.perf_counter() - submit_time) * 1000)
+            raise self._on_timeout(name, metrics, f"排队等待超时({timeout}s)")
+        total_timeout = timeout
+        # 剩余的超时时间用于执行
+        timeout = max(0.0, timeout - (time.perf_counter() - submit_time))
+
+        if asyncio.iscoroutinefunction(func_item.func):
+            # 异步插件直接在事件循环中执行
+            start_time = self._on_start(metrics, submit_time)
+            try:
+                return await asyncio.wait_for(
+                    func_item.func(*args, **kwargs), timeout=timeout
+                )
+            except asyncio.TimeoutError:
+                raise self._on_timeout(name, metrics, f"执行超时({total_timeout}s)")
+            except Exception:
+                with self._lock:
+                    metrics.errors += 1
+                raise
+            finally:
+                self._on_finish(metrics, start_time)
+                semaphore.release()
+
+        # 同步插件放到线程池中执行
+        loop = asyncio.get_running_loop()
+
+        def call():
+            start_time = self._on_start(metrics, submit_time)
+            try:
+                return func_item.func(*args, **kwargs)
+            finally:
+                self._on_finish(metrics, start_time)
+
+        try:
+            future = self.executor.submit(call)
+        except Exception:
+            semaphore.release()
+            raise
+        # 线程无法被取消，超时后仍占用并发名额，直到线程真正结束
+        future.add_done_callback(
+            lambda _: loop.call_soon_threadsafe(semaphore.release)
+        )
+        try:
+            return await asyncio.wait_for(
+                asyncio.shield(asyncio.wrap_future(future)), timeout=timeout
+            )
+        except asyncio.TimeoutError:
+            raise self._on_timeout(name, metrics, f"执行超时({total_timeout}s)")
+        except Exception:
+            with self._lock:
+                metrics.errors += 1
+            raise
+
+    def _on_timeout(
+        self, name: str, metrics: PluginMetrics, reason: str
+    ) -> PluginTimeoutError:
+        with self._lock:
+            metrics.timeouts += 1
+            stats = metrics.to_dict()
+        self.logger.bind(tag=TAG).warning(
+            f"插件 {name} {reason}，当前线程池大小: {self.max_workers}，"
+            f"执行统计: {stats}"
+        )
+        return PluginTimeoutError(f"插件 {name} {reason}")
+
+    def _maybe_log_metrics(self):
+        now = time.monotonic()
+        if now - self._last_log_time < METRICS_LOG_INTERVAL:
+            return
+        self._last_log_time = now
+        self.logger.bind(tag=TAG).info(f"插件执行统计: {self.get_metrics()}")
+
+    def get_metrics(self) -> Dict[str, Dict[str, Any]]:
+        """获取所有插件的执行统计"""
+        with self._lock:
+            return {name: m.to_dict() for name, m in self._metrics.items()}
+
+    def shutdown(self):
+        self.executor.shutdown(wait=False)
+
+
+_plugin_runner: Optional[PluginRunner] = None
+_plugin_runner_lock = threading.Lock()
+
+
+def get_plugin_runner(config: Dict[str, Any] = None) -> PluginRunner:
+    """获取全局插件运行器，首次调用时按配置创建"""
+    global _plugin_runner
+    if _plugin_runner is None:
+        with _plugin_runner_lock:
+            if _plugin_runner is None:
+                runner_config = (config or {}).get("plugin_executor", {}) or {}
+                _plugin_runner = PluginRunner(
+                    max_workers=int(
+                        runner_config.get("max_workers", DEFAULT_MAX_WORKERS)
+                    ),
+                    default_timeout=float(
+                        runner_config.get("default_timeout", DEFAULT_TIMEOUT)
+                    ),
+                    default_max_concurrency=int(
+                        runner_config.get(
+                            "default_max_concurrency", DEFAULT_MAX_CONCURRENCY
+                        )
+                    ),
+                )
+    return _plugin_runner
@@ -1,9 +1,9 @@
 """统一工具处理器"""
 
 import json
+import time
 from typing import Dict, List, Any, Optional
 from config.logger import setup_logging
-from plugins_func.loadplugins import auto_import_modules
 
 from .base import ToolType
 from plugins_func.register import Action, ActionResponse
@@ -54,10 +54,13 @@ class UnifiedToolHandler:
         self.finish_init = False
 
     async def _initialize(self):
-        """异步初始化"""
+        """异步初始化
+
+        插件发现和全局函数注册表在进程启动时完成（见 core.connection），
+        这里只初始化与当前连接相关的部分。
+        """
         try:
-            # 自动导入插件模块
-            auto_import_modules("plugins_func.functions")
+            begin_time = time.perf_counter()
 
             # 初始化服务端MCP
             await self.server_mcp_executor.initialize()
@@ -69,7 +72,9 @@ class UnifiedToolHandler:
             self._initialize_home_assistant()
 
             self.finish_init = True
-            self.logger.info("统一工具处理器初始化完成")
+            self.logger.info(
+                f"统一工具处理器初始化完成，耗时: {(time.perf_counter() - begin_time) * 1000:.1f}ms"
+            )
 
             # 输出当前支持的所有工具列表
             self.current_support_functions()
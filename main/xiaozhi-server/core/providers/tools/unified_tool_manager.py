@@ -15,6 +15,8 @@ class ToolManager:
         self.executors: Dict[ToolType, ToolExecutor] = {}
         self._cached_tools: Optional[Dict[str, ToolDefinition]] = None
         self._cached_function_descriptions: Optional[List[Dict[str, Any]]] = None
+        # 工具名称 -> 执行器索引，工具集合变化（refresh_tools）时重建
+        self._tool_index: Optional[Dict[str, ToolExecutor]] = None
 
     def register_executor(self, tool_type: ToolType, executor: ToolExecutor):
         """注册工具执行器"""
@@ -26,6 +28,7 @@ class ToolManager:
         """使缓存失效"""
         self._cached_tools = None
         self._cached_function_descriptions = None
+        self._tool_index = None
 
     def get_all_tools(self) -> Dict[str, ToolDefinition]:
         """获取所有工具定义"""
@@ -33,6 +36,7 @@ class ToolManager:
             return self._cached_tools
 
         all_tools = {}
+        tool_index = {}
         for tool_type, executor in self.executors.items():
             try:
                 tools = executor.get_tools()
@@ -40,12 +44,20 @@ class ToolManager:
                     if name in all_tools:
                         self.logger.warning(f"工具名称冲突: {name}")
                     all_tools[name] = definition
+                    tool_index[name] = executor
             except Exception as e:
                 self.logger.error(f"获取{tool_type.value}工具时出错: {e}")
 
         self._cached_tools = all_tools
+        self._tool_index = tool_index
         return all_tools
 
+    def _get_tool_index(self) -> Dict[str, ToolExecutor]:
+        """获取工具名称到执行器的索引"""
+        if self._tool_index is None:
+            self.get_all_tools()
+        return self._tool_index
+
     def get_function_descriptions(self) -> List[Dict[str, Any]]:
         """获取所有工具的函数描述（OpenAI格式）"""
         if self._cached_function_descriptions is not None:
@@ -61,8 +73,7 @@ class ToolManager:
 
     def has_tool(self, tool_name: str) -> bool:
         """检查是否存在指定工具"""
-        tools = self.get_all_tools()
-        return tool_name in tools
+        return tool_name in self._get_tool_index()
 
     def get_tool_type(self, tool_name: str) -> Optional[ToolType]:
         """获取工具类型"""
@@ -75,22 +86,14 @@ class ToolManager:
     ) -> ActionResponse:
         """执行工具调用"""
         try:
-            # 查找工具类型
-            tool_type = self.get_tool_type(tool_name)
-            if not tool_type:
+            # 通过索引查找对应的执行器
+            executor = self._get_tool_index().get(tool_name)
+            if not executor:
                 return ActionResponse(
                     action=Action.NOTFOUND,
                     response=f"工具 {tool_name} 不存在",
                 )
 
-            # 获取对应的执行器
-            executor = self.executors.get(tool_type)
-            if not executor:
-                return ActionResponse(
-                    action=Action.ERROR,
-                    response=f"工具类型 {tool_type.value} 的执行器未注册",
-                )
-
             # 执行工具
             self.logger.info(f"执行工具: {tool_name}，参数: {arguments}")
             result = await executor.execute(self.conn, tool_name, arguments)
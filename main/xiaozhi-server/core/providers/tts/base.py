@@ -1,16 +1,25 @@
 import os
-import re
+import json
 import queue
 import uuid
+import time
+import hashlib
+import itertools
 import asyncio
 import threading
 from core.utils import p3
 from datetime import datetime
 from core.utils import textUtils
 from abc import ABC, abstractmethod
+from concurrent.futures import Future, ThreadPoolExecutor, CancelledError
 from config.logger import setup_logging
-from core.utils.util import audio_to_data, audio_bytes_to_data
+from core.utils.util import audio_to_data, audio_bytes_to_data, PcmFrameEncoder
+from core.utils.audio_decoder import ProgressiveDecoder, get_decoder_stats
 from core.utils.tts import MarkdownCleaner
+from core.utils.tts_audio_cache import get_tts_audio_cache
+from core.utils.audio_transcoder import get_transcoded_file
+from core.utils.text_segmenter import StreamingSegmenter, split_sentences
+from core.utils.thread_loop import run_in_thread_loop
 from core.utils.output_counter import add_device_output
 from core.handle.reportHandle import enqueue_tts_report
 from core.handle.sendAudioHandle import sendAudioMessage
@@ -27,6 +36,81 @@ TAG = __name__
 logger = setup_logging()
 
 
+class ProgressiveAudio:
+    """边合成边播放的音频流：合成线程写入音频帧，播放线程按批读取"""
+
+    def __init__(self):
+        self._cond = threading.Condition()
+        self._read = 0
+        self.packets = []
+        self.closed = False
+        self.cancelled = False
+        self.first_packet_time = None
+
+    @property
+    def packet_count(self):
+        return len(self.packets)
+
+    def put(self, packets):
+        if not packets:
+            return
+        with self._cond:
+            if self.closed:
+                return
+            if self.first_packet_time is None:
+                self.first_packet_time = time.perf_counter()
+            self.packets.extend(packets)
+            self._cond.notify_all()
+
+    def close(self):
+        """结束写入，返回全部音频帧"""
+        with self._cond:
+            self.closed = True
+            self._cond.notify_all()
+        return self.packets
+
+    def cancel(self):
+        self.cancelled = True
+        self.close()
+
+    def next_batch(self, timeout=None):
+        """返回新到达的音频帧；流已结束返回None，超时返回空列表"""
+        with self._cond:
+            if self._read >= len(self.packets) and not self.closed:
+                self._cond.wait(timeout)
+            if self._read < len(self.packets):
+                batch = self.packets[self._read :]
+                self._read = len(self.packets)
+                return batch
+            return None if self.closed else []
+
+
+class AudioFileStream:
+    """从p3文件按批读取的音频流，用于播放音乐等长音频，内存占用与音频长度无关"""
+
+    batch_size = 50  # 每批3秒
+
+    def __init__(self, file_path):
+        self.file_path = file_path
+        self._packets = p3.iter_opus_from_file(file_path)
+        self.packets = []  # 不保留已播放的帧，上报时不附带音频
+        self.cancelled = False
+
+    def next_batch(self, timeout=None):
+        """返回下一批音频帧，读完返回None"""
+        if self.cancelled:
+            return None
+        batch = list(itertools.islice(self._packets, self.batch_size))
+        if not batch:
+            self.cancel()
+            return None
+        return batch
+
+    def cancel(self):
+        self.cancelled = True
+        self._packets.close()
+
+
 class TTSProviderBase(ABC):
     def __init__(self, config, delete_audio_file):
         self.interface_type = InterfaceType.NON_STREAM
@@ -40,7 +124,6 @@ class TTSProviderBase(ABC):
         self.tts_audio_first_sentence = True
         self.before_stop_play_files = []
 
-        self.tts_text_buff = []
         self.punctuations = (
             "。",
             "？",
@@ -67,8 +150,32 @@ class TTSProviderBase(ABC):
             "：",
         )
         self.tts_stop_request = False
-        self.processed_chars = 0
-        self.is_first_sentence = True
+        self.segmenter = StreamingSegmenter(
+            self.punctuations, self.first_sentence_punctuations
+        )
+
+        # TTS音频缓存，提供者标识由实现类和配置共同决定
+        self.audio_cache = None
+        self.cache_provider_id = hashlib.md5(
+            json.dumps(
+                [type(self).__module__, config], sort_keys=True, default=str
+            ).encode("utf-8")
+        ).hexdigest()
+
+        # 流水线合成：最多同时合成pipeline_depth段文本，结果按提交顺序播放
+        self.pipeline_depth = 1
+        self.synthesis_executor = None
+        self.synthesis_slots = None
+        self.pending_syntheses = set()
+        self.synthesis_lock = threading.Lock()
+        self.synthesis_stats = {
+            "segments": 0,
+            "total_ms": 0.0,
+            "max_ms": 0.0,
+            "last_ms": 0.0,
+            "cache_hits": 0,
+            "stalls": 0,
+        }
 
     def generate_filename(self, extension=".wav"):
         return os.path.join(
@@ -83,7 +190,7 @@ class TTSProviderBase(ABC):
             # 需要删除文件的直接转为音频数据
             while max_repeat_time > 0:
                 try:
-                    audio_bytes = asyncio.run(self.text_to_speak(text, None))
+                    audio_bytes = run_in_thread_loop(self.text_to_speak(text, None))
                     if audio_bytes:
                         audio_datas, _ = audio_bytes_to_data(
                             audio_bytes, file_type=self.audio_file_type, is_opus=True
@@ -110,7 +217,7 @@ class TTSProviderBase(ABC):
             try:
                 while not os.path.exists(tmp_file) and max_repeat_time > 0:
                     try:
-                        asyncio.run(self.text_to_speak(text, tmp_file))
+                        run_in_thread_loop(self.text_to_speak(text, tmp_file))
                     except Exception as e:
                         logger.bind(tag=TAG).warning(
                             f"语音生成失败{5 - max_repeat_time + 1}次: {text}，错误: {e}"
@@ -138,6 +245,175 @@ class TTSProviderBase(ABC):
     async def text_to_speak(self, text, output_file):
         pass
 
+    # 渐进式合成：子类实现为异步生成器 async def text_to_speak_stream(self, text)，
+    # 边下载边产出 audio_file_type 格式的音频数据块，音频帧会在下载过程中就开始播放
+    text_to_speak_stream = None
+
+    def _get_cache_key(self, text, is_opus):
+        """可以使用TTS音频缓存时返回缓存键，只缓存opus数据"""
+        if not is_opus or self.audio_cache is None:
+            return None
+        if not self.audio_cache.is_cacheable(text):
+            return None
+        return self.audio_cache.make_key(
+            self.cache_provider_id, getattr(self, "voice", None), text
+        )
+
+    def _synthesize_segment(self, text):
+        """合成一段文本并转换为可发送的音频数据，opus输出优先使用TTS音频缓存"""
+        start_time = time.perf_counter()
+        cache_key = self._get_cache_key(
+            text, self.delete_audio_file or self.conn.audio_format != "pcm"
+        )
+        if cache_key:
+            audio_datas = self.audio_cache.get(cache_key)
+            if audio_datas:
+                logger.bind(tag=TAG).debug(f"TTS音频缓存命中: {text}")
+                self._record_synthesis(start_time, text, cached=True)
+                return audio_datas
+
+        if self.delete_audio_file:
+            audio_datas = self.to_tts(text)
+        else:
+            tts_file = self.to_tts(text)
+            if not tts_file or not os.path.exists(tts_file):
+                return None
+            audio_datas = self._process_audio_file(tts_file)
+
+        if cache_key and audio_datas:
+            self.audio_cache.put(cache_key, audio_datas)
+        self._record_synthesis(start_time, text)
+        return audio_datas
+
+    def _synthesize_progressive(self, text, audio_stream):
+        """边下载边解码编码，每凑满一帧就写入audio_stream供播放线程发送"""
+        start_time = time.perf_counter()
+        is_opus = self.conn.audio_format != "pcm"
+        try:
+            cache_key = self._get_cache_key(text, is_opus)
+            if cache_key:
+                audio_datas = self.audio_cache.get(cache_key)
+                if audio_datas:
+                    logger.bind(tag=TAG).debug(f"TTS音频缓存命中: {text}")
+                    audio_stream.put(audio_datas)
+                    self._record_synthesis(start_time, text, cached=True)
+                    return
+
+            clean_text = MarkdownCleaner.clean_markdown(text)
+            for attempt in range(1, 6):
+                try:
+                    run_in_thread_loop(
+                        self._stream_segment(clean_text, audio_stream, is_opus)
+                    )
+                    break
+                except Exception as e:
+                    logger.bind(tag=TAG).warning(
+                        f"语音生成失败{attempt}次: {text}，错误: {e}"
+                    )
+                    # 已经开始播放的句子无法重试
+                    if audio_stream.packet_count or audio_stream.closed:
+                        break
+
+            if audio_stream.first_packet_time:
+                first_ms = (audio_stream.first_packet_time - start_time) * 1000
+                logger.bind(tag=TAG).debug(
+                    f"TTS首帧耗时: {first_ms:.0f}ms, 文本: {text}"
+                )
+            audio_datas = audio_stream.close()
+            if cache_key and audio_datas and not audio_stream.cancelled:
+                self.audio_cache.put(cache_key, audio_datas)
+            self._record_synthesis(start_time, text)
+        finally:
+            audio_stream.close()
+
+    async def _stream_segment(self, text, audio_stream, is_opus):
+        decoder = ProgressiveDecoder(self.audio_file_type)
+        encoder = PcmFrameEncoder(is_opus)
+        try:
+            async for chunk in self.text_to_speak_stream(text):
+                if audio_stream.closed:
+                    return
+                audio_stream.put(encoder.push(decoder.feed(chunk)))
+            audio_stream.put(encoder.push(decoder.finish()))
+            audio_stream.put(encoder.flush())
+        finally:
+            encoder.close()
+
+    def _record_synthesis(self, start_time, text, cached=False):
+        """记录单段文本的合成耗时"""
+        elapsed_ms = (time.perf_counter() - start_time) * 1000
+        with self.synthesis_lock:
+            stats = self.synthesis_stats
+            stats["segments"] += 1
+            stats["total_ms"] += elapsed_ms
+            stats["last_ms"] = elapsed_ms
+            stats["max_ms"] = max(stats["max_ms"], elapsed_ms)
+            if cached:
+                stats["cache_hits"] += 1
+        logger.bind(tag=TAG).debug(f"TTS合成耗时: {elapsed_ms:.0f}ms, 文本: {text}")
+
+    def get_synthesis_stats(self):
+        """获取合成耗时统计"""
+        with self.synthesis_lock:
+            stats = dict(self.synthesis_stats)
+            stats["pending"] = len(self.pending_syntheses)
+        stats["avg_ms"] = (
+            round(stats["total_ms"] / stats["segments"], 1)
+            if stats["segments"]
+            else 0.0
+        )
+        return stats
+
+    def _submit_segment(self, sentence_type, segment_text):
+        """提交一段文本进行合成，结果以Future的形式按顺序放入播放队列"""
+        # 同时合成的段数达到上限时等待，期间响应打断
+        while not self.synthesis_slots.acquire(timeout=0.1):
+            if self.conn.client_abort or self.conn.stop_event.is_set():
+                return
+        # 提供者支持渐进式合成时，放入播放队列的是音频流而不是Future
+        audio_stream = None
+        if self.text_to_speak_stream is not None and self.delete_audio_file:
+            audio_stream = ProgressiveAudio()
+        try:
+            if audio_stream is not None:
+                future = self.synthesis_executor.submit(
+                    self._synthesize_progressive, segment_text, audio_stream
+                )
+            else:
+                future = self.synthesis_executor.submit(
+                    self._synthesize_segment, segment_text
+                )
+        except RuntimeError:
+            # 线程池已关闭
+            self.synthesis_slots.release()
+            return
+        future.audio_stream = audio_stream
+        with self.synthesis_lock:
+            self.pending_syntheses.add(future)
+        future.add_done_callback(self._on_synthesis_done)
+        self.tts_audio_queue.put(
+            (
+                sentence_type,
+                audio_stream if audio_stream is not None else future,
+                segment_text,
+            )
+        )
+
+    def _on_synthesis_done(self, future):
+        with self.synthesis_lock:
+            self.pending_syntheses.discard(future)
+        self.synthesis_slots.release()
+
+    def cancel_pending_synthesis(self):
+        """取消尚未开始的合成任务，打断时调用"""
+        with self.synthesis_lock:
+            pending = list(self.pending_syntheses)
+        for future in pending:
+            future.cancel()
+            # 正在进行的渐进式合成通过关闭音频流来停止
+            if future.audio_stream is not None:
+                future.audio_stream.cancel()
+
     def audio_to_pcm_data(self, audio_file_path):
         """音频文件转换为PCM编码"""
         return audio_to_data(audio_file_path, is_opus=False)
@@ -169,8 +445,7 @@ class TTSProviderBase(ABC):
             )
         )
         # 对于单句的文本，进行分段处理
-        segments = re.split(r"([。！？!?；;\n])", content_detail)
-        for seg in segments:
+        for seg in split_sentences(content_detail):
             self.tts_text_queue.put(
                 TTSMessageDTO(
                     sentence_id=sentence_id,
@@ -191,6 +466,20 @@ class TTSProviderBase(ABC):
     async def open_audio_channels(self, conn):
         self.conn = conn
         self.tts_timeout = conn.config.get("tts_timeout", 10)
+        self.audio_cache = get_tts_audio_cache(conn.config)
+        segment_config = conn.config.get("tts_segment", {}) or {}
+        self.segmenter = StreamingSegmenter(
+            self.punctuations,
+            self.first_sentence_punctuations,
+            first_segment=segment_config.get("first_segment", "comma"),
+            first_min_length=int(segment_config.get("first_min_length", 0)),
+            max_length=int(segment_config.get("max_length", 120)),
+        )
+        self.pipeline_depth = max(1, int(conn.config.get("tts_pipeline_depth", 3)))
+        self.synthesis_slots = threading.Semaphore(self.pipeline_depth)
+        self.synthesis_executor = ThreadPoolExecutor(
+            max_workers=self.pipeline_depth, thread_name_prefix="tts_synthesis"
+        )
         # tts 消化线程
         self.tts_priority_thread = threading.Thread(
             target=self.tts_text_priority_thread, daemon=True
@@ -215,27 +504,11 @@ class TTSProviderBase(ABC):
                 if message.sentence_type == SentenceType.FIRST:
                     # 初始化参数
                     self.tts_stop_request = False
-                    self.processed_chars = 0
-                    self.tts_text_buff = []
-                    self.is_first_sentence = True
+                    self.segmenter.reset()
                     self.tts_audio_first_sentence = True
                 elif ContentType.TEXT == message.content_type:
-                    self.tts_text_buff.append(message.content_detail)
-                    segment_text = self._get_segment_text()
-                    if segment_text:
-                        if self.delete_audio_file:
-                            audio_datas = self.to_tts(segment_text)
-                            if audio_datas:
-                                self.tts_audio_queue.put(
-                                    (message.sentence_type, audio_datas, segment_text)
-                                )
-                        else:
-                            tts_file = self.to_tts(segment_text)
-                            if tts_file:
-                                audio_datas = self._process_audio_file(tts_file)
-                                self.tts_audio_queue.put(
-                                    (message.sentence_type, audio_datas, segment_text)
-                                )
+                    for segment_text in self._get_segment_texts(message.content_detail):
+                        self._submit_segment(message.sentence_type, segment_text)
                 elif ContentType.FILE == message.content_type:
                     self._process_remaining_text()
                     tts_file = message.content_file
@@ -250,6 +523,14 @@ class TTSProviderBase(ABC):
                     self.tts_audio_queue.put(
                         (message.sentence_type, [], message.content_detail)
                     )
+                    logger.bind(tag=TAG).debug(
+                        f"TTS合成统计: {self.get_synthesis_stats()}"
+                    )
+                    logger.bind(tag=TAG).debug(f"音频解码统计: {get_decoder_stats()}")
+                    if self.audio_cache is not None:
+                        logger.bind(tag=TAG).debug(
+                            f"TTS音频缓存统计: {self.audio_cache.get_stats()}"
+                        )
 
             except queue.Empty:
                 continue
@@ -258,8 +539,11 @@ class TTSProviderBase(ABC):
                     f"处理TTS文本失败: {str(e)}, 类型: {type(e).__name__}, 堆栈: {traceback.format_exc()}"
                 )
                 continue
+        # 连接结束，释放合成线程池
+        self.synthesis_executor.shutdown(wait=False, cancel_futures=True)
 
     def _audio_play_priority_thread(self):
+        playing = False
         while not self.conn.stop_event.is_set():
             text = None
             try:
@@ -271,11 +555,37 @@ class TTSProviderBase(ABC):
                     if self.conn.stop_event.is_set():
                         break
                     continue
+                if sentence_type == SentenceType.LAST:
+                    playing = False
+                if isinstance(audio_datas, AudioFileStream):
+                    if self._play_progressive(sentence_type, audio_datas, text):
+                        playing = True
+                    continue
+                if isinstance(audio_datas, ProgressiveAudio):
+                    if playing and not audio_datas.packet_count:
+                        with self.synthesis_lock:
+                            self.synthesis_stats["stalls"] += 1
+                    if self._play_progressive(sentence_type, audio_datas, text):
+                        playing = True
+                    continue
+                if isinstance(audio_datas, Future):
+                    if playing and not audio_datas.done():
+                        # 上一段已播完而这一段还没合成好，此处会出现停顿
+                        with self.synthesis_lock:
+                            self.synthesis_stats["stalls"] += 1
+                    try:
+                        audio_datas = audio_datas.result()
+                    except CancelledError:
+                        continue
+                    if not audio_datas or self.conn.client_abort:
+                        continue
                 future = asyncio.run_coroutine_threadsafe(
                     sendAudioMessage(self.conn, sentence_type, audio_datas, text),
                     self.conn.loop,
                 )
                 future.result()
+                if audio_datas and sentence_type != SentenceType.LAST:
+                    playing = True
                 if self.conn.max_output_size > 0 and text:
                     add_device_output(self.conn.headers.get("device-id"), len(text))
                 enqueue_tts_report(self.conn, text, audio_datas)
@@ -284,6 +594,37 @@ class TTSProviderBase(ABC):
                     f"audio_play_priority priority_thread: {text} {e}"
                 )
 
+    def _play_progressive(self, sentence_type, audio_stream, text):
+        """边合成边播放，有新的音频帧就发送，返回是否发送了音频"""
+        first = True
+        while not self.conn.stop_event.is_set():
+            batch = audio_stream.next_batch(timeout=1)
+            if batch is None:
+                break
+            if self.conn.client_abort:
+                audio_stream.cancel()
+                break
+            if not batch:
+                continue
+            # 句子的第一批音频带上文本，后续批次按续播发送
+            future = asyncio.run_coroutine_threadsafe(
+                sendAudioMessage(
+                    self.conn,
+                    sentence_type if first else SentenceType.MIDDLE,
+                    batch,
+                    text if first else None,
+                ),
+                self.conn.loop,
+            )
+            future.result()
+            first = False
+        if first:
+            return False
+        if self.conn.max_output_size > 0 and text:
+            add_device_output(self.conn.headers.get("device-id"), len(text))
+        enqueue_tts_report(self.conn, text, audio_stream.packets)
+        return True
+
     async def start_session(self, session_id):
         pass
 
@@ -294,45 +635,19 @@ class TTSProviderBase(ABC):
         """资源清理方法"""
         if hasattr(self, "ws") and self.ws:
             await self.ws.close()
+        if self.synthesis_executor:
+            self.synthesis_executor.shutdown(wait=False, cancel_futures=True)
 
-    def _get_segment_text(self):
-        # 合并当前全部文本并处理未分割部分
-        full_text = "".join(self.tts_text_buff)
-        current_text = full_text[self.processed_chars :]  # 从未处理的位置开始
-        last_punct_pos = -1
-
-        # 根据是否是第一句话选择不同的标点符号集合
-        punctuations_to_use = (
-            self.first_sentence_punctuations
-            if self.is_first_sentence
-            else self.punctuations
-        )
-
-        for punct in punctuations_to_use:
-            pos = current_text.rfind(punct)
-            if (pos != -1 and last_punct_pos == -1) or (
-                pos != -1 and pos < last_punct_pos
-            ):
-                last_punct_pos = pos
-
-        if last_punct_pos != -1:
-            segment_text_raw = current_text[: last_punct_pos + 1]
+    def _get_segment_texts(self, text):
+        """把新到达的文本交给分句器，返回可以合成的片段"""
+        segment_texts = []
+        for segment_text_raw in self.segmenter.push(text):
             segment_text = textUtils.get_string_no_punctuation_or_emoji(
                 segment_text_raw
             )
-            self.processed_chars += len(segment_text_raw)  # 更新已处理字符位置
-
-            # 如果是第一句话，在找到第一个逗号后，将标志设置为False
-            if self.is_first_sentence:
-                self.is_first_sentence = False
-
-            return segment_text
-        elif self.tts_stop_request and current_text:
-            segment_text = current_text
-            self.is_first_sentence = True  # 重置标志
-            return segment_text
-        else:
-            return None
+            if segment_text:
+                segment_texts.append(segment_text)
+        return segment_texts
 
     def _process_audio_file(self, tts_file):
         """处理音频文件并转换为指定格式
@@ -345,6 +660,13 @@ class TTSProviderBase(ABC):
             tuple: (sentence_type, audio_datas, content_detail)
         """
         audio_datas = []
+        is_output_file = tts_file.startswith(self.output_file)
+        transcoded_file = None if is_output_file else get_transcoded_file(tts_file)
+        if transcoded_file and (
+            tts_file.endswith(".p3") or self.conn.audio_format != "pcm"
+        ):
+            # 音乐等已转码为p3的文件边读边播放，无需整首解码
+            return AudioFileStream(transcoded_file)
         if tts_file.endswith(".p3"):
             audio_datas, _ = p3.decode_opus_from_file(tts_file)
         elif self.conn.audio_format == "pcm":
@@ -356,7 +678,7 @@ class TTSProviderBase(ABC):
             self.delete_audio_file
             and tts_file is not None
             and os.path.exists(tts_file)
-            and tts_file.startswith(self.output_file)
+            and is_output_file
         ):
             os.remove(tts_file)
         return audio_datas
@@ -375,23 +697,10 @@ class TTSProviderBase(ABC):
         Returns:
             bool: 是否成功处理了文本
         """
-        full_text = "".join(self.tts_text_buff)
-        remaining_text = full_text[self.processed_chars :]
+        remaining_text = self.segmenter.flush()
         if remaining_text:
             segment_text = textUtils.get_string_no_punctuation_or_emoji(remaining_text)
             if segment_text:
-                if self.delete_audio_file:
-                    audio_datas = self.to_tts(segment_text)
-                    if audio_datas:
-                        self.tts_audio_queue.put(
-                            (SentenceType.MIDDLE, audio_datas, segment_text)
-                        )
-                else:
-                    tts_file = self.to_tts(segment_text)
-                    audio_datas = self._process_audio_file(tts_file)
-                    self.tts_audio_queue.put(
-                        (SentenceType.MIDDLE, audio_datas, segment_text)
-                    )
-                self.processed_chars += len(full_text)
+                self._submit_segment(SentenceType.MIDDLE, segment_text)
                 return True
         return False
@@ -36,11 +36,21 @@ class TTSProvider(TTSProviderBase):
                             f.write(chunk["data"])
             else:
                 # 返回音频二进制数据
-                audio_bytes = b""
+                audio_chunks = []
                 async for chunk in communicate.stream():
                     if chunk["type"] == "audio":
-                        audio_bytes += chunk["data"]
-                return audio_bytes
+                        audio_chunks.append(chunk["data"])
+                return b"".join(audio_chunks)
         except Exception as e:
             error_msg = f"Edge TTS请求失败: {e}"
-            raise Exception(error_msg)  # 抛出异常，让调用方捕获
\ No newline at end of file
+            raise Exception(error_msg)  # 抛出异常，让调用方捕获
+
+    async def text_to_speak_stream(self, text):
+        """边接收边产出音频数据块"""
+        try:
+            communicate = edge_tts.Communicate(text, voice=self.voice)
+            async for chunk in communicate.stream():
+                if chunk["type"] == "audio":
+                    yield chunk["data"]
+        except Exception as e:
+            raise Exception(f"Edge TTS请求失败: {e}")
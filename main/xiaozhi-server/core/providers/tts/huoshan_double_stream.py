@@ -9,6 +9,7 @@ from core.utils.tts import MarkdownCleaner
 from config.logger import setup_logging
 from core.utils import opus_encoder_utils
 from core.utils.util import check_model_key
+from core.utils.ws_pool import get_ws_pool
 from core.providers.tts.base import TTSProviderBase
 from core.handle.abortHandle import handleAbortMessage
 from core.providers.tts.dto.dto import SentenceType, ContentType, InterfaceType
@@ -142,6 +143,8 @@ class TTSProvider(TTSProviderBase):
     def __init__(self, config, delete_audio_file):
         super().__init__(config, delete_audio_file)
         self.ws = None
+        self.ws_conn = None  # 从连接池取出的连接
+        self.ws_pool = None
         self.interface_type = InterfaceType.DUAL_STREAM
         self._monitor_task = None  # 监听任务引用
         self.appId = config.get("appid")
@@ -167,31 +170,58 @@ class TTSProvider(TTSProviderBase):
     async def open_audio_channels(self, conn):
         try:
             await super().open_audio_channels(conn)
+            self.ws_pool = get_ws_pool(conn.config)
         except Exception as e:
             logger.bind(tag=TAG).error(f"Failed to open audio channels: {str(e)}")
             self.ws = None
             raise
 
-    async def _ensure_connection(self):
-        """建立新的WebSocket连接"""
+    async def _ensure_connection(self, fresh=False):
+        """从连接池取出WebSocket连接，没有空闲连接时新建"""
         try:
-            logger.bind(tag=TAG).info("开始建立新连接...")
+            if self.ws_pool is None:
+                self.ws_pool = get_ws_pool()
             ws_header = {
                 "X-Api-App-Key": self.appId,
                 "X-Api-Access-Key": self.access_token,
                 "X-Api-Resource-Id": self.resource_id,
                 "X-Api-Connect-Id": uuid.uuid4(),
             }
-            self.ws = await websockets.connect(
-                self.ws_url, additional_headers=ws_header, max_size=1000000000
+            key = self.ws_pool.make_key(
+                "huoshan",
+                self.ws_url,
+                self.appId,
+                self.access_token,
+                self.resource_id,
+                owner=self,
             )
-            logger.bind(tag=TAG).info("WebSocket连接建立成功")
+            self.ws_conn = await self.ws_pool.acquire(
+                key, self.ws_url, ws_header, fresh=fresh
+            )
+            self.ws = self.ws_conn.ws
+            if self.ws_conn.reused:
+                logger.bind(tag=TAG).info("复用连接池中的WebSocket连接")
+            else:
+                logger.bind(tag=TAG).info("WebSocket连接建立成功")
             return self.ws
         except Exception as e:
             logger.bind(tag=TAG).error(f"建立连接失败: {str(e)}")
+            self.ws_conn = None
             self.ws = None
             raise
 
+    async def _release_connection(self, reusable=False):
+        """会话正常结束时把连接归还连接池，否则关闭连接"""
+        ws_conn = self.ws_conn
+        self.ws_conn = None
+        self.ws = None
+        if ws_conn is None:
+            return
+        if reusable:
+            self.ws_pool.release(ws_conn)
+        else:
+            await self.ws_pool.discard(ws_conn)
+
     def tts_text_priority_thread(self):
         """火山引擎双流式TTS的文本处理线程"""
         while not self.conn.stop_event.is_set():
@@ -284,12 +314,7 @@ class TTSProvider(TTSProviderBase):
             return
         except Exception as e:
             logger.bind(tag=TAG).error(f"发送TTS文本失败: {str(e)}")
-            if self.ws:
-                try:
-                    await self.ws.close()
-                except:
-                    pass
-                self.ws = None
+            await self._release_connection()
             raise
 
     async def start_session(self, session_id):
@@ -304,22 +329,15 @@ class TTSProvider(TTSProviderBase):
                 logger.bind(tag=TAG).info("等待上一个监听任务结束...")
                 if self.ws is not None:
                     logger.bind(tag=TAG).info("强制关闭上一个WebSocket连接以唤醒监听任务...")
-                    try:
-                        await self.ws.close()
-                    except Exception as e:
-                        logger.bind(tag=TAG).warning(f"关闭上一个ws异常: {e}")
-                    self.ws = None
+                    await self._release_connection()
                 try:
                     await asyncio.wait_for(task, timeout=8)
                 except Exception as e:
                     logger.bind(tag=TAG).warning(f"等待监听任务异常: {e}")
                 self._monitor_task = None
-            # 建立新连接
+            # 从连接池取出连接
             await self._ensure_connection()
 
-            # 启动监听任务
-            self._monitor_task = asyncio.create_task(self._start_monitor_tts_response())
-
             header = Header(
                 message_type=FULL_CLIENT_REQUEST,
                 message_type_specific_flags=MsgTypeFlagWithEvent,
@@ -331,7 +349,19 @@ class TTSProvider(TTSProviderBase):
             payload = self.get_payload_bytes(
                 event=EVENT_StartSession, speaker=self.voice
             )
-            await self.send_event(self.ws, header, optional, payload)
+            try:
+                await self.send_event(self.ws, header, optional, payload)
+            except websockets.ConnectionClosed:
+                if not self.ws_conn.reused:
+                    raise
+                # 复用的连接已被服务端关闭，新建连接重试一次
+                logger.bind(tag=TAG).warning("复用的WebSocket连接已断开，重新建立连接")
+                await self._release_connection()
+                await self._ensure_connection(fresh=True)
+                await self.send_event(self.ws, header, optional, payload)
+
+            # 启动监听任务，服务端的响应会缓存在连接中，不会因为晚于请求启动而丢失
+            self._monitor_task = asyncio.create_task(self._start_monitor_tts_response())
             logger.bind(tag=TAG).info("会话启动请求已发送")
         except Exception as e:
             logger.bind(tag=TAG).error(f"启动会话失败: {str(e)}")
@@ -343,12 +373,7 @@ class TTSProvider(TTSProviderBase):
                 except:
                     pass
                 self._monitor_task = None
-            if self.ws:
-                try:
-                    await self.ws.close()
-                except:
-                    pass
-                self.ws = None
+            await self._release_connection()
             raise
 
     async def finish_session(self, session_id):
@@ -378,8 +403,11 @@ class TTSProvider(TTSProviderBase):
                     finally:
                         self._monitor_task = None
 
-                # 关闭连接
+                # 监听任务已把正常结束的连接归还连接池，其余情况关闭连接
                 await self.close()
+                logger.bind(tag=TAG).debug(
+                    f"上游连接池统计: {self.ws_pool.get_stats()}"
+                )
         except Exception as e:
             logger.bind(tag=TAG).error(f"关闭会话失败: {str(e)}")
             # 确保清理资源
@@ -390,28 +418,19 @@ class TTSProvider(TTSProviderBase):
                 except:
                     pass
                 self._monitor_task = None
-            if self.ws:
-                try:
-                    await self.ws.close()
-                except:
-                    pass
-                self.ws = None
+            await self._release_connection()
             raise
 
     async def close(self):
         """资源清理方法"""
-        if self.ws:
-            try:
-                await self.ws.close()
-            except:
-                pass
-            self.ws = None
+        await self._release_connection()
 
     async def _start_monitor_tts_response(self):
         """监听TTS响应"""
         opus_datas_cache = []
         is_first_sentence = True
         first_sentence_segment_count = 0  # 添加计数器
+        session_finished = False  # 会话正常结束的连接才能归还连接池
         try:
             while not self.conn.stop_event.is_set():
                 try:
@@ -465,6 +484,7 @@ class TTSProvider(TTSProviderBase):
                         is_first_sentence = False
                     elif res.optional.event == EVENT_SessionFinished:
                         logger.bind(tag=TAG).debug(f"会话结束～～")
+                        session_finished = True
                         self._process_before_stop_play_files()
                         break
                 except websockets.ConnectionClosed:
@@ -477,13 +497,8 @@ class TTSProvider(TTSProviderBase):
                     traceback.print_exc()
                     break
         finally:
-            # 确保清理资源
-            if self.ws:
-                try:
-                    await self.ws.close()
-                except:
-                    pass
-                self.ws = None
+            # 会话正常结束则归还连接，被打断或出错时关闭连接
+            await self._release_connection(reusable=session_finished)
             # 监听任务退出时清理引用
             self._monitor_task = None
 
@@ -1,13 +1,16 @@
 import queue
-import asyncio
 import traceback
-import aiohttp
 import requests
 import time
 from config.logger import setup_logging
 from core.utils.tts import MarkdownCleaner
 from core.providers.tts.base import TTSProviderBase
 from core.utils import opus_encoder_utils, textUtils
+from core.utils.thread_loop import (
+    run_in_thread_loop,
+    close_thread_loop,
+    get_thread_http_session,
+)
 from core.providers.tts.dto.dto import SentenceType, ContentType, InterfaceType
 
 TAG = __name__
@@ -48,15 +51,14 @@ class TTSProvider(TTSProviderBase):
                 if message.sentence_type == SentenceType.FIRST:
                     # 初始化参数
                     self.tts_stop_request = False
-                    self.processed_chars = 0
-                    self.tts_text_buff = []
+                    self.segmenter.reset()
                     self.segment_count = 0
                     self.tts_audio_first_sentence = True
                     self.before_stop_play_files.clear()
                 elif ContentType.TEXT == message.content_type:
-                    self.tts_text_buff.append(message.content_detail)
-                    segment_text = self._get_segment_text()
-                    if segment_text:
+                    for segment_text in self._get_segment_texts(
+                        message.content_detail
+                    ):
                         self.to_tts_single_stream(segment_text)
 
                 elif ContentType.FILE == message.content_type:
@@ -77,6 +79,8 @@ class TTSProvider(TTSProviderBase):
                 logger.bind(tag=TAG).error(
                     f"处理TTS文本失败: {str(e)}, 类型: {type(e).__name__}, 堆栈: {traceback.format_exc()}"
                 )
+        # 连接结束，释放本线程的事件循环和HTTP会话
+        close_thread_loop()
 
     def _process_remaining_text(self, is_last=False):
         """处理剩余的文本并生成语音
@@ -84,13 +88,11 @@ class TTSProvider(TTSProviderBase):
         Returns:
             bool: 是否成功处理了文本
         """
-        full_text = "".join(self.tts_text_buff)
-        remaining_text = full_text[self.processed_chars :]
+        remaining_text = self.segmenter.flush()
         if remaining_text:
             segment_text = textUtils.get_string_no_punctuation_or_emoji(remaining_text)
             if segment_text:
                 self.to_tts_single_stream(segment_text, is_last)
-                self.processed_chars += len(full_text)
             else:
                 self._process_before_stop_play_files()
         else:
@@ -101,7 +103,7 @@ class TTSProvider(TTSProviderBase):
             max_repeat_time = 5
             text = MarkdownCleaner.clean_markdown(text)
             try:
-                asyncio.run(self.text_to_speak(text, is_last))
+                run_in_thread_loop(self.text_to_speak(text, is_last))
             except Exception as e:
                 logger.bind(tag=TAG).warning(
                     f"语音生成失败{5 - max_repeat_time + 1}次: {text}，错误: {e}"
@@ -160,75 +162,75 @@ class TTSProvider(TTSProviderBase):
         )  # 16-bit = 2 bytes
 
         try:
-            async with aiohttp.ClientSession() as session:
-                async with session.get(
-                    self.api_url, params=params, headers=headers, timeout=10
-                ) as resp:
-
-                    if resp.status != 200:
-                        logger.bind(tag=TAG).error(
-                            f"TTS请求失败: {resp.status}, {await resp.text()}"
-                        )
-                        self.tts_audio_queue.put((SentenceType.LAST, [], None))
-                        return
+            session = get_thread_http_session()
+            async with session.get(
+                self.api_url, params=params, headers=headers, timeout=10
+            ) as resp:
 
-                    self.pcm_buffer.clear()
-                    opus_datas_cache = []
+                if resp.status != 200:
+                    logger.bind(tag=TAG).error(
+                        f"TTS请求失败: {resp.status}, {await resp.text()}"
+                    )
+                    self.tts_audio_queue.put((SentenceType.LAST, [], None))
+                    return
 
-                    self.tts_audio_queue.put((SentenceType.FIRST, [], text))
+                self.pcm_buffer.clear()
+                opus_datas_cache = []
 
-                    # 兼容 iter_chunked / iter_chunks / iter_any
-                    async for chunk in resp.content.iter_any():
-                        data = chunk[0] if isinstance(chunk, (list, tuple)) else chunk
-                        if not data:
-                            continue
+                self.tts_audio_queue.put((SentenceType.FIRST, [], text))
 
-                        # 拼到 buffer
-                        self.pcm_buffer.extend(data)
+                # 兼容 iter_chunked / iter_chunks / iter_any
+                async for chunk in resp.content.iter_any():
+                    data = chunk[0] if isinstance(chunk, (list, tuple)) else chunk
+                    if not data:
+                        continue
 
-                        # 够一帧就编码
-                        while len(self.pcm_buffer) >= frame_bytes:
-                            frame = bytes(self.pcm_buffer[:frame_bytes])
-                            del self.pcm_buffer[:frame_bytes]
+                    # 拼到 buffer
+                    self.pcm_buffer.extend(data)
+
+                    # 够一帧就编码
+                    while len(self.pcm_buffer) >= frame_bytes:
+                        frame = bytes(self.pcm_buffer[:frame_bytes])
+                        del self.pcm_buffer[:frame_bytes]
 
-                            opus = self.opus_encoder.encode_pcm_to_opus(
-                                frame, end_of_stream=False
-                            )
-                            if opus:
-                                if self.segment_count < 10:  # 前10个片段直接发送
-                                    self.tts_audio_queue.put(
-                                        (SentenceType.MIDDLE, opus, None)
-                                    )
-                                    self.segment_count += 1
-                                else:
-                                    opus_datas_cache.extend(opus)
-
-                    # flush 剩余不足一帧的数据
-                    if self.pcm_buffer:
                         opus = self.opus_encoder.encode_pcm_to_opus(
-                            bytes(self.pcm_buffer), end_of_stream=True
+                            frame, end_of_stream=False
                         )
                         if opus:
                             if self.segment_count < 10:  # 前10个片段直接发送
-                                # 直接发送
                                 self.tts_audio_queue.put(
                                     (SentenceType.MIDDLE, opus, None)
                                 )
                                 self.segment_count += 1
                             else:
-                                # 后续片段缓存
                                 opus_datas_cache.extend(opus)
-                        self.pcm_buffer.clear()
 
-                    # 如果不是前10个片段，发送缓存的数据
-                    if self.segment_count >= 10 and opus_datas_cache:
-                        self.tts_audio_queue.put(
-                            (SentenceType.MIDDLE, opus_datas_cache, None)
-                        )
+                # flush 剩余不足一帧的数据
+                if self.pcm_buffer:
+                    opus = self.opus_encoder.encode_pcm_to_opus(
+                        bytes(self.pcm_buffer), end_of_stream=True
+                    )
+                    if opus:
+                        if self.segment_count < 10:  # 前10个片段直接发送
+                            # 直接发送
+                            self.tts_audio_queue.put(
+                                (SentenceType.MIDDLE, opus, None)
+                            )
+                            self.segment_count += 1
+                        else:
+                            # 后续片段缓存
+                            opus_datas_cache.extend(opus)
+                    self.pcm_buffer.clear()
+
+                # 如果不是前10个片段，发送缓存的数据
+                if self.segment_count >= 10 and opus_datas_cache:
+                    self.tts_audio_queue.put(
+                        (SentenceType.MIDDLE, opus_datas_cache, None)
+                    )
 
-                    # 如果是最后一段，输出音频获取完毕
-                    if is_last:
-                        self._process_before_stop_play_files()
+                # 如果是最后一段，输出音频获取完毕
+                if is_last:
+                    self._process_before_stop_play_files()
 
         except Exception as e:
             logger.bind(tag=TAG).error(f"TTS请求异常: {e}")
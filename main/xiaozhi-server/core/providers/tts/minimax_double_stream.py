@@ -10,6 +10,7 @@ from core.utils.tts import MarkdownCleaner
 from config.logger import setup_logging
 from core.utils import opus_encoder_utils
 from core.utils.util import check_model_key
+from core.utils.ws_pool import get_ws_pool
 from core.providers.tts.base import TTSProviderBase
 from core.handle.abortHandle import handleAbortMessage
 from core.providers.tts.dto.dto import SentenceType, ContentType, InterfaceType
@@ -24,6 +25,8 @@ class TTSProvider(TTSProviderBase):
     def __init__(self, config, delete_audio_file):
         super().__init__(config, delete_audio_file)
         self.ws = None
+        self.ws_conn = None  # 从连接池取出的连接
+        self.ws_pool = None
         self.interface_type = InterfaceType.DUAL_STREAM
         self._monitor_task = None  # 监听任务引用
         
@@ -73,7 +76,6 @@ class TTSProvider(TTSProviderBase):
         
         self.enable_two_way = True
         self.tts_text = ""
-        self.session_id = None
         
         # Opus编码器配置
         self.opus_encoder = opus_encoder_utils.OpusEncoderUtils(
@@ -87,6 +89,7 @@ class TTSProvider(TTSProviderBase):
     async def open_audio_channels(self, conn):
         try:
             await super().open_audio_channels(conn)
+            self.ws_pool = get_ws_pool(conn.config)
         except Exception as e:
             logger.bind(tag=TAG).error(f"Failed to open audio channels: {str(e)}")
             self.ws = None
@@ -98,39 +101,59 @@ class TTSProvider(TTSProviderBase):
         # URL已在初始化时设置
         return True
 
-    async def _ensure_connection(self):
-        """建立新的WebSocket连接"""
+    async def _ensure_connection(self, fresh=False):
+        """从连接池取出WebSocket连接，没有预热好的连接时新建"""
         try:
-            logger.bind(tag=TAG).info("开始建立MiniMax WebSocket连接...")
-            
+            if self.ws_pool is None:
+                self.ws_pool = get_ws_pool()
+
             # 使用API key进行认证
             ws_headers = {
                 "Authorization": f"Bearer {self.api_key}"
             }
-            
-            self.ws = await websockets.connect(
-                self.ws_url, 
-                additional_headers=ws_headers,
-                max_size=1000000000
+
+            # MiniMax的连接在task_finish后由服务端关闭，不能跨会话复用，
+            # 取走连接时预热一条新连接给下一轮对话使用
+            key = self.ws_pool.make_key(
+                "minimax", self.ws_url, self.api_key, owner=self
             )
-            
-            # 等待连接成功响应
-            response = await self.ws.recv()
-            result = json.loads(response)
-            
-            if result.get("event") == "connected_success":
-                self.session_id = result.get("session_id")
-                logger.bind(tag=TAG).info(f"MiniMax WebSocket连接建立成功，会话ID: {self.session_id}")
-                return self.ws
-            else:
-                logger.bind(tag=TAG).error(f"WebSocket连接失败: {result}")
-                return None
-            
+            self.ws_conn = await self.ws_pool.acquire(
+                key,
+                self.ws_url,
+                ws_headers,
+                on_connected=self._wait_connected,
+                prewarm=True,
+                fresh=fresh,
+            )
+            self.ws = self.ws_conn.ws
+            if self.ws_conn.reused:
+                logger.bind(tag=TAG).info("使用预热的MiniMax WebSocket连接")
+            return self.ws
+
         except Exception as e:
             logger.bind(tag=TAG).error(f"建立WebSocket连接失败: {str(e)}")
+            self.ws_conn = None
             self.ws = None
             raise
 
+    async def _wait_connected(self, ws):
+        """等待连接成功响应"""
+        response = await ws.recv()
+        result = json.loads(response)
+        if result.get("event") != "connected_success":
+            raise Exception(f"WebSocket连接失败: {result}")
+        logger.bind(tag=TAG).info(
+            f"MiniMax WebSocket连接建立成功，会话ID: {result.get('session_id')}"
+        )
+
+    async def _release_connection(self):
+        """关闭当前连接，MiniMax的连接只能承载一次任务，不归还连接池"""
+        ws_conn = self.ws_conn
+        self.ws_conn = None
+        self.ws = None
+        if ws_conn is not None:
+            await self.ws_pool.discard(ws_conn)
+
     def tts_text_priority_thread(self):
         """MiniMax双流式TTS的文本处理线程"""
         session_started = False
@@ -236,12 +259,7 @@ class TTSProvider(TTSProviderBase):
             
         except Exception as e:
             logger.bind(tag=TAG).error(f"发送TTS文本失败: {str(e)}")
-            if self.ws:
-                try:
-                    await self.ws.close()
-                except:
-                    pass
-                self.ws = None
+            await self._release_connection()
             raise
 
     async def _send_task_continue(self, text):
@@ -286,11 +304,7 @@ class TTSProvider(TTSProviderBase):
                 logger.bind(tag=TAG).info("等待上一个监听任务结束...")
                 if self.ws is not None:
                     logger.bind(tag=TAG).info("强制关闭上一个WebSocket连接...")
-                    try:
-                        await self.ws.close()
-                    except Exception as e:
-                        logger.bind(tag=TAG).warning(f"关闭上一个ws异常: {e}")
-                    self.ws = None
+                    await self._release_connection()
                 try:
                     await asyncio.wait_for(task, timeout=8)
                 except Exception as e:
@@ -306,8 +320,12 @@ class TTSProvider(TTSProviderBase):
             # 遵循Huoshan模式：不重置编码器状态，保持连续性
             logger.bind(tag=TAG).info("🔄 OPUS编码器: 新会话开始，保持编码器状态连续性")
 
-            # 发送task_start事件
-            await self._send_task_start()
+            # 发送task_start事件，预热的连接可能已被服务端关闭，失败时新建连接重试一次
+            if not await self._send_task_start() and self.ws_conn.reused:
+                logger.bind(tag=TAG).warning("预热的WebSocket连接不可用，重新建立连接")
+                await self._release_connection()
+                await self._ensure_connection(fresh=True)
+                await self._send_task_start()
 
             # 启动监听任务
             self._monitor_task = asyncio.create_task(self._start_monitor_tts_response())
@@ -324,12 +342,7 @@ class TTSProvider(TTSProviderBase):
                 except:
                     pass
                 self._monitor_task = None
-            if self.ws:
-                try:
-                    await self.ws.close()
-                except:
-                    pass
-                self.ws = None
+            await self._release_connection()
             raise
 
     async def _send_task_start(self):
@@ -382,6 +395,9 @@ class TTSProvider(TTSProviderBase):
 
                 # 关闭连接
                 await self.close()
+                logger.bind(tag=TAG).debug(
+                    f"上游连接池统计: {self.ws_pool.get_stats()}"
+                )
                 
                 # 遵循Huoshan模式：不重置编码器状态
                 logger.bind(tag=TAG).info("🔄 OPUS编码器: 会话正常结束，保持编码器状态")
@@ -396,12 +412,7 @@ class TTSProvider(TTSProviderBase):
                 except:
                     pass
                 self._monitor_task = None
-            if self.ws:
-                try:
-                    await self.ws.close()
-                except:
-                    pass
-                self.ws = None
+            await self._release_connection()
             
             # 遵循Huoshan模式：错误处理中也不重置编码器状态
             logger.bind(tag=TAG).info("🔄 OPUS编码器: 错误处理完成，保持编码器状态")
@@ -409,12 +420,7 @@ class TTSProvider(TTSProviderBase):
 
     async def close(self):
         """资源清理方法"""
-        if self.ws:
-            try:
-                await self.ws.close()
-            except:
-                pass
-            self.ws = None
+        await self._release_connection()
 
     async def _start_monitor_tts_response(self):
         """监听MiniMax TTS响应"""
@@ -670,11 +676,7 @@ class TTSProvider(TTSProviderBase):
 
                 finally:
                     # 清理资源
-                    try:
-                        await self.ws.close()
-                    except:
-                        pass
-                    self.ws = None
+                    await self._release_connection()
 
             # 运行异步任务
             loop.run_until_complete(_generate_audio())
@@ -29,7 +29,7 @@ class TTSProvider(TTSProviderBase):
         if model_key_msg:
             logger.bind(tag=TAG).error(model_key_msg)
 
-    async def text_to_speak(self, text, output_file):
+    def _build_request(self, text):
         headers = {
             "Authorization": f"Bearer {self.api_key}",
             "Content-Type": "application/json",
@@ -41,6 +41,29 @@ class TTSProvider(TTSProviderBase):
             "response_format": "wav",
             "speed": self.speed,
         }
+        return headers, data
+
+    async def text_to_speak_stream(self, text):
+        """边下载边产出音频数据块"""
+        headers, data = self._build_request(text)
+        # 连接超时固定5秒，读取超时指两次收到数据之间的最长间隔
+        with requests.post(
+            self.api_url,
+            json=data,
+            headers=headers,
+            stream=True,
+            timeout=(5, self.tts_timeout),
+        ) as response:
+            if response.status_code != 200:
+                raise Exception(
+                    f"OpenAI TTS请求失败: {response.status_code} - {response.text}"
+                )
+            for chunk in response.iter_content(chunk_size=4096):
+                if chunk:
+                    yield chunk
+
+    async def text_to_speak(self, text, output_file):
+        headers, data = self._build_request(text)
         response = requests.post(self.api_url, json=data, headers=headers)
         if response.status_code == 200:
             if output_file:
@@ -0,0 +1,116 @@
+"""静态音频资源缓存
+
+提示音、绑定码数字、唤醒词回复等固定音频，原来每次播放都要重新解码、重新编码opus。
+这里按 (文件路径, 修改时间, 文件大小) 缓存编码好的数据包列表：
+- 服务启动时在后台线程预先编码 config/assets 下的全部音频和配置中的提示音
+- 其他文件第一次播放时编码一次，之后直接从内存取
+- 文件被替换（修改时间或大小变化）后自动重新编码
+返回的数据包列表由所有连接共享，调用方不要修改。
+"""
+
+import os
+import time
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+from config.logger import setup_logging
+from core.utils.util import audio_to_data
+
+TAG = __name__
+logger = setup_logging()
+
+AUDIO_ASSETS_DIR = "config/assets"
+AUDIO_EXTENSIONS = (".wav", ".mp3", ".p3", ".ogg", ".opus", ".flac", ".pcm")
+
+
+class AudioAssetRegistry:
+    def __init__(self):
+        # (绝对路径, is_opus) -> (修改时间, 文件大小, 数据包列表, 时长)
+        self._entries: Dict[Tuple[str, bool], tuple] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.encode_ms = 0.0
+
+    def get(self, file_path: str, is_opus: bool = True) -> Tuple[List[bytes], float]:
+        """获取音频文件编码后的数据包列表和时长，与 audio_to_data 的返回值相同"""
+        path = os.path.abspath(file_path)
+        stat = os.stat(path)
+        key = (path, is_opus)
+        with self._lock:
+            entry = self._entries.get(key)
+            if (
+                entry is not None
+                and entry[0] == stat.st_mtime
+                and entry[1] == stat.st_size
+            ):
+                self.hits += 1
+                return entry[2], entry[3]
+            self.misses += 1
+
+        start = time.perf_counter()
+        packets, duration = audio_to_data(path, is_opus=is_opus)
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        with self._lock:
+            self._entries[key] = (stat.st_mtime, stat.st_size, packets, duration)
+            self.encode_ms += elapsed_ms
+        return packets, duration
+
+    def preload(self, file_paths: List[str]) -> int:
+        count = 0
+        for file_path in file_paths:
+            try:
+                self.get(file_path)
+                count += 1
+            except Exception as e:
+                logger.bind(tag=TAG).warning(f"预编码音频失败: {file_path}, {e}")
+        return count
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": sum(
+                    sum(len(p) for p in entry[2]) for entry in self._entries.values()
+                ),
+                "hits": self.hits,
+                "misses": self.misses,
+                "encode_ms": round(self.encode_ms, 1),
+            }
+
+
+_registry: Optional[AudioAssetRegistry] = None
+_registry_lock = threading.Lock()
+
+
+def get_audio_asset_registry() -> AudioAssetRegistry:
+    """获取全局静态音频资源缓存"""
+    global _registry
+    if _registry is None:
+        with _registry_lock:
+            if _registry is None:
+                _registry = AudioAssetRegistry()
+    return _registry
+
+
+def get_audio_asset(file_path: str, is_opus: bool = True) -> Tuple[List[bytes], float]:
+    """从缓存获取静态音频，用于替代 audio_to_data"""
+    return get_audio_asset_registry().get(file_path, is_opus)
+
+
+def preload_audio_assets(config: Dict[str, Any]):
+    """预先编码 config/assets 下的音频和配置中引用的提示音，在后台线程中调用"""
+    file_paths = []
+    for root, _, files in os.walk(AUDIO_ASSETS_DIR):
+        for name in sorted(files):
+            if name.lower().endswith(AUDIO_EXTENSIONS):
+                file_paths.append(os.path.join(root, name))
+    stop_tts_notify_voice = config.get("stop_tts_notify_voice")
+    if stop_tts_notify_voice and os.path.exists(stop_tts_notify_voice):
+        file_paths.append(stop_tts_notify_voice)
+
+    registry = get_audio_asset_registry()
+    start = time.perf_counter()
+    count = registry.preload(file_paths)
+    logger.bind(tag=TAG).info(
+        f"预编码静态音频{count}个，耗时{(time.perf_counter() - start) * 1000:.0f}ms"
+    )
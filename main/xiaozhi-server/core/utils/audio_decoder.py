@@ -0,0 +1,559 @@
+"""进程内音频解码
+
+TTS返回的音频原来都交给 pydub 处理，每句话都要启动一次ffmpeg子进程，只为了得到16kHz单声道PCM。
+这里在进程内完成常见格式的解码：
+- WAV/PCM：直接用numpy解析
+- MP3/FLAC/Ogg Vorbis：使用soundfile(libsndfile)在进程内解码
+- Ogg Opus：直接解封装出opus数据包，单声道60ms帧无需重新编码
+- 重采样：numpy实现的多相FIR滤波
+无法在进程内解码时才回退到ffmpeg，并记录回退次数。
+"""
+
+import struct
+import threading
+from io import BytesIO
+from math import gcd
+from functools import lru_cache
+from typing import List, Optional, Tuple
+
+import numpy as np
+import opuslib_next
+from config.logger import setup_logging
+
+try:
+    import soundfile
+except (ImportError, OSError):
+    soundfile = None
+
+TAG = __name__
+logger = setup_logging()
+
+TARGET_SAMPLE_RATE = 16000
+OPUS_FRAME_DURATION_MS = 60
+
+_stats_lock = threading.Lock()
+_stats = {"native": 0, "passthrough": 0, "ffmpeg_fallback": 0}
+_fallback_formats = {}
+
+
+def _count(name: str, file_type: str = None):
+    with _stats_lock:
+        _stats[name] += 1
+        if name == "ffmpeg_fallback":
+            _fallback_formats[file_type] = _fallback_formats.get(file_type, 0) + 1
+            return _fallback_formats[file_type] == 1
+    return False
+
+
+def get_decoder_stats() -> dict:
+    """获取解码统计，ffmpeg_fallback 为回退到ffmpeg的次数"""
+    with _stats_lock:
+        stats = dict(_stats)
+        stats["fallback_formats"] = dict(_fallback_formats)
+    total = stats["native"] + stats["passthrough"] + stats["ffmpeg_fallback"]
+    stats["fallback_rate"] = (
+        round(stats["ffmpeg_fallback"] / total, 4) if total else 0.0
+    )
+    return stats
+
+
+def sniff_format(audio_bytes: bytes, file_type: str = None) -> str:
+    """根据文件头判断音频格式
+
+    WAV/Ogg/FLAC/ID3 的文件头是确定的，与TTS服务声明的格式不符时以文件头为准；
+    没有ID3标签的MP3只能靠帧同步字判断，AAC(ADTS)等格式也以同样的同步字开头，
+    因此只在没有声明格式时才据此判断为MP3。
+    """
+    file_type = (file_type or "").lower().lstrip(".")
+    if file_type == "pcm":
+        # 裸PCM没有文件头，只能相信声明的格式
+        return file_type
+    head = audio_bytes[:12]
+    if head[:4] == b"RIFF" and head[8:12] == b"WAVE":
+        return "wav"
+    if head[:4] == b"OggS":
+        return "ogg"
+    if head[:4] == b"fLaC":
+        return "flac"
+    if head[:3] == b"ID3":
+        return "mp3"
+    if (
+        not file_type
+        and len(head) >= 2
+        and head[0] == 0xFF
+        and (head[1] & 0xE0) == 0xE0
+        # MPEG音频的layer位不为0，ADTS的layer位固定为0
+        and head[1] & 0x06
+    ):
+        return "mp3"
+    return file_type
+
+
+# ---------------------------------------------------------------------------
+# 重采样
+# ---------------------------------------------------------------------------
+
+_RESAMPLE_TAPS_PER_PHASE = 24
+_RESAMPLE_BLOCK = 16384
+
+
+@lru_cache(maxsize=16)
+def _design_polyphase_filter(up: int, down: int) -> np.ndarray:
+    """设计Kaiser窗低通滤波器，并拆分为up个相位，返回形状 (up, 每相位抽头数)"""
+    # 取奇数长度，使滤波器中心落在整数位置，群延迟可以精确补偿
+    num_taps = _RESAMPLE_TAPS_PER_PHASE * up - 1
+    cutoff = 0.95 / max(up, down)
+    t = np.arange(num_taps) - (num_taps - 1) / 2.0
+    h = cutoff * np.sinc(cutoff * t) * np.kaiser(num_taps, 8.0)
+    # 补零上采样后每个相位的增益归一为1
+    h *= up / h.sum()
+    h = np.append(h, 0.0)
+    return h.reshape(_RESAMPLE_TAPS_PER_PHASE, up).T.astype(np.float32).copy()
+
+
+class StreamingResampler:
+    """多相FIR重采样，支持分块输入，输出与一次性处理完全一致"""
+
+    def __init__(self, src_rate: int, dst_rate: int):
+        g = gcd(src_rate, dst_rate)
+        self.up, self.down = dst_rate // g, src_rate // g
+        self.passthrough = src_rate == dst_rate
+        if self.passthrough:
+            return
+        self.poly = _design_polyphase_filter(self.up, self.down)
+        self.taps = self.poly.shape[1]
+        # 补偿滤波器群延迟，使输出与输入对齐
+        self.delay = (self.taps * self.up - 2) // 2
+        # buffer[0] 对应的输入样本下标，开头补taps个0
+        self.buffer = np.zeros(self.taps, dtype=np.float32)
+        self.buffer_start = -self.taps
+        self.total_in = 0
+        self.next_out = 0
+        self._k = np.arange(self.taps)
+
+    def push(self, samples: np.ndarray, final: bool = False) -> np.ndarray:
+        """输入单声道样本，返回目前可以确定的输出样本(float32)"""
+        if self.passthrough:
+            return samples.astype(np.float32, copy=False)
+        if len(samples):
+            self.buffer = np.concatenate(
+                [self.buffer, samples.astype(np.float32, copy=False)]
+            )
+            self.total_in += len(samples)
+        if final:
+            self.buffer = np.concatenate(
+                [self.buffer, np.zeros(self.taps, dtype=np.float32)]
+            )
+            out_end = -(-self.total_in * self.up // self.down)
+        else:
+            # 只输出所需输入样本都已到达的部分
+            out_end = (self.total_in * self.up - 1 - self.delay) // self.down + 1
+        out_end = max(out_end, self.next_out)
+
+        out = np.empty(out_end - self.next_out, dtype=np.float32)
+        for start in range(self.next_out, out_end, _RESAMPLE_BLOCK):
+            n = np.arange(start, min(start + _RESAMPLE_BLOCK, out_end))
+            m = n * self.down + self.delay
+            idx = (m // self.up - self.buffer_start)[:, None] - self._k[None, :]
+            idx = np.minimum(idx, len(self.buffer) - 1)
+            out[start - self.next_out : start - self.next_out + len(n)] = np.einsum(
+                "ij,ij->i", self.buffer[idx], self.poly[m % self.up]
+            )
+        self.next_out = out_end
+
+        # 丢弃后续输出不再需要的输入样本
+        keep_from = (
+            (self.next_out * self.down + self.delay) // self.up
+            - (self.taps - 1)
+            - self.buffer_start
+        )
+        if keep_from > 0:
+            self.buffer = self.buffer[keep_from:]
+            self.buffer_start += keep_from
+        return out
+
+
+def resample(samples: np.ndarray, src_rate: int, dst_rate: int) -> np.ndarray:
+    """多相FIR重采样，输入输出均为float32单声道"""
+    if src_rate == dst_rate or len(samples) == 0:
+        return samples.astype(np.float32, copy=False)
+    return StreamingResampler(src_rate, dst_rate).push(samples, final=True)
+
+
+def _to_int16(samples: np.ndarray) -> np.ndarray:
+    if samples.dtype == np.int16:
+        return samples
+    return np.clip(np.rint(samples), -32768, 32767).astype(np.int16)
+
+
+def _to_mono_16k(samples: np.ndarray, sample_rate: int) -> np.ndarray:
+    """samples 形状为 (帧数, 声道数)，返回16kHz单声道int16"""
+    if samples.shape[1] == 1:
+        mono = samples[:, 0]
+    else:
+        mono = samples.mean(axis=1, dtype=np.float32)
+    if sample_rate != TARGET_SAMPLE_RATE:
+        mono = resample(mono, sample_rate, TARGET_SAMPLE_RATE)
+    return _to_int16(mono)
+
+
+# ---------------------------------------------------------------------------
+# WAV
+# ---------------------------------------------------------------------------
+
+
+def _parse_wav_header(audio_bytes: bytes):
+    """解析WAV头，返回 (格式, data块起始位置, data块长度)；数据不完整时返回None
+
+    格式为 (编码, 声道数, 采样率, 位深)，data块长度为None表示以实际数据长度为准
+    """
+    pos = 12
+    fmt = None
+    size = len(audio_bytes)
+    while pos + 8 <= size:
+        chunk_id = audio_bytes[pos : pos + 4]
+        chunk_size = struct.unpack_from("<I", audio_bytes, pos + 4)[0]
+        body = pos + 8
+        if chunk_id == b"fmt ":
+            if body + 16 > size:
+                return None
+            audio_format, channels, sample_rate = struct.unpack_from(
+                "<HHI", audio_bytes, body
+            )
+            bits = struct.unpack_from("<H", audio_bytes, body + 14)[0]
+            if audio_format == 0xFFFE and chunk_size >= 26:
+                if body + 26 > size:
+                    return None
+                # WAVE_FORMAT_EXTENSIBLE，实际格式在子格式GUID的前两个字节
+                audio_format = struct.unpack_from("<H", audio_bytes, body + 24)[0]
+            fmt = (audio_format, channels, sample_rate, bits)
+        elif chunk_id == b"data":
+            if fmt is None:
+                return None
+            # 流式生成的WAV数据长度可能为0或0xFFFFFFFF，以实际长度为准
+            data_size = None if chunk_size in (0, 0xFFFFFFFF) else chunk_size
+            return fmt, body, data_size
+        pos = body + chunk_size + (chunk_size & 1)
+    return None
+
+
+def _decode_wav(audio_bytes: bytes) -> Optional[Tuple[np.ndarray, int]]:
+    """解析WAV，支持8/16/24/32位整数和32位浮点，返回 (帧数x声道数数组, 采样率)"""
+    header = _parse_wav_header(audio_bytes)
+    if header is None:
+        return None
+    fmt, body, data_size = header
+    end = len(audio_bytes) if data_size is None else body + data_size
+    return _wav_samples(audio_bytes[body:end], *fmt)
+
+
+def _wav_samples(data, audio_format, channels, sample_rate, bits):
+    width = bits // 8
+    if channels < 1 or width < 1 or sample_rate <= 0:
+        return None
+    usable = len(data) - len(data) % (width * channels)
+    data = data[:usable]
+    if audio_format == 1 and bits == 16:
+        samples = np.frombuffer(data, dtype="<i2")
+    elif audio_format == 1 and bits == 8:
+        samples = (np.frombuffer(data, dtype=np.uint8).astype(np.int16) - 128) << 8
+    elif audio_format == 1 and bits == 24:
+        raw = np.frombuffer(data, dtype=np.uint8).reshape(-1, 3)
+        samples = (
+            raw[:, 0].astype(np.int32)
+            | (raw[:, 1].astype(np.int32) << 8)
+            | (raw[:, 2].astype(np.int8).astype(np.int32) << 16)
+        )
+        samples = (samples >> 8).astype(np.int16)
+    elif audio_format == 1 and bits == 32:
+        samples = (np.frombuffer(data, dtype="<i4") >> 16).astype(np.int16)
+    elif audio_format == 3 and bits == 32:
+        samples = np.frombuffer(data, dtype="<f4") * 32767.0
+    else:
+        return None
+    return samples.reshape(-1, channels), sample_rate
+
+
+# ---------------------------------------------------------------------------
+# Ogg Opus
+# ---------------------------------------------------------------------------
+
+_OPUS_SILK_FRAME_MS = (10, 20, 40, 60)
+_OPUS_HYBRID_FRAME_MS = (10, 20)
+_OPUS_CELT_FRAME_MS = (2.5, 5, 10, 20)
+
+
+def opus_packet_duration_ms(packet: bytes) -> float:
+    """根据TOC字节计算opus数据包时长"""
+    if not packet:
+        return 0
+    toc = packet[0]
+    config = toc >> 3
+    if config < 12:
+        frame_ms = _OPUS_SILK_FRAME_MS[config % 4]
+    elif config < 16:
+        frame_ms = _OPUS_HYBRID_FRAME_MS[config % 2]
+    else:
+        frame_ms = _OPUS_CELT_FRAME_MS[config % 4]
+    code = toc & 0x03
+    if code == 0:
+        frames = 1
+    elif code in (1, 2):
+        frames = 2
+    else:
+        frames = packet[1] & 0x3F if len(packet) > 1 else 0
+    return frame_ms * frames
+
+
+def demux_ogg_opus(audio_bytes: bytes) -> Optional[Tuple[List[bytes], int, int]]:
+    """解封装Ogg Opus，返回 (音频数据包列表, 声道数, pre-skip采样数@48kHz)，不是Opus流时返回None"""
+    packets = []
+    current = bytearray()
+    pos = 0
+    size = len(audio_bytes)
+    serial = None
+    while pos + 27 <= size:
+        if audio_bytes[pos : pos + 4] != b"OggS":
+            return None
+        page_serial = struct.unpack_from("<I", audio_bytes, pos + 14)[0]
+        num_segments = audio_bytes[pos + 26]
+        table_start = pos + 27
+        lacing = audio_bytes[table_start : table_start + num_segments]
+        body = table_start + num_segments
+        if serial is None:
+            serial = page_serial
+        for seg_len in lacing:
+            if page_serial == serial:
+                current += audio_bytes[body : body + seg_len]
+                if seg_len < 255:
+                    packets.append(bytes(current))
+                    current = bytearray()
+            body += seg_len
+        pos = body
+    if len(packets) < 2 or not packets[0].startswith(b"OpusHead"):
+        return None
+    head = packets[0]
+    channels = head[9]
+    pre_skip = struct.unpack_from("<H", head, 10)[0]
+    # 第二个包是OpusTags
+    return packets[2:], channels, pre_skip
+
+
+def _decode_opus_packets(packets, channels, pre_skip):
+    decoder = opuslib_next.Decoder(TARGET_SAMPLE_RATE, channels)
+    # opus单包最长120ms
+    max_frame_size = TARGET_SAMPLE_RATE * 120 // 1000
+    pcm = b"".join(decoder.decode(packet, max_frame_size) for packet in packets)
+    samples = np.frombuffer(pcm, dtype=np.int16).reshape(-1, channels)
+    skip = pre_skip * TARGET_SAMPLE_RATE // 48000
+    return samples[skip:], TARGET_SAMPLE_RATE
+
+
+def get_opus_passthrough(audio_bytes: bytes, file_type: str) -> Optional[List[bytes]]:
+    """Ogg Opus单声道且每包都是60ms时，直接返回原始数据包，无需解码再编码"""
+    if sniff_format(audio_bytes, file_type) != "ogg":
+        return None
+    try:
+        demuxed = demux_ogg_opus(audio_bytes)
+    except Exception:
+        return None
+    if not demuxed:
+        return None
+    packets, channels, _ = demuxed
+    if channels != 1 or not packets:
+        return None
+    if any(opus_packet_duration_ms(p) != OPUS_FRAME_DURATION_MS for p in packets):
+        return None
+    _count("passthrough")
+    return packets
+
+
+# ---------------------------------------------------------------------------
+# 解码入口
+# ---------------------------------------------------------------------------
+
+
+def _decode_native(audio_bytes: bytes, fmt: str) -> Optional[Tuple[np.ndarray, int]]:
+    if fmt == "wav":
+        return _decode_wav(audio_bytes)
+    if fmt == "pcm":
+        # 裸PCM按16kHz单声道16位处理
+        samples = np.frombuffer(audio_bytes[: len(audio_bytes) & ~1], dtype="<i2")
+        return samples.reshape(-1, 1), TARGET_SAMPLE_RATE
+    if fmt in ("ogg", "opus", "ogg_opus"):
+        demuxed = demux_ogg_opus(audio_bytes)
+        if demuxed:
+            return _decode_opus_packets(*demuxed)
+    if soundfile is not None and fmt in ("mp3", "flac", "ogg"):
+        samples, sample_rate = soundfile.read(
+            BytesIO(audio_bytes), dtype="int16", always_2d=True
+        )
+        return samples, sample_rate
+    return None
+
+
+def _decode_ffmpeg(audio_bytes: bytes, fmt: str) -> bytes:
+    from pydub import AudioSegment
+
+    # -nostdin 参数：不要从标准输入读取数据，否则FFmpeg会阻塞
+    audio = AudioSegment.from_file(
+        BytesIO(audio_bytes), format=fmt or None, parameters=["-nostdin"]
+    )
+    # 转换为单声道/16kHz采样率/16位小端编码（确保与编码器匹配）
+    audio = audio.set_channels(1).set_frame_rate(TARGET_SAMPLE_RATE).set_sample_width(2)
+    return audio.raw_data
+
+
+def decode_to_pcm(audio_bytes: bytes, file_type: str) -> bytes:
+    """把音频数据解码为16kHz单声道16位小端PCM"""
+    fmt = sniff_format(audio_bytes, file_type)
+    try:
+        decoded = _decode_native(audio_bytes, fmt)
+    except Exception as e:
+        logger.bind(tag=TAG).debug(f"进程内解码 {fmt} 失败: {e}")
+        decoded = None
+
+    if decoded is not None:
+        _count("native")
+        samples, sample_rate = decoded
+        return _to_mono_16k(samples, sample_rate).tobytes()
+
+    if _count("ffmpeg_fallback", fmt):
+        logger.bind(tag=TAG).warning(f"音频格式 {fmt} 无法在进程内解码，回退到ffmpeg")
+    return _decode_ffmpeg(audio_bytes, fmt)
+
+
+# ---------------------------------------------------------------------------
+# 渐进式解码
+# ---------------------------------------------------------------------------
+
+# MP3每帧最多1152个样本，重新解码时末尾两帧可能还不完整，暂不输出
+_MP3_TAIL_MARGIN = 1152 * 2
+
+
+class ProgressiveDecoder:
+    """边下载边解码，输入任意长度的音频数据块，输出16kHz单声道16位PCM
+
+    - WAV/PCM：解析出头部后逐块转换
+    - MP3等soundfile支持的格式：数据量每增长一半就重新解码一次已收到的全部数据，
+      只输出新增的部分，总解码量仍是线性的
+    - 其他格式：收齐后一次性解码
+    """
+
+    def __init__(self, file_type: str):
+        self.file_type = file_type
+        self.fmt = None
+        self.raw = bytearray()
+        self.resampler = None
+        self.channels = 1
+        # WAV
+        self.wav_format = None
+        self.wav_block_align = 0
+        self.wav_offset = 0
+        self.wav_end = None
+        self.emitted_samples = 0  # 已输出的16kHz样本数
+        # MP3
+        self.emitted_frames = 0
+        self.next_decode_size = 2048
+
+    def feed(self, data: bytes) -> bytes:
+        if not data:
+            return b""
+        self.raw += data
+        if self.fmt is None:
+            if len(self.raw) < 12 and self.file_type != "pcm":
+                return b""
+            self.fmt = sniff_format(bytes(self.raw[:12]), self.file_type)
+        if self.fmt == "pcm":
+            return self._feed_pcm(final=False)
+        if self.fmt == "wav":
+            return self._feed_wav(final=False)
+        if self.fmt in ("mp3", "flac") and soundfile is not None:
+            if len(self.raw) >= self.next_decode_size:
+                self.next_decode_size = len(self.raw) * 3 // 2
+                return self._feed_soundfile(final=False)
+        return b""
+
+    def finish(self) -> bytes:
+        """数据全部到达后调用，返回剩余的PCM"""
+        if self.fmt == "pcm":
+            return self._feed_pcm(final=True)
+        if self.fmt == "wav" and self.wav_format is not None:
+            return self._feed_wav(final=True)
+        if self.fmt in ("mp3", "flac") and soundfile is not None and self.resampler:
+            return self._feed_soundfile(final=True)
+        if not self.raw:
+            return b""
+        # 尚未输出过任何数据，按完整文件解码（必要时回退到ffmpeg）
+        return decode_to_pcm(bytes(self.raw), self.file_type)
+
+    def _emit(self, samples: np.ndarray, sample_rate: int, final: bool) -> bytes:
+        if self.resampler is None:
+            self.resampler = StreamingResampler(sample_rate, TARGET_SAMPLE_RATE)
+        if samples.ndim == 2:
+            if samples.shape[1] == 1:
+                samples = samples[:, 0]
+            else:
+                samples = samples.mean(axis=1, dtype=np.float32)
+        output = _to_int16(self.resampler.push(samples, final))
+        self.emitted_samples += len(output)
+        return output.tobytes()
+
+    def _feed_pcm(self, final: bool) -> bytes:
+        usable = len(self.raw) & ~1
+        samples = np.frombuffer(bytes(self.raw[:usable]), dtype="<i2")
+        del self.raw[:usable]
+        if final:
+            _count("native")
+        return self._emit(samples, TARGET_SAMPLE_RATE, final)
+
+    def _feed_wav(self, final: bool) -> bytes:
+        if self.wav_format is None:
+            header = _parse_wav_header(bytes(self.raw))
+            if header is None:
+                return b""
+            self.wav_format, self.wav_offset, data_size = header
+            if data_size is not None:
+                self.wav_end = self.wav_offset + data_size
+            audio_format, channels, _, bits = self.wav_format
+            self.wav_block_align = max(1, bits // 8 * channels)
+            # 不支持的编码在结束时整体交给 decode_to_pcm 处理
+            if not _wav_samples(b"", *self.wav_format):
+                self.wav_format = None
+                self.fmt = "unsupported_wav"
+                return b""
+
+        end = (
+            len(self.raw) if self.wav_end is None else min(self.wav_end, len(self.raw))
+        )
+        usable = (end - self.wav_offset) // self.wav_block_align * self.wav_block_align
+        data = bytes(self.raw[self.wav_offset : self.wav_offset + usable])
+        # 已处理的数据不再保留
+        del self.raw[: self.wav_offset + usable]
+        if self.wav_end is not None:
+            self.wav_end -= self.wav_offset + usable
+        self.wav_offset = 0
+        if final:
+            _count("native")
+        samples, sample_rate = _wav_samples(data, *self.wav_format)
+        return self._emit(samples, sample_rate, final)
+
+    def _feed_soundfile(self, final: bool) -> bytes:
+        try:
+            samples, sample_rate = soundfile.read(
+                BytesIO(bytes(self.raw)), dtype="int16", always_2d=True
+            )
+        except Exception as e:
+            if not final:
+                # 数据还不完整，等待更多数据
+                return b""
+            logger.bind(tag=TAG).debug(f"渐进式解码 {self.fmt} 失败: {e}")
+            # 按完整文件重新解码（必要时回退到ffmpeg），只输出尚未输出的部分
+            pcm = decode_to_pcm(bytes(self.raw), self.file_type)
+            return pcm[self.emitted_samples * 2 :]
+        end = len(samples) if final else max(0, len(samples) - _MP3_TAIL_MARGIN)
+        new_samples = samples[self.emitted_frames : end]
+        self.emitted_frames = max(self.emitted_frames, end)
+        if final:
+            _count("native")
+        return self._emit(new_samples, sample_rate, final)
@@ -0,0 +1,442 @@
+"""全局音频发送节拍器
+
+原来每条连接播放每一句时都单独循环，每发一帧opus就 asyncio.sleep 一次，
+几百条连接同时播放时每秒有上万次定时器唤醒，事件循环一卡顿各连接的节奏就一起漂移。
+这里由一个节拍任务统一调度全部正在播放的音频流：
+- 每个节拍（默认一帧，60ms）唤醒一次，把各音频流在下一个节拍之前到期的帧一次发出，
+  帧最多提前一个节拍发出，不会因为节拍粒度而迟发
+- 帧的到期时间按单调时钟从音频流开始时刻计算，事件循环卡顿后自动补发积压的帧，不会累积漂移
+- 节拍任务直接把到期的帧写入各连接的发送缓冲区，不为每个音频流创建任务；
+  只有某条连接的写缓冲区已满时，才为它创建任务等待发送，只影响它自己
+- 统计节拍抖动（实际唤醒时刻与计划时刻之差）和迟发帧数
+- 连接支持 send_batch 时，同一音频流在一个节拍内到期的多帧（如开头的提前量、卡顿后补发的帧）
+  合并成一次写入，每帧仍是独立的WebSocket消息；节拍大于帧时长时每个节拍都能合并多帧
+
+PlayoutTracker 按连接估计网络往返时延和抖动，以及客户端缓冲区里还有多少音频，
+据此决定每段音频开头立即发送多少帧（提前量），并统计首包延迟和估计的欠载（卡顿）次数。
+
+节拍器绑定在第一次使用它的事件循环（即服务主循环）上，
+其他事件循环调用时退化为逐帧休眠的发送方式。
+"""
+
+import math
+import time
+import asyncio
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+from config.logger import setup_logging
+
+TAG = __name__
+logger = setup_logging()
+
+
+class AudioStream:
+    """一次播放中待发送的音频帧"""
+
+    def __init__(
+        self,
+        conn,
+        packets: List[bytes],
+        lead_frames: int,
+        start: float,
+        buffered: float = 0.0,
+    ):
+        self.conn = conn
+        self.packets = packets
+        self.lead_frames = lead_frames  # 开头立即发送、不参与节拍的帧数
+        self.start = start
+        # 客户端开始播放这段音频的估计时刻：缓冲区中已有的音频播完之后
+        self.playout_start = start + max(0.0, buffered)
+        self.position = 0  # 下一个要发送的帧
+        self.underrun = False  # 是否有帧在客户端该播放它的时刻之后才发出
+        self.sending = False
+        self.done = asyncio.get_running_loop().create_future()
+
+    def due_time(self, index: int, frame_duration: float) -> float:
+        return self.start + max(0, index - self.lead_frames) * frame_duration
+
+    def finish(self):
+        if not self.done.done():
+            self.done.set_result(self.position)
+
+
+class AudioPacer:
+    def __init__(
+        self, frame_duration_ms: int = 60, tick_ms: int = 60, batch_send: bool = True
+    ):
+        self.frame_duration = frame_duration_ms / 1000
+        self.tick_interval = tick_ms / 1000
+        self.batch_send = batch_send
+        self._streams: List[AudioStream] = []
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._ticker: Optional[asyncio.Task] = None
+
+        self.ticks = 0
+        self.frames_sent = 0
+        self.late_frames = 0
+        self.max_late_ms = 0.0
+        self.jitter_total_ms = 0.0
+        self.max_jitter_ms = 0.0
+        self.peak_streams = 0
+        self.underruns = 0
+        self.fallback_tasks = 0  # 写缓冲区已满等原因改为创建任务发送的次数
+        self.batches = 0  # 合并发送的次数
+        self.writes_saved = 0  # 合并发送比逐帧发送少写入的次数
+
+    def _is_pacer_loop(self) -> bool:
+        loop = asyncio.get_running_loop()
+        if self._loop is None:
+            self._loop = loop
+        return self._loop is loop
+
+    async def play(
+        self,
+        conn,
+        packets: List[bytes],
+        lead_frames: int = 0,
+        buffered: float = 0.0,
+    ) -> AudioStream:
+        """按帧时长发送音频帧，开头 lead_frames 帧立即发送
+
+        buffered 为客户端缓冲区中尚未播放的音频时长（秒），用于判断是否欠载。
+        返回音频流，position 为实际发送的帧数。
+        """
+        stream = AudioStream(conn, packets, lead_frames, time.monotonic(), buffered)
+        if not packets:
+            stream.finish()
+            return stream
+        if not self._is_pacer_loop():
+            await self._play_direct(stream)
+            return stream
+
+        self._streams.append(stream)
+        self.peak_streams = max(self.peak_streams, len(self._streams))
+        # 开头的帧不等节拍，立即发送
+        self._dispatch(stream, stream.start + self.tick_interval)
+        if self._ticker is None or self._ticker.done():
+            self._ticker = asyncio.create_task(self._run())
+        try:
+            await stream.done
+            return stream
+        finally:
+            stream.finish()
+
+    def _dispatch(self, stream: AudioStream, horizon: float):
+        if stream.sending:
+            return
+        if stream.conn.client_abort:
+            stream.finish()
+            return
+        if stream.due_time(stream.position, self.frame_duration) >= horizon:
+            return
+        try:
+            if self._send_nowait(stream, horizon):
+                return
+        except Exception as e:
+            if not stream.done.done():
+                stream.done.set_exception(e)
+            return
+        stream.sending = True
+        self.fallback_tasks += 1
+        asyncio.create_task(self._send_due(stream, horizon))
+
+    def _due_end(self, stream: AudioStream, horizon: float, batch: bool) -> int:
+        """返回从当前位置起 horizon 之前到期的帧的结束位置，不合并时最多一帧"""
+        position = stream.position
+        if (
+            position >= len(stream.packets)
+            or stream.due_time(position, self.frame_duration) >= horizon
+        ):
+            return position
+        end = position + 1
+        if batch:
+            while (
+                end < len(stream.packets)
+                and stream.due_time(end, self.frame_duration) < horizon
+            ):
+                end += 1
+        return end
+
+    def _on_sent(self, stream: AudioStream, position: int, end: int):
+        if end - position > 1:
+            self.batches += 1
+            self.writes_saved += end - position - 1
+        now = time.monotonic()
+        for index in range(position, end):
+            stream.position = index + 1
+            self.frames_sent += 1
+            due = stream.due_time(index, self.frame_duration)
+            late_ms = (now - due - self.tick_interval) * 1000
+            if late_ms > 0:
+                self.late_frames += 1
+                self.max_late_ms = max(self.max_late_ms, late_ms)
+            self._check_underrun(stream, now)
+
+    def _send_nowait(self, stream: AudioStream, horizon: float) -> bool:
+        """在节拍任务中直接写入 horizon 之前到期的帧，连接不支持或写缓冲区已满时返回False"""
+        try_send_batch = getattr(stream.conn.websocket, "try_send_batch", None)
+        if try_send_batch is None:
+            return False
+        while True:
+            position = stream.position
+            end = self._due_end(stream, horizon, self.batch_send)
+            if end == position:
+                break
+            # 重置没有声音的状态
+            stream.conn.last_activity_time = time.time() * 1000
+            if not try_send_batch(stream.packets[position:end]):
+                return False
+            self._on_sent(stream, position, end)
+        if stream.position >= len(stream.packets):
+            stream.finish()
+        return True
+
+    async def _send_due(self, stream: AudioStream, horizon: float):
+        """等待发送 horizon 之前到期的帧"""
+        try:
+            conn = stream.conn
+            batch = self.batch_send and hasattr(conn.websocket, "send_batch")
+            while True:
+                if conn.client_abort or stream.done.done():
+                    stream.finish()
+                    return
+                position = stream.position
+                end = self._due_end(stream, horizon, batch)
+                if end == position:
+                    break
+                # 重置没有声音的状态
+                conn.last_activity_time = time.time() * 1000
+                if end - position > 1:
+                    await conn.websocket.send_batch(stream.packets[position:end])
+                else:
+                    await conn.websocket.send(stream.packets[position])
+                self._on_sent(stream, position, end)
+            if stream.position >= len(stream.packets):
+                stream.finish()
+        except Exception as e:
+            if not stream.done.done():
+                stream.done.set_exception(e)
+        finally:
+            stream.sending = False
+
+    async def _run(self):
+        """节拍任务，没有正在播放的音频流后退出"""
+        next_tick = time.monotonic() + self.tick_interval
+        while True:
+            await asyncio.sleep(max(0.0, next_tick - time.monotonic()))
+            now = time.monotonic()
+            jitter_ms = (now - next_tick) * 1000
+            self.ticks += 1
+            self.jitter_total_ms += jitter_ms
+            self.max_jitter_ms = max(self.max_jitter_ms, jitter_ms)
+
+            self._streams = [s for s in self._streams if not s.done.done()]
+            if not self._streams:
+                logger.bind(tag=TAG).debug(f"音频节拍器统计: {self.get_stats()}")
+                return
+            horizon = now + self.tick_interval
+            for stream in self._streams:
+                self._dispatch(stream, horizon)
+
+            # 按计划时刻推进，卡顿超过一个节拍时从当前时刻重新对齐，积压的帧由到期时间补发
+            next_tick += self.tick_interval
+            if next_tick < now:
+                next_tick = now + self.tick_interval
+
+    def _check_underrun(self, stream: AudioStream, now: float):
+        if stream.position == 1:
+            # 缓冲区为空时客户端收到第一帧才开始播放
+            stream.playout_start = max(stream.playout_start, now)
+            return
+        if stream.underrun:
+            return
+        # 第position-1帧应在 playout_start + (position-1) * 帧时长 开始播放
+        deadline = stream.playout_start + (stream.position - 1) * self.frame_duration
+        if now > deadline:
+            stream.underrun = True
+            self.underruns += 1
+
+    async def _play_direct(self, stream: AudioStream):
+        conn = stream.conn
+        for index, packet in enumerate(stream.packets):
+            if conn.client_abort:
+                break
+            conn.last_activity_time = time.time() * 1000
+            delay = stream.due_time(index, self.frame_duration) - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            await conn.websocket.send(packet)
+            stream.position += 1
+            self._check_underrun(stream, time.monotonic())
+        stream.finish()
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "active_streams": len(self._streams),
+            "peak_streams": self.peak_streams,
+            "ticks": self.ticks,
+            "frames_sent": self.frames_sent,
+            "late_frames": self.late_frames,
+            "max_late_ms": round(self.max_late_ms, 1),
+            "avg_jitter_ms": (
+                round(self.jitter_total_ms / self.ticks, 2) if self.ticks else 0.0
+            ),
+            "max_jitter_ms": round(self.max_jitter_ms, 1),
+            "underruns": self.underruns,
+            "fallback_tasks": self.fallback_tasks,
+            "batches": self.batches,
+            "writes_saved": self.writes_saved,
+            # 按节拍器运行时长折算
+            "writes_saved_per_sec": (
+                round(self.writes_saved / (self.ticks * self.tick_interval), 1)
+                if self.ticks
+                else 0.0
+            ),
+        }
+
+
+class PlayoutTracker:
+    """单条连接的网络状况和客户端播放进度估计
+
+    往返时延取自WebSocket心跳（ping/pong）的耗时，平滑方式与TCP的RTO估计相同(RFC 6298)。
+    提前量 = 半个平滑往返时延 + 4倍时延抖动，按帧向上取整并限制在配置范围内；
+    之后每段音频只补足客户端缓冲区与目标提前量之间的差额，缓冲区不会逐段累积。
+    """
+
+    def __init__(self, config: Dict[str, Any] = None, frame_duration_ms: int = 60):
+        config = config or {}
+        self.adaptive = bool(config.get("adaptive_lead", True))
+        self.default_lead_frames = int(config.get("pre_buffer_frames", 3))
+        self.min_lead_frames = int(config.get("min_lead_frames", 1))
+        self.max_lead_frames = int(config.get("max_lead_frames", 8))
+        self.rtt_probe_interval = float(config.get("rtt_probe_interval", 30))
+        self.frame_duration = frame_duration_ms / 1000
+
+        self.srtt: Optional[float] = None  # 平滑往返时延（秒）
+        self.rttvar = 0.0  # 往返时延抖动（秒）
+        self.rtt_samples = 0
+        self._last_latency = None
+        self._last_sample_time = None
+        self._probe_task: Optional[asyncio.Task] = None
+
+        self.playout_end = 0.0  # 客户端播完已发送音频的估计时刻
+        self.turn_start: Optional[float] = None
+        self.turns = 0
+        self.last_first_audio_ms: Optional[float] = None
+        self.first_audio_total_ms = 0.0
+        self.underruns = 0
+
+    def add_rtt_sample(self, rtt: float):
+        if self.srtt is None:
+            self.srtt = rtt
+            self.rttvar = rtt / 2
+        else:
+            self.rttvar = 0.75 * self.rttvar + 0.25 * abs(self.srtt - rtt)
+            self.srtt = 0.875 * self.srtt + 0.125 * rtt
+        self.rtt_samples += 1
+        self._last_sample_time = time.monotonic()
+
+    def sample_websocket(self, websocket):
+        """读取WebSocket心跳测得的往返时延，有新值时作为一次采样"""
+        latency = getattr(websocket, "latency", None)
+        if latency and latency != self._last_latency:
+            self._last_latency = latency
+            self.add_rtt_sample(latency)
+
+    def mark_turn_start(self, websocket):
+        """用户说完话、开始生成回复，距离上次采样太久时顺便测一次往返时延"""
+        self.turn_start = time.monotonic()
+        if not self.adaptive or websocket is None:
+            return
+        if (
+            self._last_sample_time is not None
+            and time.monotonic() - self._last_sample_time < self.rtt_probe_interval
+        ):
+            return
+        if self._probe_task is None or self._probe_task.done():
+            self._probe_task = asyncio.create_task(self._probe_rtt(websocket))
+
+    async def _probe_rtt(self, websocket):
+        try:
+            start = time.monotonic()
+            pong_waiter = await websocket.ping()
+            await asyncio.wait_for(pong_waiter, timeout=5)
+            self.add_rtt_sample(time.monotonic() - start)
+            # 收到pong时 websocket.latency 也被更新为这次的测量值，
+            # 记下来避免 sample_websocket 再把它算作一次采样
+            self._last_latency = getattr(websocket, "latency", None)
+        except Exception:
+            pass
+
+    def target_lead_frames(self) -> int:
+        if not self.adaptive or self.srtt is None:
+            return self.default_lead_frames
+        lead = self.srtt / 2 + 4 * self.rttvar
+        frames = math.ceil(lead / self.frame_duration)
+        return min(self.max_lead_frames, max(self.min_lead_frames, frames))
+
+    def plan(self, first: bool) -> Tuple[int, float]:
+        """返回本段音频开头立即发送的帧数和客户端缓冲区中尚未播放的时长（秒）"""
+        now = time.monotonic()
+        if first:
+            # 新一轮回复，客户端缓冲区视为空
+            self.playout_end = now
+            if self.turn_start is not None:
+                first_audio_ms = (now - self.turn_start) * 1000
+                self.turn_start = None
+                self.turns += 1
+                self.last_first_audio_ms = first_audio_ms
+                self.first_audio_total_ms += first_audio_ms
+            return self.target_lead_frames(), 0.0
+
+        buffered = self.playout_end - now
+        if buffered < 0:
+            # 上一段已经播完，下一段还没发出，客户端出现停顿
+            self.underruns += 1
+            buffered = 0.0
+        if not self.adaptive:
+            return 0, buffered
+        buffered_frames = int(buffered / self.frame_duration)
+        return max(0, self.target_lead_frames() - buffered_frames), buffered
+
+    def finish(self, stream: AudioStream):
+        """一段音频发送完成，更新客户端播完的估计时刻"""
+        self.playout_end = stream.playout_start + stream.position * self.frame_duration
+        if stream.underrun:
+            self.underruns += 1
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "srtt_ms": round(self.srtt * 1000, 1) if self.srtt is not None else None,
+            "rttvar_ms": round(self.rttvar * 1000, 1),
+            "rtt_samples": self.rtt_samples,
+            "lead_frames": self.target_lead_frames(),
+            "turns": self.turns,
+            "last_first_audio_ms": (
+                round(self.last_first_audio_ms, 1)
+                if self.last_first_audio_ms is not None
+                else None
+            ),
+            "avg_first_audio_ms": (
+                round(self.first_audio_total_ms / self.turns, 1) if self.turns else None
+            ),
+            "underruns": self.underruns,
+        }
+
+
+_audio_pacer: Optional[AudioPacer] = None
+_audio_pacer_lock = threading.Lock()
+
+
+def get_audio_pacer(config: Dict[str, Any] = None) -> AudioPacer:
+    """获取全局音频节拍器，首次调用时按配置创建"""
+    global _audio_pacer
+    if _audio_pacer is None:
+        with _audio_pacer_lock:
+            if _audio_pacer is None:
+                pacing_config = (config or {}).get("audio_pacing", {}) or {}
+                _audio_pacer = AudioPacer(
+                    tick_ms=int(pacing_config.get("tick_ms", 60)),
+                    batch_send=bool(pacing_config.get("batch_send", True)),
+                )
+    return _audio_pacer
@@ -0,0 +1,131 @@
+"""音乐预转码
+
+播放本地音乐原来要先把整首歌解码、编码成opus才能播放第一帧，
+要等好几秒，每台正在播放的设备还要占用几十MB内存。
+这里在后台线程把音乐逐个转码为p3文件，保存在原文件同目录的 .p3 文件夹下，
+播放时用 p3.iter_opus_from_file 边读边发，毫秒级开始播放，内存占用与歌曲长度无关。
+原文件比p3文件新（被替换过）时视为未转码，重新转码。
+"""
+
+import os
+import time
+import queue
+import threading
+from typing import Iterable, Optional
+from config.logger import setup_logging
+from core.utils import p3, audio_decoder
+from core.utils.util import iter_pcm_to_data
+
+TAG = __name__
+logger = setup_logging()
+
+P3_DIR_NAME = ".p3"
+
+
+def get_p3_path(file_path: str) -> str:
+    """音乐文件对应的p3文件路径"""
+    directory, name = os.path.split(os.path.abspath(file_path))
+    return os.path.join(directory, P3_DIR_NAME, name + ".p3")
+
+
+def get_transcoded_file(file_path: str) -> Optional[str]:
+    """返回可以直接边读边播放的p3文件，尚未转码或转码已过期时返回None"""
+    if file_path.endswith(".p3"):
+        return file_path
+    p3_path = get_p3_path(file_path)
+    try:
+        if os.path.getmtime(p3_path) >= os.path.getmtime(file_path):
+            return p3_path
+    except OSError:
+        pass
+    return None
+
+
+class AudioTranscoder:
+    """单个后台线程按提交顺序逐个转码，不和对话抢CPU"""
+
+    def __init__(self):
+        self._queue = queue.Queue()
+        self._pending = set()
+        self._lock = threading.Lock()
+        self._thread = None
+        self.transcoded = 0
+        self.failed = 0
+
+    def submit(self, file_path: str):
+        """提交转码任务，已转码或已在队列中的文件直接跳过"""
+        file_path = os.path.abspath(file_path)
+        if get_transcoded_file(file_path):
+            return
+        with self._lock:
+            if file_path in self._pending:
+                return
+            self._pending.add(file_path)
+            self._queue.put(file_path)
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(
+                    target=self._worker, name="audio_transcoder", daemon=True
+                )
+                self._thread.start()
+
+    def submit_all(self, file_paths: Iterable[str]):
+        for file_path in file_paths:
+            self.submit(file_path)
+
+    def _worker(self):
+        while True:
+            try:
+                file_path = self._queue.get(timeout=60)
+            except queue.Empty:
+                with self._lock:
+                    if self._queue.empty():
+                        self._thread = None
+                        return
+                continue
+            try:
+                if not get_transcoded_file(file_path):
+                    self.transcode(file_path)
+            except Exception as e:
+                self.failed += 1
+                logger.bind(tag=TAG).warning(f"音乐转码失败: {file_path}, {e}")
+            finally:
+                with self._lock:
+                    self._pending.discard(file_path)
+
+    def transcode(self, file_path: str) -> str:
+        """把音频文件转码为p3文件，先写临时文件再替换，播放中途不会读到半个文件"""
+        start = time.perf_counter()
+        file_type = os.path.splitext(file_path)[1].lstrip(".")
+        with open(file_path, "rb") as f:
+            audio_bytes = f.read()
+        opus_packets = audio_decoder.get_opus_passthrough(audio_bytes, file_type)
+        if opus_packets is None:
+            pcm_data = audio_decoder.decode_to_pcm(audio_bytes, file_type)
+            del audio_bytes
+            opus_packets = iter_pcm_to_data(pcm_data, is_opus=True)
+
+        p3_path = get_p3_path(file_path)
+        os.makedirs(os.path.dirname(p3_path), exist_ok=True)
+        tmp_path = p3_path + ".tmp"
+        count = p3.write_opus_to_file(tmp_path, opus_packets)
+        os.replace(tmp_path, p3_path)
+        self.transcoded += 1
+        logger.bind(tag=TAG).info(
+            f"音乐转码完成: {os.path.basename(file_path)}, 时长{count * 0.06:.0f}秒, "
+            f"耗时{time.perf_counter() - start:.1f}秒"
+        )
+        return p3_path
+
+
+_transcoder: Optional[AudioTranscoder] = None
+_transcoder_lock = threading.Lock()
+
+
+def get_audio_transcoder() -> AudioTranscoder:
+    """获取全局音乐转码器"""
+    global _transcoder
+    if _transcoder is None:
+        with _transcoder_lock:
+            if _transcoder is None:
+                _transcoder = AudioTranscoder()
+    return _transcoder
@@ -0,0 +1,620 @@
+"""文本情感分析
+
+每句话下发音频前都要分析一次情感。原来每次调用都重建关键词表，
+再对每个情感的每个关键词做一次子串查找，耗时与 情感数 × 关键词数 × 文本长度 成正比。
+这里在导入时把全部关键词和特殊句型短语编译成一个 Aho-Corasick 自动机，
+每个关键词记录它属于哪些情感（同一关键词在一个情感中出现多次时权重相应增加），
+分析时只需扫描一遍文本；结果与原实现完全一致，重复的句子直接使用缓存结果。
+"""
+
+import re
+from functools import lru_cache
+from typing import Dict, List, Tuple
+
+emoji_map = {
+    "neutral": "😶",
+    "happy": "🙂",
+    "laughing": "😆",
+    "funny": "😂",
+    "sad": "😔",
+    "angry": "😠",
+    "crying": "😭",
+    "loving": "😍",
+    "embarrassed": "😳",
+    "surprised": "😲",
+    "shocked": "😱",
+    "thinking": "🤔",
+    "winking": "😉",
+    "cool": "😎",
+    "relaxed": "😌",
+    "delicious": "🤤",
+    "kissy": "😘",
+    "confident": "😏",
+    "sleepy": "😴",
+    "silly": "😜",
+    "confused": "🙄",
+}
+
+# 情感关键词映射（中英文扩展版）
+EMOTION_KEYWORDS = {
+    "happy": [
+        "开心",
+        "高兴",
+        "快乐",
+        "愉快",
+        "幸福",
+        "满意",
+        "棒",
+        "好",
+        "不错",
+        "完美",
+        "棒极了",
+        "太好了",
+        "好呀",
+        "好的",
+        "happy",
+        "joy",
+        "great",
+        "good",
+        "nice",
+        "awesome",
+        "fantastic",
+        "wonderful",
+    ],
+    "laughing": [
+        "哈哈",
+        "哈哈哈",
+        "呵呵",
+        "嘿嘿",
+        "嘻嘻",
+        "笑死",
+        "太好笑了",
+        "笑死我了",
+        "lol",
+        "lmao",
+        "haha",
+        "hahaha",
+        "hehe",
+        "rofl",
+        "funny",
+        "laugh",
+    ],
+    "funny": [
+        "搞笑",
+        "滑稽",
+        "逗",
+        "幽默",
+        "笑点",
+        "段子",
+        "笑话",
+        "太逗了",
+        "hilarious",
+        "joke",
+        "comedy",
+    ],
+    "sad": [
+        "伤心",
+        "难过",
+        "悲哀",
+        "悲伤",
+        "忧郁",
+        "郁闷",
+        "沮丧",
+        "失望",
+        "想哭",
+        "难受",
+        "不开心",
+        "唉",
+        "呜呜",
+        "sad",
+        "upset",
+        "unhappy",
+        "depressed",
+        "sorrow",
+        "gloomy",
+    ],
+    "angry": [
+        "生气",
+        "愤怒",
+        "气死",
+        "讨厌",
+        "烦人",
+        "可恶",
+        "烦死了",
+        "恼火",
+        "暴躁",
+        "火大",
+        "愤怒",
+        "气炸了",
+        "angry",
+        "mad",
+        "annoyed",
+        "furious",
+        "pissed",
+        "hate",
+    ],
+    "crying": [
+        "哭泣",
+        "泪流",
+        "大哭",
+        "伤心欲绝",
+        "泪目",
+        "流泪",
+        "哭死",
+        "哭晕",
+        "想哭",
+        "泪崩",
+        "cry",
+        "crying",
+        "tears",
+        "sob",
+        "weep",
+    ],
+    "loving": [
+        "爱你",
+        "喜欢",
+        "爱",
+        "亲爱的",
+        "宝贝",
+        "么么哒",
+        "抱抱",
+        "想你",
+        "思念",
+        "最爱",
+        "亲亲",
+        "喜欢你",
+        "love",
+        "like",
+        "adore",
+        "darling",
+        "sweetie",
+        "honey",
+        "miss you",
+        "heart",
+    ],
+    "embarrassed": [
+        "尴尬",
+        "不好意思",
+        "害羞",
+        "脸红",
+        "难为情",
+        "社死",
+        "丢脸",
+        "出丑",
+        "embarrassed",
+        "awkward",
+        "shy",
+        "blush",
+    ],
+    "surprised": [
+        "惊讶",
+        "吃惊",
+        "天啊",
+        "哇塞",
+        "哇",
+        "居然",
+        "竟然",
+        "没想到",
+        "出乎意料",
+        "surprise",
+        "wow",
+        "omg",
+        "oh my god",
+        "amazing",
+        "unbelievable",
+    ],
+    "shocked": [
+        "震惊",
+        "吓到",
+        "惊呆了",
+        "不敢相信",
+        "震撼",
+        "吓死",
+        "恐怖",
+        "害怕",
+        "吓人",
+        "shocked",
+        "shocking",
+        "scared",
+        "frightened",
+        "terrified",
+        "horror",
+    ],
+    "thinking": [
+        "思考",
+        "考虑",
+        "想一下",
+        "琢磨",
+        "沉思",
+        "冥想",
+        "想",
+        "思考中",
+        "在想",
+        "think",
+        "thinking",
+        "consider",
+        "ponder",
+        "meditate",
+    ],
+    "winking": [
+        "调皮",
+        "眨眼",
+        "你懂的",
+        "坏笑",
+        "邪恶",
+        "奸笑",
+        "使眼色",
+        "wink",
+        "teasing",
+        "naughty",
+        "mischievous",
+    ],
+    "cool": [
+        "酷",
+        "帅",
+        "厉害",
+        "棒极了",
+        "真棒",
+        "牛逼",
+        "强",
+        "优秀",
+        "杰出",
+        "出色",
+        "完美",
+        "cool",
+        "awesome",
+        "amazing",
+        "great",
+        "impressive",
+        "perfect",
+    ],
+    "relaxed": [
+        "放松",
+        "舒服",
+        "惬意",
+        "悠闲",
+        "轻松",
+        "舒适",
+        "安逸",
+        "自在",
+        "relax",
+        "relaxed",
+        "comfortable",
+        "cozy",
+        "chill",
+        "peaceful",
+    ],
+    "delicious": [
+        "好吃",
+        "美味",
+        "香",
+        "馋",
+        "可口",
+        "香甜",
+        "大餐",
+        "大快朵颐",
+        "流口水",
+        "垂涎",
+        "delicious",
+        "yummy",
+        "tasty",
+        "yum",
+        "appetizing",
+        "mouthwatering",
+    ],
+    "kissy": [
+        "亲亲",
+        "么么",
+        "吻",
+        "mua",
+        "muah",
+        "亲一下",
+        "飞吻",
+        "kiss",
+        "xoxo",
+        "hug",
+        "muah",
+        "smooch",
+    ],
+    "confident": [
+        "自信",
+        "肯定",
+        "确定",
+        "毫无疑问",
+        "当然",
+        "必须的",
+        "毫无疑问",
+        "确信",
+        "坚信",
+        "confident",
+        "sure",
+        "certain",
+        "definitely",
+        "positive",
+    ],
+    "sleepy": [
+        "困",
+        "睡觉",
+        "晚安",
+        "想睡",
+        "好累",
+        "疲惫",
+        "疲倦",
+        "困了",
+        "想休息",
+        "睡意",
+        "sleep",
+        "sleepy",
+        "tired",
+        "exhausted",
+        "bedtime",
+        "good night",
+    ],
+    "silly": [
+        "傻",
+        "笨",
+        "呆",
+        "憨",
+        "蠢",
+        "二",
+        "憨憨",
+        "傻乎乎",
+        "呆萌",
+        "silly",
+        "stupid",
+        "dumb",
+        "foolish",
+        "goofy",
+        "ridiculous",
+    ],
+    "confused": [
+        "疑惑",
+        "不明白",
+        "不懂",
+        "困惑",
+        "疑问",
+        "为什么",
+        "怎么回事",
+        "啥意思",
+        "不清楚",
+        "confused",
+        "puzzled",
+        "doubt",
+        "question",
+        "what",
+        "why",
+        "how",
+    ],
+}
+
+# 特殊句型（中英文）
+# 赞美他人
+PRAISE_OTHERS_PHRASES = [
+    "你真",
+    "你好",
+    "您真",
+    "你真棒",
+    "你好厉害",
+    "你太强了",
+    "你真好",
+    "你真聪明",
+    "you are",
+    "you're",
+    "you look",
+    "you seem",
+    "so smart",
+    "so kind",
+]
+# 自我赞美
+PRAISE_SELF_PHRASES = [
+    "我真",
+    "我最",
+    "我太棒了",
+    "我厉害",
+    "我聪明",
+    "我优秀",
+    "i am",
+    "i'm",
+    "i feel",
+    "so good",
+    "so happy",
+]
+# 晚安/睡觉相关
+SLEEP_PHRASES = [
+    "睡觉",
+    "晚安",
+    "睡了",
+    "好梦",
+    "休息了",
+    "去睡了",
+    "sleep",
+    "good night",
+    "bedtime",
+    "go to bed",
+]
+
+# 如果多个情感同分，使用以下优先级
+PRIORITY_ORDER = [
+    "laughing",
+    "crying",
+    "angry",
+    "surprised",
+    "shocked",  # 强烈情感优先
+    "loving",
+    "happy",
+    "funny",
+    "cool",  # 积极情感
+    "sad",
+    "embarrassed",
+    "confused",  # 消极情感
+    "thinking",
+    "winking",
+    "relaxed",  # 中性情感
+    "delicious",
+    "kissy",
+    "confident",
+    "sleepy",
+    "silly",  # 特殊场景
+]
+
+_PRAISE_OTHERS = "#praise_others"
+_PRAISE_SELF = "#praise_self"
+_SLEEP = "#sleep"
+_POSITIVE_EMOTIONS = ("happy", "laughing", "cool")
+_NEGATIVE_EMOTIONS = ("angry", "sad", "crying")
+
+_EMOJI_ORDER = {emoji: index for index, emoji in enumerate(emoji_map.values())}
+_EMOJI_EMOTIONS = list(emoji_map.keys())
+_EMOJI_PATTERN = re.compile("|".join(map(re.escape, emoji_map.values())))
+
+
+class KeywordAutomaton:
+    """Aho-Corasick 多模式匹配自动机，一次扫描找出文本中全部关键词的全部出现位置"""
+
+    def __init__(self, keywords: Dict[str, Dict[str, int]]):
+        # 状态0为根节点；goto[state][char] -> 下一状态
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        # 每个状态结束的关键词编号（包括沿失败链可达的）
+        self._output: List[Tuple[int, ...]] = [()]
+        self.keywords = list(keywords)
+        self.lengths = [len(keyword) for keyword in self.keywords]
+        self.weights = [keywords[keyword] for keyword in self.keywords]
+
+        outputs: List[List[int]] = [[]]
+        for index, keyword in enumerate(self.keywords):
+            state = 0
+            for char in keyword:
+                next_state = self._goto[state].get(char)
+                if next_state is None:
+                    next_state = len(self._goto)
+                    self._goto[state][char] = next_state
+                    self._goto.append({})
+                    self._fail.append(0)
+                    outputs.append([])
+                state = next_state
+            outputs[state].append(index)
+
+        # 按广度优先顺序计算失败指针，并合并失败链上的输出
+        queue = list(self._goto[0].values())
+        for state in queue:
+            for char, next_state in self._goto[state].items():
+                queue.append(next_state)
+                fail = self._fail[state]
+                while fail and char not in self._goto[fail]:
+                    fail = self._fail[fail]
+                fail = self._goto[fail].get(char, 0)
+                self._fail[next_state] = fail if fail != next_state else 0
+                outputs[next_state].extend(outputs[self._fail[next_state]])
+        self._output = [tuple(output) for output in outputs]
+
+    def count(self, text: str) -> Dict[int, int]:
+        """返回 关键词编号 -> 不重叠出现次数，计数方式与 str.count 相同"""
+        goto, fail, output, lengths = self._goto, self._fail, self._output, self.lengths
+        counts: Dict[int, int] = {}
+        next_start: Dict[int, int] = {}  # 关键词下一次不重叠出现的最小起始位置
+        state = 0
+        for position, char in enumerate(text):
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            for index in output[state]:
+                start = position - lengths[index] + 1
+                if start >= next_start.get(index, 0):
+                    counts[index] = counts.get(index, 0) + 1
+                    next_start[index] = position + 1
+        return counts
+
+
+def _build_automaton() -> KeywordAutomaton:
+    keywords: Dict[str, Dict[str, int]] = {}
+    for emotion, words in EMOTION_KEYWORDS.items():
+        for word in words:
+            weights = keywords.setdefault(word, {})
+            weights[emotion] = weights.get(emotion, 0) + 1
+    for label, phrases in (
+        (_PRAISE_OTHERS, PRAISE_OTHERS_PHRASES),
+        (_PRAISE_SELF, PRAISE_SELF_PHRASES),
+        (_SLEEP, SLEEP_PHRASES),
+    ):
+        for phrase in phrases:
+            keywords.setdefault(phrase, {})[label] = 1
+    return KeywordAutomaton(keywords)
+
+
+_automaton = _build_automaton()
+
+
+def analyze_emotion(text):
+    """
+    分析文本情感并返回对应的emoji名称（支持中英文）
+    """
+    if not text or not isinstance(text, str):
+        return "neutral"
+    return _analyze_emotion(text)
+
+
+@lru_cache(maxsize=4096)
+def _analyze_emotion(original_text: str) -> str:
+    text = original_text.lower().strip()
+
+    # 检查是否包含现有emoji，按emoji_map中的顺序取第一个
+    emojis = _EMOJI_PATTERN.findall(original_text)
+    if emojis:
+        return _EMOJI_EMOTIONS[min(_EMOJI_ORDER[emoji] for emoji in emojis)]
+
+    # 标点符号分析
+    has_exclamation = "!" in original_text or "！" in original_text
+    has_question = "?" in original_text or "？" in original_text
+    has_ellipsis = "..." in original_text or "…" in original_text
+
+    # 一次扫描得到各情感（和特殊句型）命中的关键词数及出现次数
+    matched: Dict[str, int] = {}
+    occurrences: Dict[str, int] = {}
+    weights = _automaton.weights
+    for index, count in _automaton.count(text).items():
+        for label, weight in weights[index].items():
+            matched[label] = matched.get(label, 0) + weight
+            occurrences[label] = occurrences.get(label, 0) + count * weight
+
+    if _PRAISE_OTHERS in matched:
+        return "loving"
+    if _PRAISE_SELF in matched:
+        return "cool"
+    if _SLEEP in matched:
+        return "sleepy"
+    # 疑问句
+    if has_question and not has_exclamation:
+        return "thinking"
+    # 强烈情感（感叹号）
+    if has_exclamation and not has_question:
+        if any(emotion in matched for emotion in _POSITIVE_EMOTIONS):
+            return "laughing"
+        if any(emotion in matched for emotion in _NEGATIVE_EMOTIONS):
+            return "angry"
+        return "surprised"
+    # 省略号（表示犹豫或思考）
+    if has_ellipsis:
+        return "thinking"
+
+    # 关键词匹配（带权重），长文本中的重复关键词额外加分
+    long_text = len(text) > 20
+    emotion_scores = {}
+    for emotion in emoji_map.keys():
+        score = matched.get(emotion, 0)
+        if long_text:
+            score += occurrences.get(emotion, 0) * 0.5
+        emotion_scores[emotion] = score
+
+    # 根据分数选择最可能的情感
+    max_score = max(emotion_scores.values())
+    if max_score == 0:
+        return "happy"  # 默认
+
+    # 可能有多个情感同分，根据上下文选择最合适的
+    top_emotions = [e for e, s in emotion_scores.items() if s == max_score]
+    for emotion in PRIORITY_ORDER:
+        if emotion in top_emotions:
+            return emotion
+
+    return top_emotions[0]  # 如果都不在优先级列表里，返回第一个
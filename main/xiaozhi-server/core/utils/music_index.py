@@ -0,0 +1,276 @@
+"""本地音乐检索索引
+
+原来每次点歌都要 rglob 扫描整个音乐目录，再用 difflib 和每一首歌逐个比较，
+曲库有几万首时单次点歌要几百毫秒。这里维护一个持久化的索引：
+- 扫描时按目录修改时间增量更新，目录没有增删文件就直接复用上次的文件列表
+- 歌名规范化（全半角、大小写、去标点）后建立字的二元组倒排索引，
+  安装了 pypinyin 时同时建立拼音音节的倒排索引，语音识别出的同音字也能命中
+- 点歌时先按倒排索引取出重合度最高的少量候选，只对候选用 difflib 精排
+索引保存在 data/.music_index.json，服务重启后不需要重新计算拼音。
+"""
+
+import os
+import re
+import json
+import heapq
+import difflib
+import threading
+import unicodedata
+from collections import Counter
+from typing import Dict, List, Optional, Sequence, Tuple
+from config.logger import setup_logging
+from config.config_loader import get_project_dir
+
+try:
+    from pypinyin import lazy_pinyin
+except ImportError:
+    lazy_pinyin = None
+
+TAG = __name__
+logger = setup_logging()
+
+INDEX_VERSION = 1
+_non_word_pattern = re.compile(r"[\W_]+")
+
+
+def normalize_name(name: str) -> str:
+    """规范化歌名：全角转半角、转小写、去掉空白和标点"""
+    return _non_word_pattern.sub("", unicodedata.normalize("NFKC", name).lower())
+
+
+def to_pinyin(text: str) -> Tuple[str, ...]:
+    """转为不带声调的拼音音节，未安装 pypinyin 时返回空元组"""
+    if lazy_pinyin is None or not text:
+        return ()
+    return tuple(lazy_pinyin(text))
+
+
+def _grams(norm: str, syllables: Sequence[str]) -> List[str]:
+    """字二元组和拼音音节二元组，名字只有一个字/音节时用单字"""
+    grams = [norm[i : i + 2] for i in range(len(norm) - 1)] or [norm]
+    if syllables:
+        if len(syllables) > 1:
+            grams.extend(
+                f"{syllables[i]} {syllables[i + 1]}" for i in range(len(syllables) - 1)
+            )
+        else:
+            grams.append(f"{syllables[0]} ")
+    return grams
+
+
+class _Snapshot:
+    """一次构建出的只读检索结构，刷新时整体替换，检索无需加锁"""
+
+    def __init__(self, files: List[str], entries: Dict[str, list]):
+        self.files = files
+        self.names = []  # 去掉扩展名的相对路径，与原来的匹配对象相同
+        self.norms = []
+        self.pinyins = []
+        self.gram_counts = []
+        self.postings: Dict[str, List[int]] = {}
+        self.char_postings: Dict[str, List[int]] = {}
+        for doc_id, music_file in enumerate(files):
+            norm, syllables = entries[music_file]
+            grams = set(_grams(norm, syllables))
+            self.names.append(os.path.splitext(music_file)[0])
+            self.norms.append(norm)
+            self.pinyins.append(" ".join(syllables))
+            self.gram_counts.append(len(grams))
+            for gram in grams:
+                self.postings.setdefault(gram, []).append(doc_id)
+            for char in set(norm):
+                self.char_postings.setdefault(char, []).append(doc_id)
+
+
+class MusicIndex:
+    def __init__(
+        self,
+        music_dir: str,
+        music_ext: Sequence[str],
+        index_file: Optional[str] = None,
+    ):
+        self.music_dir = os.path.abspath(music_dir)
+        self.music_ext = tuple(ext.lower() for ext in music_ext)
+        self.index_file = index_file
+        # 相对目录 -> [修改时间, 音乐文件名列表, 子目录名列表]
+        self._dirs: Dict[str, list] = {}
+        # 相对路径 -> [规范化歌名, 拼音音节]
+        self._entries: Dict[str, list] = {}
+        self._snapshot = _Snapshot([], {})
+        self._lock = threading.Lock()
+        self.scanned_dirs = 0
+        if self.index_file:
+            self._load()
+
+    @property
+    def files(self) -> List[str]:
+        return self._snapshot.files
+
+    @property
+    def names(self) -> List[str]:
+        return self._snapshot.names
+
+    def refresh(self) -> bool:
+        """增量扫描音乐目录，返回文件列表是否有变化"""
+        with self._lock:
+            self.scanned_dirs = 0
+            dirs: Dict[str, list] = {}
+            files: List[str] = []
+            self._scan_dir("", dirs, files)
+            changed = dirs != self._dirs or files != self._snapshot.files
+            self._dirs = dirs
+            if changed:
+                self._rebuild(files)
+                if self.index_file:
+                    self._save()
+            return changed
+
+    def update(self, files: List[str]):
+        """按给定的文件列表（相对路径）重建检索结构，不访问文件系统"""
+        with self._lock:
+            self._rebuild(list(files))
+
+    def _scan_dir(self, rel_dir: str, dirs: Dict[str, list], files: List[str]):
+        path = os.path.join(self.music_dir, rel_dir)
+        try:
+            mtime = os.stat(path).st_mtime
+        except OSError:
+            return
+        cached = self._dirs.get(rel_dir)
+        if cached is not None and cached[0] == mtime:
+            # 目录没有增删文件，复用上次的列表，只需继续检查子目录
+            entry = cached
+        else:
+            self.scanned_dirs += 1
+            music_files, sub_dirs = [], []
+            try:
+                with os.scandir(path) as it:
+                    for item in it:
+                        # 跳过 .p3 等隐藏目录和文件
+                        if item.name.startswith("."):
+                            continue
+                        if item.is_dir():
+                            sub_dirs.append(item.name)
+                        elif (
+                            item.is_file()
+                            and os.path.splitext(item.name)[1].lower() in self.music_ext
+                        ):
+                            music_files.append(item.name)
+            except OSError:
+                return
+            entry = [mtime, sorted(music_files), sorted(sub_dirs)]
+        dirs[rel_dir] = entry
+        files.extend(os.path.join(rel_dir, name) for name in entry[1])
+        for name in entry[2]:
+            self._scan_dir(os.path.join(rel_dir, name), dirs, files)
+
+    def _rebuild(self, files: List[str]):
+        entries = {}
+        for music_file in files:
+            entry = self._entries.get(music_file)
+            if entry is None:
+                norm = normalize_name(os.path.splitext(music_file)[0])
+                entry = [norm, to_pinyin(norm)]
+            entries[music_file] = entry
+        self._entries = entries
+        self._snapshot = _Snapshot(files, entries)
+
+    def candidates(self, query: str, top_k: int = 20) -> List[int]:
+        """按倒排索引返回与查询重合度最高的候选编号"""
+        norm = normalize_name(query)
+        return self._candidates(self._snapshot, norm, to_pinyin(norm), top_k)
+
+    @staticmethod
+    def _candidates(
+        snapshot: _Snapshot, norm: str, syllables: Sequence[str], top_k: int
+    ) -> List[int]:
+        if not norm:
+            return []
+        grams = set(_grams(norm, syllables))
+        counts = Counter()
+        for gram in grams:
+            counts.update(snapshot.postings.get(gram, ()))
+        if not counts:
+            # 没有任何二元组重合时退化为按单字重合
+            for char in set(norm):
+                counts.update(snapshot.char_postings.get(char, ()))
+            return heapq.nlargest(top_k, counts, key=counts.__getitem__)
+
+        # 按二元组集合的Dice系数排序，长歌名不会因为二元组多而占优
+        def score(doc_id):
+            return 2 * counts[doc_id] / (len(grams) + snapshot.gram_counts[doc_id])
+
+        return heapq.nlargest(top_k, counts, key=score)
+
+    def search(
+        self, query: str, top_k: int = 20, min_ratio: float = 0.4
+    ) -> Optional[str]:
+        """返回最匹配的音乐文件（相对路径），相似度都不超过 min_ratio 时返回None"""
+        snapshot = self._snapshot
+        norm = normalize_name(query)
+        syllables = to_pinyin(norm)
+        query_pinyin = " ".join(syllables)
+        best_match = None
+        highest_ratio = min_ratio
+        for doc_id in self._candidates(snapshot, norm, syllables, top_k):
+            ratio = max(
+                difflib.SequenceMatcher(None, query, snapshot.names[doc_id]).ratio(),
+                difflib.SequenceMatcher(None, norm, snapshot.norms[doc_id]).ratio(),
+            )
+            if query_pinyin and snapshot.pinyins[doc_id]:
+                ratio = max(
+                    ratio,
+                    difflib.SequenceMatcher(
+                        None, query_pinyin, snapshot.pinyins[doc_id]
+                    ).ratio(),
+                )
+            if ratio > highest_ratio:
+                highest_ratio = ratio
+                best_match = snapshot.files[doc_id]
+        return best_match
+
+    def _load(self):
+        try:
+            with open(self.index_file, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return
+        except Exception as e:
+            logger.bind(tag=TAG).warning(f"读取音乐索引失败，将重新构建: {e}")
+            return
+        if (
+            data.get("version") != INDEX_VERSION
+            or data.get("music_dir") != self.music_dir
+            or tuple(data.get("music_ext", ())) != self.music_ext
+            or bool(data.get("pinyin")) != (lazy_pinyin is not None)
+        ):
+            return
+        self._dirs = data["dirs"]
+        self._entries = {
+            music_file: [norm, tuple(syllables)]
+            for music_file, (norm, syllables) in data["entries"].items()
+        }
+        self._snapshot = _Snapshot(data["files"], self._entries)
+
+    def _save(self):
+        data = {
+            "version": INDEX_VERSION,
+            "music_dir": self.music_dir,
+            "music_ext": list(self.music_ext),
+            "pinyin": lazy_pinyin is not None,
+            "dirs": self._dirs,
+            "files": self._snapshot.files,
+            "entries": self._entries,
+        }
+        tmp_file = self.index_file + ".tmp"
+        try:
+            os.makedirs(os.path.dirname(self.index_file), exist_ok=True)
+            with open(tmp_file, "w", encoding="utf-8") as f:
+                json.dump(data, f, ensure_ascii=False)
+            os.replace(tmp_file, self.index_file)
+        except Exception as e:
+            logger.bind(tag=TAG).warning(f"保存音乐索引失败: {e}")
+
+
+def get_index_file() -> str:
+    return get_project_dir() + "data/.music_index.json"
@@ -36,8 +36,11 @@ class OpusEncoderUtils:
         self.bitrate = 24000  # bps
         self.complexity = 10  # 最高质量
 
-        # 缓冲区初始化为空
-        self.buffer = np.array([], dtype=np.int16)
+        # 不足一帧的剩余样本保存在固定大小的缓冲区中，避免每次追加都重新分配和拷贝
+        self.buffer = np.zeros(self.total_frame_size, dtype=np.int16)
+        self.buffered = 0
+        # 上次输入为奇数字节时，留下的半个样本
+        self.pending_byte = b""
 
         try:
             # 创建Opus编码器
@@ -54,7 +57,8 @@ class OpusEncoderUtils:
     def reset_state(self):
         """重置编码器状态"""
         self.encoder.reset_state()
-        self.buffer = np.array([], dtype=np.int16)
+        self.buffered = 0
+        self.pending_byte = b""
 
     def encode_pcm_to_opus(self, pcm_data: bytes, end_of_stream: bool) -> List[bytes]:
         """
@@ -67,39 +71,55 @@ class OpusEncoderUtils:
         Returns:
             Opus数据包列表
         """
-        # 将字节数据转换为short数组
+        if self.pending_byte:
+            pcm_data = self.pending_byte + pcm_data
+            self.pending_byte = b""
+        if len(pcm_data) & 1:
+            # 网络分片可能把一个样本拆开，留到下次再处理
+            self.pending_byte = pcm_data[-1:]
+            pcm_data = pcm_data[:-1]
+
+        # 将字节数据转换为short数组（不拷贝）
         new_samples = self._convert_bytes_to_shorts(pcm_data)
-
-        # 校验PCM数据
-        self._validate_pcm_data(new_samples)
-
-        # 将新数据追加到缓冲区
-        self.buffer = np.append(self.buffer, new_samples)
-
+        frame_size = self.total_frame_size
         opus_packets = []
         offset = 0
 
-        # 处理所有完整帧
-        while offset <= len(self.buffer) - self.total_frame_size:
-            frame = self.buffer[offset : offset + self.total_frame_size]
-            output = self._encode(frame)
+        # 先用新数据补满缓冲区中不足一帧的部分
+        if self.buffered:
+            take = min(frame_size - self.buffered, len(new_samples))
+            self.buffer[self.buffered : self.buffered + take] = new_samples[:take]
+            self.buffered += take
+            offset = take
+            if self.buffered == frame_size:
+                output = self._encode(self.buffer)
+                if output:
+                    opus_packets.append(output)
+                self.buffered = 0
+
+        # 完整帧直接从输入数据上编码
+        while offset + frame_size <= len(new_samples):
+            output = self._encode(new_samples[offset : offset + frame_size])
             if output:
                 opus_packets.append(output)
-            offset += self.total_frame_size
+            offset += frame_size
 
         # 保留未处理的样本
-        self.buffer = self.buffer[offset:]
+        remaining = len(new_samples) - offset
+        if remaining:
+            self.buffer[:remaining] = new_samples[offset:]
+            self.buffered = remaining
 
         # 流结束时处理剩余数据
-        if end_of_stream and len(self.buffer) > 0:
-            # 创建最后一帧并用0填充
-            last_frame = np.zeros(self.total_frame_size, dtype=np.int16)
-            last_frame[: len(self.buffer)] = self.buffer
-
-            output = self._encode(last_frame)
+        if end_of_stream and self.buffered > 0:
+            # 最后一帧用0填充
+            self.buffer[self.buffered :] = 0
+            output = self._encode(self.buffer)
             if output:
                 opus_packets.append(output)
-            self.buffer = np.array([], dtype=np.int16)
+            self.buffered = 0
+        if end_of_stream:
+            self.pending_byte = b""
 
         return opus_packets
 
@@ -121,15 +141,6 @@ class OpusEncoderUtils:
         # 假设输入是小端字节序的16位PCM
         return np.frombuffer(bytes_data, dtype=np.int16)
 
-    def _validate_pcm_data(self, pcm_shorts: np.ndarray) -> None:
-        """验证PCM数据是否有效"""
-        # 16位PCM数据范围是 -32768 到 32767
-        if np.any((pcm_shorts < -32768) | (pcm_shorts > 32767)):
-            invalid_samples = pcm_shorts[(pcm_shorts < -32768) | (pcm_shorts > 32767)]
-            logging.warning(f"发现无效PCM样本: {invalid_samples[:5]}...")
-            # 在实际应用中可以选择裁剪而不是抛出异常
-            # np.clip(pcm_shorts, -32768, 32767, out=pcm_shorts)
-
     def close(self):
         """关闭编码器并释放资源"""
         # opuslib没有明确的关闭方法，Python的垃圾回收会处理
@@ -56,4 +56,37 @@ def decode_opus_from_bytes(input_bytes):
         total_frames += 1
 
     total_duration = (total_frames * frame_duration_ms) / 1000.0
-    return opus_datas, total_duration
\ No newline at end of file
+    return opus_datas, total_duration
+
+def encode_opus_to_bytes(opus_datas):
+    """
+    将 Opus 数据包列表编码为p3二进制数据，每个数据包前加4字节头部：[1字节类型，1字节保留，2字节长度]。
+    """
+    return b"".join(struct.pack('>BBH', 0, 0, len(opus_data)) + opus_data for opus_data in opus_datas)
+
+def iter_opus_from_file(input_file):
+    """
+    逐个读取p3文件中的 Opus 数据包，不把整个文件读入内存，用于长音频边读边播放。
+    """
+    with open(input_file, 'rb') as f:
+        while True:
+            header = f.read(4)
+            if len(header) < 4:
+                break
+            _, _, data_len = struct.unpack('>BBH', header)
+            opus_data = f.read(data_len)
+            if len(opus_data) != data_len:
+                raise ValueError(f"Data length({len(opus_data)}) mismatch({data_len}) in the file.")
+            yield opus_data
+
+def write_opus_to_file(output_file, opus_datas):
+    """
+    将 Opus 数据包逐个写入p3文件，opus_datas 可以是边编码边产出的迭代器，返回写入的数据包数。
+    """
+    count = 0
+    with open(output_file, 'wb') as f:
+        for opus_data in opus_datas:
+            f.write(struct.pack('>BBH', 0, 0, len(opus_data)))
+            f.write(opus_data)
+            count += 1
+    return count
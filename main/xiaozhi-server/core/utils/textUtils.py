@@ -1,21 +1,28 @@
-def get_string_no_punctuation_or_emoji(s):
-    """去除字符串首尾的空格、标点符号和表情符号"""
-    chars = list(s)
-    # 处理开头的字符
-    start = 0
-    while start < len(chars) and is_punctuation_or_emoji(chars[start]):
-        start += 1
-    # 处理结尾的字符
-    end = len(chars) - 1
-    while end >= start and is_punctuation_or_emoji(chars[end]):
-        end -= 1
-    return "".join(chars[start : end + 1])
+# 表情符号所在的码位区间
+EMOJI_RANGES = (
+    (0x1F600, 0x1F64F),
+    (0x1F300, 0x1F5FF),
+    (0x1F680, 0x1F6FF),
+    (0x1F900, 0x1F9FF),
+    (0x1FA70, 0x1FAFF),
+    (0x2600, 0x26FF),
+    (0x2700, 0x27BF),
+)
 
 
-def is_punctuation_or_emoji(char):
-    """检查字符是否为空格、指定标点或表情符号"""
-    # 定义需要去除的中英文标点（包括全角/半角）
-    punctuation_set = {
+def build_strip_chars(punctuations):
+    """预先展开空白、指定标点和表情符号的全部字符，判断时只需一次集合查找"""
+    chars = set(punctuations)
+    # Unicode中的空白字符都不超过U+3000（全角空格）
+    chars.update(chr(code) for code in range(0x3001) if chr(code).isspace())
+    for start, end in EMOJI_RANGES:
+        chars.update(chr(code) for code in range(start, end + 1))
+    return frozenset(chars)
+
+
+# 需要去除的中英文标点（包括全角/半角）
+_STRIP_CHARS = build_strip_chars(
+    (
         "，",
         ",",  # 中文逗号 + 英文逗号
         "。",
@@ -29,18 +36,26 @@ def is_punctuation_or_emoji(char):
         "]",  # 方括号
         "【",
         "】",  # 中文方括号
-    }
-    if char.isspace() or char in punctuation_set:
-        return True
-    # 检查表情符号（保留原有逻辑）
-    code_point = ord(char)
-    emoji_ranges = [
-        (0x1F600, 0x1F64F),
-        (0x1F300, 0x1F5FF),
-        (0x1F680, 0x1F6FF),
-        (0x1F900, 0x1F9FF),
-        (0x1FA70, 0x1FAFF),
-        (0x2600, 0x26FF),
-        (0x2700, 0x27BF),
-    ]
-    return any(start <= code_point <= end for start, end in emoji_ranges)
+    )
+)
+
+
+def strip_chars(s, chars):
+    """去除字符串首尾属于 chars 集合的字符"""
+    start = 0
+    end = len(s)
+    while start < end and s[start] in chars:
+        start += 1
+    while end > start and s[end - 1] in chars:
+        end -= 1
+    return s[start:end]
+
+
+def get_string_no_punctuation_or_emoji(s):
+    """去除字符串首尾的空格、标点符号和表情符号"""
+    return strip_chars(s, _STRIP_CHARS)
+
+
+def is_punctuation_or_emoji(char):
+    """检查字符是否为空格、指定标点或表情符号"""
+    return char in _STRIP_CHARS
@@ -0,0 +1,142 @@
+"""流式文本分句
+
+大模型逐token输出回复，TTS需要边收边切出可以合成的句子。
+原来每来一个token都把全部文本重新拼接一遍，再对每个标点做一次rfind，
+回复越长越慢（与回复长度成平方关系）。这里只保留尚未切出的文本，
+并记住扫描位置，每个字符只扫描一次。
+
+切分规则：
+- 第一句（first_segment=comma）遇到第一个逗号等停顿标点就切出，尽快开始合成；
+  first_segment=sentence 时第一句也等到句末标点
+- 之后的句子在句末标点处切分，一次收到多句时合并为一段
+- 换行视为句末（markdown的标题、列表项）；行内代码和代码块中的标点不切分
+- 标点后已经到达的右引号、右括号、表情符号归入前一句，不会切开组合表情
+- 超过 max_length 仍没有句末标点时强制切分，优先在停顿标点、空白处切开
+"""
+
+import re
+from typing import Iterable, List
+
+# 句末标点后归入同一句的字符：右引号/括号、空白、表情符号及其组合字符
+_TRAILING_PATTERN = re.compile(
+    "[\\s\"'”’」』）)\\]】》\\u200d\\ufe0f\\u20e3"
+    "\\u2600-\\u27bf\\U0001f1e6-\\U0001f1ff\\U0001f300-\\U0001faff]*"
+)
+# 不能在其前面切分的字符：零宽连接符、变体选择符、肤色修饰符
+_JOINER_PATTERN = re.compile("[\\u200d\\ufe0f\\u20e3\\U0001f3fb-\\U0001f3ff]")
+# 非流式整段文本按句末标点分句，标点保留在句子末尾
+_SENTENCE_PATTERN = re.compile(r"[^。！？!?；;\n]+[。！？!?；;\n]*|[。！？!?；;\n]+")
+
+
+def _is_ascii_word(char: str) -> bool:
+    return char.isascii() and char.isalnum()
+
+
+def split_sentences(text: str) -> List[str]:
+    """把一段完整文本按句末标点切分成句子"""
+    if not text:
+        return []
+    return _SENTENCE_PATTERN.findall(text)
+
+
+class StreamingSegmenter:
+    def __init__(
+        self,
+        punctuations: Iterable[str],
+        first_punctuations: Iterable[str],
+        first_segment: str = "comma",
+        first_min_length: int = 0,
+        max_length: int = 120,
+    ):
+        self.sentence_marks = frozenset(punctuations) | {"\n"}
+        if first_segment == "sentence":
+            self.first_marks = self.sentence_marks
+        else:
+            self.first_marks = frozenset(first_punctuations) | {"\n"}
+        self.soft_marks = frozenset(first_punctuations)
+        self.first_min_length = max(0, first_min_length)
+        self.max_length = max(0, max_length)
+        self.reset()
+
+    def reset(self):
+        """开始新的一轮回复"""
+        self._pending = ""  # 尚未切出的文本
+        self._scan = 0  # _pending 中已扫描的位置
+        self._is_first = True
+        self._in_code = False
+        self._last_soft = 0  # 最后一个停顿标点之后的位置
+        self._last_space = 0  # 最后一个空白之后的位置
+
+    def push(self, text: str) -> List[str]:
+        """追加新到达的文本，返回可以合成的片段（保留首尾标点）"""
+        if not text:
+            return []
+        self._pending += text
+        pending = self._pending
+        length = len(pending)
+        segments = []
+        start = 0  # 当前片段在 _pending 中的起始位置
+        cut = -1  # 当前片段可切分的最远位置
+        i = self._scan
+        while i < length:
+            char = pending[i]
+            if char == "`":
+                self._in_code = not self._in_code
+            elif self._in_code:
+                pass
+            elif char in (self.first_marks if self._is_first else self.sentence_marks):
+                end = _TRAILING_PATTERN.match(pending, i + 1).end()
+                if not self._is_first:
+                    cut = end
+                elif len(pending[start:end].strip()) >= self.first_min_length:
+                    # 第一句在第一个停顿处就切出
+                    segments.append(pending[start:end])
+                    start = end
+                    self._is_first = False
+                i = end
+                continue
+            elif char in self.soft_marks:
+                self._last_soft = i + 1
+            elif char.isspace():
+                self._last_space = i + 1
+            i += 1
+
+        if cut > start:
+            segments.append(pending[start:cut])
+            start = cut
+        while self.max_length and length - start > self.max_length:
+            cut = self._force_cut(start)
+            segments.append(pending[start:cut])
+            start = cut
+            self._is_first = False
+
+        self._pending = pending[start:]
+        self._scan = length - start
+        self._last_soft = max(0, self._last_soft - start)
+        self._last_space = max(0, self._last_space - start)
+        return segments
+
+    def flush(self) -> str:
+        """回复结束，取出剩余的全部文本"""
+        remaining = self._pending
+        self.reset()
+        return remaining
+
+    def _force_cut(self, start: int) -> int:
+        """超长且没有句末标点时的切分位置"""
+        pending = self._pending
+        limit = start + self.max_length
+        # 至少保留三分之一的长度，避免切出过短的片段
+        floor = start + self.max_length // 3
+        for pos in (self._last_soft, self._last_space):
+            if floor < pos <= limit:
+                return pos
+        cut = limit
+        # 不切开组合表情和英文单词
+        while cut > floor and (
+            _JOINER_PATTERN.match(pending, cut)
+            or pending[cut - 1] == "\u200d"
+            or (_is_ascii_word(pending[cut - 1]) and _is_ascii_word(pending[cut]))
+        ):
+            cut -= 1
+        return cut if cut > floor else limit
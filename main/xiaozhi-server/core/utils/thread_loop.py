@@ -0,0 +1,84 @@
+"""线程级常驻事件循环
+
+TTS合成在工作线程中调用异步的 text_to_speak。原来每句话都调用一次 asyncio.run，
+每次都要新建、销毁事件循环，绑定在循环上的HTTP会话也随之失效，无法复用连接。
+这里为每个工作线程保留一个常驻事件循环和一个HTTP会话，线程结束时一并释放。
+每个线程各用各的循环，某个提供者在协程里做了阻塞调用也只会阻塞自己的线程。
+"""
+
+import asyncio
+import threading
+from config.logger import setup_logging
+
+TAG = __name__
+logger = setup_logging()
+
+_local = threading.local()
+
+
+class _ThreadLoop:
+    """保存在线程本地存储中，线程结束时随之回收"""
+
+    def __init__(self):
+        self.loop = asyncio.new_event_loop()
+        self.http_session = None
+
+    def close(self):
+        if self.loop.is_closed():
+            return
+        try:
+            if self.http_session is not None and not self.http_session.closed:
+                self.loop.run_until_complete(self.http_session.close())
+            self.loop.run_until_complete(self.loop.shutdown_asyncgens())
+        except Exception as e:
+            logger.bind(tag=TAG).debug(f"释放线程事件循环资源失败: {e}")
+        finally:
+            self.loop.close()
+
+    def __del__(self):
+        try:
+            self.close()
+        except Exception:
+            pass
+
+
+def _get_thread_loop() -> _ThreadLoop:
+    thread_loop = getattr(_local, "thread_loop", None)
+    if thread_loop is None or thread_loop.loop.is_closed():
+        thread_loop = _ThreadLoop()
+        _local.thread_loop = thread_loop
+    return thread_loop
+
+
+def get_thread_event_loop() -> asyncio.AbstractEventLoop:
+    """获取当前线程的常驻事件循环"""
+    return _get_thread_loop().loop
+
+
+def run_in_thread_loop(coro):
+    """在当前线程的常驻事件循环中执行协程，用于替代 asyncio.run
+
+    不能在正在运行事件循环的线程中调用
+    """
+    return get_thread_event_loop().run_until_complete(coro)
+
+
+def get_thread_http_session():
+    """获取绑定在当前线程事件循环上的aiohttp会话，同一线程内复用连接
+
+    只能在 run_in_thread_loop 执行的协程中使用
+    """
+    import aiohttp
+
+    thread_loop = _get_thread_loop()
+    if thread_loop.http_session is None or thread_loop.http_session.closed:
+        thread_loop.http_session = aiohttp.ClientSession()
+    return thread_loop.http_session
+
+
+def close_thread_loop():
+    """主动释放当前线程的事件循环和会话，线程退出前调用"""
+    thread_loop = getattr(_local, "thread_loop", None)
+    if thread_loop is not None:
+        thread_loop.close()
+        _local.thread_loop = None
@@ -0,0 +1,172 @@
+"""分层时间轮
+
+原来每条连接都有一个超时检查任务，每10秒醒来比较一次最后活动时间，
+上万台空闲设备在线时每分钟有几万次无用的唤醒。这里由服务端持有一个时间轮统一管理全部定时器：
+- 添加、取消、重新设置定时器都是O(1)，只是把定时器放进/移出对应的槽
+- 每层64个槽，第0层每槽一个节拍（默认1秒），上一层每槽是下一层转一圈的时长，
+  三层可覆盖约3天，更远的定时器先放在最高层，转到时再重新计算位置
+- 只有一个驱动任务，每个节拍唤醒一次，没有定时器时退出，与连接数无关
+
+定时器到期时调用回调，回调返回协程时创建任务执行。
+只能在时间轮所在的事件循环中使用。
+"""
+
+import time
+import asyncio
+from typing import Any, Callable, Dict, List, Optional, Set
+from config.logger import setup_logging
+
+TAG = __name__
+logger = setup_logging()
+
+
+class TimerHandle:
+    """时间轮中的一个定时器"""
+
+    __slots__ = ("wheel", "callback", "args", "expires", "bucket")
+
+    def __init__(self, wheel: "TimerWheel", callback: Callable, args: tuple):
+        self.wheel = wheel
+        self.callback = callback
+        self.args = args
+        self.expires = 0  # 到期的节拍序号
+        self.bucket: Optional[Set["TimerHandle"]] = None  # 所在的槽，不在轮中时为None
+
+    @property
+    def pending(self) -> bool:
+        return self.bucket is not None
+
+    def cancel(self):
+        self.wheel.cancel(self)
+
+    def reschedule(self, delay: float):
+        self.wheel.reschedule(self, delay)
+
+
+class TimerWheel:
+    def __init__(self, tick: float = 1.0, slots: int = 64, levels: int = 3):
+        self.tick = tick
+        self.slots = slots
+        self.levels = levels
+        self._spans = [slots**level for level in range(levels)]  # 各层每槽的节拍数
+        self._wheels: List[List[Set[TimerHandle]]] = [
+            [set() for _ in range(slots)] for _ in range(levels)
+        ]
+        self._origin = time.monotonic()
+        self._current = 0  # 已处理到的节拍序号
+        self._pending = 0
+        self._task: Optional[asyncio.Task] = None
+
+        self.fired = 0
+        self.cascaded = 0
+
+    def __len__(self) -> int:
+        return self._pending
+
+    @property
+    def pending(self) -> int:
+        """尚未到期的定时器数量"""
+        return self._pending
+
+    def _now_tick(self) -> int:
+        return int((time.monotonic() - self._origin) / self.tick)
+
+    def schedule(self, delay: float, callback: Callable, *args) -> TimerHandle:
+        """delay 秒后调用 callback(*args)，精度为一个节拍，不会早于 delay 到期"""
+        handle = TimerHandle(self, callback, args)
+        self.reschedule(handle, delay)
+        return handle
+
+    def reschedule(self, handle: TimerHandle, delay: float):
+        """重新设置定时器的到期时间，已到期或已取消的定时器也可以重新加入"""
+        if handle.bucket is not None:
+            handle.bucket.discard(handle)
+            self._pending -= 1
+        if self._pending == 0 and (self._task is None or self._task.done()):
+            # 时间轮空闲时节拍序号没有推进，直接对齐到当前时刻
+            self._current = self._now_tick()
+        deadline = time.monotonic() - self._origin + max(0.0, delay)
+        # 向上取整，再加上当前节拍内已经过去的部分，保证不早于 delay 到期
+        handle.expires = max(self._current, int(deadline / self.tick)) + 1
+        self._insert(handle)
+        self._pending += 1
+        self._ensure_running()
+
+    def cancel(self, handle: TimerHandle):
+        if handle.bucket is not None:
+            handle.bucket.discard(handle)
+            handle.bucket = None
+            self._pending -= 1
+
+    def _insert(self, handle: TimerHandle):
+        current = self._current
+        for level, span in enumerate(self._spans):
+            if handle.expires // span - current // span <= self.slots:
+                break
+        else:
+            # 超出时间轮范围，先放在最高层最远的槽，转到时再重新计算
+            level = self.levels - 1
+            span = self._spans[level]
+            bucket = self._wheels[level][(current // span) % self.slots]
+            bucket.add(handle)
+            handle.bucket = bucket
+            return
+        bucket = self._wheels[level][(handle.expires // span) % self.slots]
+        bucket.add(handle)
+        handle.bucket = bucket
+
+    def _advance(self):
+        """推进一个节拍，把高层到期的槽下放，再触发第0层当前槽的定时器"""
+        self._current += 1
+        current = self._current
+        for level in range(self.levels - 1, 0, -1):
+            span = self._spans[level]
+            if current % span:
+                continue
+            bucket = self._wheels[level][(current // span) % self.slots]
+            handles = list(bucket)
+            bucket.clear()
+            for handle in handles:
+                self.cascaded += 1
+                self._insert(handle)
+
+        bucket = self._wheels[0][current % self.slots]
+        if not bucket:
+            return
+        due = []
+        for handle in list(bucket):
+            # 高层下放的定时器可能恰好落在当前槽，但要再转一圈才到期
+            if handle.expires > current:
+                continue
+            bucket.discard(handle)
+            handle.bucket = None
+            self._pending -= 1
+            due.append(handle)
+        for handle in due:
+            self.fired += 1
+            try:
+                result = handle.callback(*handle.args)
+                if asyncio.iscoroutine(result):
+                    asyncio.create_task(result)
+            except Exception as e:
+                logger.bind(tag=TAG).error(f"定时器回调出错: {e}")
+
+    def _ensure_running(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def _run(self):
+        """驱动任务，按节拍推进，事件循环卡顿后补上错过的节拍，没有定时器后退出"""
+        while self._pending:
+            next_tick = self._origin + (self._current + 1) * self.tick
+            await asyncio.sleep(max(0.0, next_tick - time.monotonic()))
+            now_tick = self._now_tick()
+            while self._current < now_tick and self._pending:
+                self._advance()
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "pending": self._pending,
+            "fired": self.fired,
+            "cascaded": self.cascaded,
+        }
@@ -0,0 +1,251 @@
+"""插件结果的TTL缓存
+
+用于天气、新闻、IP归属地等网络请求类插件，避免重复请求上游站点：
+- 每个缓存有独立的TTL，缓存键由规范化后的参数生成
+- 内存中按LRU淘汰，可选持久化到磁盘，重启后依然有效
+- 过期后在stale窗口内先返回旧值，同时在后台刷新（stale-while-revalidate）
+"""
+
+import os
+import json
+import time
+import hashlib
+import threading
+from functools import wraps
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional
+from config.logger import setup_logging
+from config.config_loader import get_project_dir
+
+TAG = __name__
+logger = setup_logging()
+
+CACHE_DIR = get_project_dir() + "data/.plugin_cache"
+
+# 后台刷新和落盘共用的线程池
+_background_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="ttl_cache")
+
+# 所有已创建的缓存，便于统一查看统计信息
+_caches: Dict[str, "TTLCache"] = {}
+
+
+def _normalize(value):
+    """规范化参数，使语义相同的参数得到相同的键
+
+    字符串只去掉首尾空白，不转小写：URL的路径和查询参数区分大小写。
+    城市名等不区分大小写的自由文本由各装饰器的 key_func 自行转换。
+    """
+    if isinstance(value, str):
+        return value.strip()
+    if isinstance(value, (list, tuple)):
+        return [_normalize(v) for v in value]
+    if isinstance(value, dict):
+        return {str(k): _normalize(v) for k, v in sorted(value.items())}
+    return value
+
+
+def make_key(*args, **kwargs) -> str:
+    """根据参数生成缓存键"""
+    raw = json.dumps(
+        [_normalize(args), _normalize(kwargs)],
+        ensure_ascii=False,
+        sort_keys=True,
+        default=str,
+    )
+    return hashlib.md5(raw.encode("utf-8")).hexdigest()
+
+
+class TTLCache:
+    """带TTL和LRU淘汰的缓存，可选持久化到磁盘"""
+
+    def __init__(
+        self,
+        name: str,
+        ttl: float,
+        maxsize: int = 256,
+        stale_ttl: float = 0,
+        persist: bool = False,
+    ):
+        self.name = name
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.maxsize = maxsize
+        self.persist = persist
+        self.file_path = os.path.join(CACHE_DIR, f"{name}.json")
+        # key -> (过期时间, 值)，使用墙上时间以便持久化后依然有效
+        self._store: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._refreshing = set()
+        self._save_pending = False
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        if persist:
+            self._load()
+
+    def get(self, key: str):
+        """获取缓存
+
+        Returns:
+            (状态, 值)，状态为 "fresh"、"stale" 或 "miss"
+        """
+        now = time.time()
+        with self._lock:
+            entry = self._store.get(key)
+            if entry is None:
+                self.misses += 1
+                return "miss", None
+            expire_at, value = entry
+            if now < expire_at:
+                self._store.move_to_end(key)
+                self.hits += 1
+                return "fresh", value
+            if now < expire_at + self.stale_ttl:
+                self.stale_hits += 1
+                return "stale", value
+            del self._store[key]
+            self.misses += 1
+            return "miss", None
+
+    def remaining_ttl(self, key: str) -> Optional[float]:
+        """返回缓存项距离过期的秒数（已过期为负数），不存在时返回None"""
+        with self._lock:
+            entry = self._store.get(key)
+        return None if entry is None else entry[0] - time.time()
+
+    def set(self, key: str, value):
+        with self._lock:
+            self._store[key] = (time.time() + self.ttl, value)
+            self._store.move_to_end(key)
+            while len(self._store) > self.maxsize:
+                self._store.popitem(last=False)
+        if self.persist:
+            self._schedule_save()
+
+    def refresh_in_background(self, key: str, loader: Callable[[], Any], should_cache):
+        """在后台刷新过期的缓存项，同一个键同时只会刷新一次"""
+        with self._lock:
+            if key in self._refreshing:
+                return
+            self._refreshing.add(key)
+
+        def task():
+            try:
+                value = loader()
+                if should_cache(value):
+                    self.set(key, value)
+            except Exception as e:
+                logger.bind(tag=TAG).warning(f"缓存 {self.name} 后台刷新失败: {e}")
+            finally:
+                with self._lock:
+                    self._refreshing.discard(key)
+
+        _background_executor.submit(task)
+
+    def clear(self):
+        with self._lock:
+            self._store.clear()
+        if self.persist:
+            self._schedule_save()
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "size": len(self._store),
+                "hits": self.hits,
+                "stale_hits": self.stale_hits,
+                "misses": self.misses,
+            }
+
+    def _load(self):
+        try:
+            if not os.path.exists(self.file_path):
+                return
+            with open(self.file_path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            now = time.time()
+            for key, (expire_at, value) in data.items():
+                if now < expire_at + self.stale_ttl:
+                    self._store[key] = (expire_at, value)
+            while len(self._store) > self.maxsize:
+                self._store.popitem(last=False)
+        except Exception as e:
+            logger.bind(tag=TAG).warning(f"加载缓存文件 {self.file_path} 失败: {e}")
+
+    def _schedule_save(self):
+        """合并短时间内的多次写入，在后台落盘"""
+        with self._lock:
+            if self._save_pending:
+                return
+            self._save_pending = True
+        _background_executor.submit(self._save)
+
+    def _save(self):
+        with self._lock:
+            self._save_pending = False
+            data = dict(self._store)
+        try:
+            os.makedirs(CACHE_DIR, exist_ok=True)
+            tmp_path = self.file_path + ".tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(data, f, ensure_ascii=False, default=str)
+            os.replace(tmp_path, self.file_path)
+        except Exception as e:
+            logger.bind(tag=TAG).warning(f"保存缓存文件 {self.file_path} 失败: {e}")
+
+
+def ttl_cache(
+    name: str,
+    ttl: float,
+    maxsize: int = 256,
+    stale_ttl: float = 0,
+    persist: bool = False,
+    key_func: Optional[Callable[..., Any]] = None,
+    should_cache: Optional[Callable[[Any], bool]] = None,
+):
+    """为网络请求类函数增加TTL缓存的装饰器
+
+    Args:
+        name: 缓存名称，同时作为持久化文件名
+        ttl: 缓存有效期（秒）
+        maxsize: 内存中最多保存的条目数
+        stale_ttl: 过期后仍可返回旧值的时长（秒），期间会在后台刷新
+        persist: 是否持久化到磁盘，要求返回值可以JSON序列化
+        key_func: 自定义缓存键的参数提取函数，默认使用全部参数
+        should_cache: 判断返回值是否应该缓存，默认不缓存空结果
+    """
+    cache = TTLCache(name, ttl, maxsize, stale_ttl, persist)
+    _caches[name] = cache
+    if should_cache is None:
+        should_cache = bool
+
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            key_args = key_func(*args, **kwargs) if key_func else (args, kwargs)
+            key = make_key(key_args)
+
+            status, value = cache.get(key)
+            if status == "fresh":
+                return value
+            if status == "stale":
+                cache.refresh_in_background(
+                    key, lambda: func(*args, **kwargs), should_cache
+                )
+                return value
+
+            value = func(*args, **kwargs)
+            if should_cache(value):
+                cache.set(key, value)
+            return value
+
+        wrapper.cache = cache
+        return wrapper
+
+    return decorator
+
+
+def get_cache_stats() -> Dict[str, Dict[str, Any]]:
+    """获取所有缓存的统计信息"""
+    return {name: cache.get_stats() for name, cache in _caches.items()}
@@ -81,32 +81,40 @@ class MarkdownCleaner:
 
     # 预编译所有正则表达式（按执行频率排序）
     # 这里要把 replace_xxx 的静态方法放在最前定义，以便在列表里能正确引用它们。
+    # 第三项是该正则能匹配所必需的字符，文本中一个都没有时跳过该正则
     REGEXES = [
-        (re.compile(r'```.*?```', re.DOTALL), ''),  # 代码块
-        (re.compile(r'^#+\s*', re.MULTILINE), ''),  # 标题
-        (re.compile(r'(\*\*|__)(.*?)\1'), r'\2'),  # 粗体
-        (re.compile(r'(\*|_)(?=\S)(.*?)(?<=\S)\1'), r'\2'),  # 斜体
-        (re.compile(r'!\[.*?\]\(.*?\)'), ''),  # 图片
-        (re.compile(r'\[(.*?)\]\(.*?\)'), r'\1'),  # 链接
-        (re.compile(r'^\s*>+\s*', re.MULTILINE), ''),  # 引用
+        (re.compile(r'```.*?```', re.DOTALL), '', '`'),  # 代码块
+        (re.compile(r'^#+\s*', re.MULTILINE), '', '#'),  # 标题
+        (re.compile(r'(\*\*|__)(.*?)\1'), r'\2', '*_'),  # 粗体
+        (re.compile(r'(\*|_)(?=\S)(.*?)(?<=\S)\1'), r'\2', '*_'),  # 斜体
+        (re.compile(r'!\[.*?\]\(.*?\)'), '', '!'),  # 图片
+        (re.compile(r'\[(.*?)\]\(.*?\)'), r'\1', '['),  # 链接
+        (re.compile(r'^\s*>+\s*', re.MULTILINE), '', '>'),  # 引用
         (
             re.compile(r'(?P<table_block>(?:^[^\n]*\|[^\n]*\n)+)', re.MULTILINE),
-            _replace_table_block
+            _replace_table_block,
+            '|',
         ),
-        (re.compile(r'^\s*[*+-]\s*', re.MULTILINE), '- '),  # 列表
-        (re.compile(r'\$\$.*?\$\$', re.DOTALL), ''),  # 块级公式
+        (re.compile(r'^\s*[*+-]\s*', re.MULTILINE), '- ', '*+-'),  # 列表
+        (re.compile(r'\$\$.*?\$\$', re.DOTALL), '', '$'),  # 块级公式
         (
             re.compile(r'(?<![A-Za-z0-9])\$([^\n$]+)\$(?![A-Za-z0-9])'),
-            _replace_inline_dollar
+            _replace_inline_dollar,
+            '$',
         ),
-        (re.compile(r'\n{2,}'), '\n'),  # 多余空行
+        (re.compile(r'\n{2,}'), '\n', '\n'),  # 多余空行
     ]
+    # 所有正则必需字符的并集，绝大多数TTS片段是不含这些字符的普通句子
+    MARKDOWN_CHARS = re.compile(r'[`#*_!\[>|+\-$\n]')
 
     @staticmethod
     def clean_markdown(text: str) -> str:
         """
         主入口方法：依序执行所有正则，移除或替换 Markdown 元素
         """
-        for regex, replacement in MarkdownCleaner.REGEXES:
-            text = regex.sub(replacement, text)
-        return text.strip()
\ No newline at end of file
+        if not MarkdownCleaner.MARKDOWN_CHARS.search(text):
+            return text.strip()
+        for regex, replacement, required_chars in MarkdownCleaner.REGEXES:
+            if any(char in text for char in required_chars):
+                text = regex.sub(replacement, text)
+        return text.strip()
@@ -0,0 +1,243 @@
+"""TTS音频缓存
+
+按 (TTS提供者, 音色, 参数, 规范化文本) 缓存已编码好的opus数据包列表，
+问候语、结束语、错误提示等重复出现的句子不再重复请求云端和解码。
+- 内存层：按字节数限制的LRU
+- 磁盘层：p3格式文件，超出容量预算时淘汰最久未使用的文件
+"""
+
+import os
+import re
+import json
+import hashlib
+import tempfile
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+from core.utils import p3
+from config.logger import setup_logging
+from config.config_loader import get_project_dir
+
+TAG = __name__
+logger = setup_logging()
+
+_whitespace_pattern = re.compile(r"\s+")
+
+
+def normalize_text(text: str) -> str:
+    """规范化文本，空白差异不影响缓存命中"""
+    return _whitespace_pattern.sub(" ", text).strip()
+
+
+class TTSAudioCache:
+    def __init__(
+        self,
+        enabled: bool = True,
+        memory_max_bytes: int = 64 * 1024 * 1024,
+        disk_max_bytes: int = 512 * 1024 * 1024,
+        max_text_length: int = 64,
+        cache_dir: str = None,
+    ):
+        self.enabled = enabled
+        self.memory_max_bytes = memory_max_bytes
+        self.disk_max_bytes = disk_max_bytes
+        self.max_text_length = max_text_length
+        self.cache_dir = cache_dir or get_project_dir() + "data/.tts_cache"
+
+        self._memory: "OrderedDict[str, List[bytes]]" = OrderedDict()
+        self._memory_bytes = 0
+        self._disk: "OrderedDict[str, int]" = OrderedDict()  # key -> 文件大小
+        self._disk_bytes = 0
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.bytes_served = 0
+
+        if self.enabled and self.disk_max_bytes > 0:
+            self._scan_disk()
+
+    @staticmethod
+    def make_key(provider_id: str, voice: Any, text: str) -> str:
+        raw = json.dumps(
+            [provider_id, voice, normalize_text(text)], ensure_ascii=False
+        )
+        return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+    def is_cacheable(self, text: str) -> bool:
+        return (
+            self.enabled
+            and bool(text)
+            and len(normalize_text(text)) <= self.max_text_length
+        )
+
+    def get(self, key: str) -> Optional[List[bytes]]:
+        with self._lock:
+            opus_datas = self._memory.get(key)
+            if opus_datas is not None:
+                self._memory.move_to_end(key)
+                self.hits += 1
+                self.bytes_served += sum(len(d) for d in opus_datas)
+                return opus_datas
+            on_disk = key in self._disk
+
+        if on_disk:
+            try:
+                opus_datas, _ = p3.decode_opus_from_file(self._file_path(key))
+                os.utime(self._file_path(key))
+            except Exception as e:
+                logger.bind(tag=TAG).warning(f"读取TTS缓存文件失败: {e}")
+                self._remove_disk_entry(key)
+                opus_datas = None
+            if opus_datas:
+                size = sum(len(d) for d in opus_datas)
+                with self._lock:
+                    self._disk.move_to_end(key)
+                    self.hits += 1
+                    self.disk_hits += 1
+                    self.bytes_served += size
+                    self._put_memory(key, opus_datas, size)
+                return opus_datas
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def put(self, key: str, opus_datas: List[bytes]):
+        if not opus_datas:
+            return
+        size = sum(len(d) for d in opus_datas)
+        with self._lock:
+            self._put_memory(key, opus_datas, size)
+            if self.disk_max_bytes <= 0 or key in self._disk:
+                return
+        self._put_disk(key, opus_datas)
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / total, 4) if total else 0.0,
+                "bytes_served": self.bytes_served,
+                "memory_entries": len(self._memory),
+                "memory_bytes": self._memory_bytes,
+                "disk_entries": len(self._disk),
+                "disk_bytes": self._disk_bytes,
+            }
+
+    def _file_path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, key[:2], key + ".p3")
+
+    def _put_memory(self, key: str, opus_datas: List[bytes], size: int):
+        """调用方需持有锁"""
+        if size > self.memory_max_bytes:
+            return
+        old = self._memory.pop(key, None)
+        if old is not None:
+            self._memory_bytes -= sum(len(d) for d in old)
+        self._memory[key] = opus_datas
+        self._memory_bytes += size
+        while self._memory_bytes > self.memory_max_bytes and self._memory:
+            _, evicted = self._memory.popitem(last=False)
+            self._memory_bytes -= sum(len(d) for d in evicted)
+
+    def _put_disk(self, key: str, opus_datas: List[bytes]):
+        file_path = self._file_path(key)
+        tmp_path = None
+        try:
+            os.makedirs(os.path.dirname(file_path), exist_ok=True)
+            data = p3.encode_opus_to_bytes(opus_datas)
+            # 多个连接可能同时写入同一句话，各自使用独立的临时文件
+            fd, tmp_path = tempfile.mkstemp(
+                dir=os.path.dirname(file_path), suffix=".tmp"
+            )
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, file_path)
+        except Exception as e:
+            logger.bind(tag=TAG).warning(f"写入TTS缓存文件失败: {e}")
+            if tmp_path is not None:
+                try:
+                    os.remove(tmp_path)
+                except OSError:
+                    pass
+            return
+
+        evicted = []
+        with self._lock:
+            # 多个连接同时未命中同一句话时会重复写入，先减去原来的大小
+            old_size = self._disk.pop(key, None)
+            if old_size is not None:
+                self._disk_bytes -= old_size
+            self._disk[key] = len(data)
+            self._disk_bytes += len(data)
+            while self._disk_bytes > self.disk_max_bytes and len(self._disk) > 1:
+                old_key, old_size = self._disk.popitem(last=False)
+                self._disk_bytes -= old_size
+                evicted.append(old_key)
+        for old_key in evicted:
+            try:
+                os.remove(self._file_path(old_key))
+            except OSError:
+                pass
+
+    def _remove_disk_entry(self, key: str):
+        with self._lock:
+            size = self._disk.pop(key, None)
+            if size is not None:
+                self._disk_bytes -= size
+        try:
+            os.remove(self._file_path(key))
+        except OSError:
+            pass
+
+    def _scan_disk(self):
+        """启动时扫描磁盘缓存，按最近使用时间恢复LRU顺序"""
+        if not os.path.isdir(self.cache_dir):
+            return
+        entries = []
+        for root, _, files in os.walk(self.cache_dir):
+            for name in files:
+                if not name.endswith(".p3"):
+                    continue
+                path = os.path.join(root, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                entries.append((stat.st_mtime, name[:-3], stat.st_size))
+        entries.sort()
+        for _, key, size in entries:
+            self._disk[key] = size
+            self._disk_bytes += size
+        logger.bind(tag=TAG).info(
+            f"TTS磁盘缓存: {len(self._disk)}条, {self._disk_bytes / 1024 / 1024:.1f}MB"
+        )
+
+
+_tts_audio_cache: Optional[TTSAudioCache] = None
+_tts_audio_cache_lock = threading.Lock()
+
+
+def get_tts_audio_cache(config: Dict[str, Any] = None) -> TTSAudioCache:
+    """获取全局TTS音频缓存，首次调用时按配置创建"""
+    global _tts_audio_cache
+    if _tts_audio_cache is None:
+        with _tts_audio_cache_lock:
+            if _tts_audio_cache is None:
+                cache_config = (config or {}).get("tts_cache", {}) or {}
+                _tts_audio_cache = TTSAudioCache(
+                    enabled=bool(cache_config.get("enabled", True)),
+                    memory_max_bytes=int(cache_config.get("memory_max_mb", 64))
+                    * 1024
+                    * 1024,
+                    disk_max_bytes=int(cache_config.get("disk_max_mb", 512))
+                    * 1024
+                    * 1024,
+                    max_text_length=int(cache_config.get("max_text_length", 64)),
+                )
+    return _tts_audio_cache
@@ -4,38 +4,17 @@ import subprocess
 import re
 import os
 import wave
+import threading
 from io import BytesIO
-from core.utils import p3
+from core.utils import p3, audio_decoder, textUtils
+from core.utils.ttl_cache import ttl_cache
+from core.utils.emotion import emoji_map, analyze_emotion
 import numpy as np
 import requests
 import opuslib_next
-from pydub import AudioSegment
 import copy
 
 TAG = __name__
-emoji_map = {
-    "neutral": "😶",
-    "happy": "🙂",
-    "laughing": "😆",
-    "funny": "😂",
-    "sad": "😔",
-    "angry": "😠",
-    "crying": "😭",
-    "loving": "😍",
-    "embarrassed": "😳",
-    "surprised": "😲",
-    "shocked": "😱",
-    "thinking": "🤔",
-    "winking": "😉",
-    "cool": "😎",
-    "relaxed": "😌",
-    "delicious": "🤤",
-    "kissy": "😘",
-    "confident": "😏",
-    "sleepy": "😴",
-    "silly": "😜",
-    "confused": "🙄",
-}
 
 
 def get_local_ip():
@@ -94,6 +73,15 @@ def is_private_ip(ip_addr):
         return False  # IP address format error or insufficient segments
 
 
+@ttl_cache(
+    "ip_info",
+    ttl=24 * 3600,
+    maxsize=4096,
+    stale_ttl=7 * 24 * 3600,
+    persist=True,
+    key_func=lambda ip_addr, logger: ip_addr,
+    should_cache=lambda info: bool(info and info.get("city")),
+)
 def get_ip_info(ip_addr, logger):
     try:
         if is_private_ip(ip_addr):
@@ -113,10 +101,9 @@ def write_json_file(file_path, data):
         json.dump(data, file, ensure_ascii=False, indent=4)
 
 
-def is_punctuation_or_emoji(char):
-    """检查字符是否为空格、指定标点或表情符号"""
-    # 定义需要去除的中英文标点（包括全角/半角）
-    punctuation_set = {
+# 需要去除的中英文标点（包括全角/半角）
+_STRIP_CHARS = textUtils.build_strip_chars(
+    (
         "，",
         ",",  # 中文逗号 + 英文逗号
         "-",
@@ -127,35 +114,18 @@ def is_punctuation_or_emoji(char):
         '"',  # 中文双引号 + 英文引号
         "：",
         ":",  # 中文冒号 + 英文冒号
-    }
-    if char.isspace() or char in punctuation_set:
-        return True
-    # 检查表情符号（保留原有逻辑）
-    code_point = ord(char)
-    emoji_ranges = [
-        (0x1F600, 0x1F64F),
-        (0x1F300, 0x1F5FF),
-        (0x1F680, 0x1F6FF),
-        (0x1F900, 0x1F9FF),
-        (0x1FA70, 0x1FAFF),
-        (0x2600, 0x26FF),
-        (0x2700, 0x27BF),
-    ]
-    return any(start <= code_point <= end for start, end in emoji_ranges)
+    )
+)
+
+
+def is_punctuation_or_emoji(char):
+    """检查字符是否为空格、指定标点或表情符号"""
+    return char in _STRIP_CHARS
 
 
 def get_string_no_punctuation_or_emoji(s):
     """去除字符串首尾的空格、标点符号和表情符号"""
-    chars = list(s)
-    # 处理开头的字符
-    start = 0
-    while start < len(chars) and is_punctuation_or_emoji(chars[start]):
-        start += 1
-    # 处理结尾的字符
-    end = len(chars) - 1
-    while end >= start and is_punctuation_or_emoji(chars[end]):
-        end -= 1
-    return "".join(chars[start : end + 1])
+    return textUtils.strip_chars(s, _STRIP_CHARS)
 
 
 def remove_punctuation_and_length(text):
@@ -244,583 +214,131 @@ def extract_json_from_string(input_string):
     return None
 
 
-def analyze_emotion(text):
-    """
-    分析文本情感并返回对应的emoji名称（支持中英文）
-    """
-    if not text or not isinstance(text, str):
-        return "neutral"
-
-    original_text = text
-    text = text.lower().strip()
-
-    # 检查是否包含现有emoji
-    for emotion, emoji in emoji_map.items():
-        if emoji in original_text:
-            return emotion
-
-    # 标点符号分析
-    has_exclamation = "!" in original_text or "！" in original_text
-    has_question = "?" in original_text or "？" in original_text
-    has_ellipsis = "..." in original_text or "…" in original_text
-
-    # 定义情感关键词映射（中英文扩展版）
-    emotion_keywords = {
-        "happy": [
-            "开心",
-            "高兴",
-            "快乐",
-            "愉快",
-            "幸福",
-            "满意",
-            "棒",
-            "好",
-            "不错",
-            "完美",
-            "棒极了",
-            "太好了",
-            "好呀",
-            "好的",
-            "happy",
-            "joy",
-            "great",
-            "good",
-            "nice",
-            "awesome",
-            "fantastic",
-            "wonderful",
-        ],
-        "laughing": [
-            "哈哈",
-            "哈哈哈",
-            "呵呵",
-            "嘿嘿",
-            "嘻嘻",
-            "笑死",
-            "太好笑了",
-            "笑死我了",
-            "lol",
-            "lmao",
-            "haha",
-            "hahaha",
-            "hehe",
-            "rofl",
-            "funny",
-            "laugh",
-        ],
-        "funny": [
-            "搞笑",
-            "滑稽",
-            "逗",
-            "幽默",
-            "笑点",
-            "段子",
-            "笑话",
-            "太逗了",
-            "hilarious",
-            "joke",
-            "comedy",
-        ],
-        "sad": [
-            "伤心",
-            "难过",
-            "悲哀",
-            "悲伤",
-            "忧郁",
-            "郁闷",
-            "沮丧",
-            "失望",
-            "想哭",
-            "难受",
-            "不开心",
-            "唉",
-            "呜呜",
-            "sad",
-            "upset",
-            "unhappy",
-            "depressed",
-            "sorrow",
-            "gloomy",
-        ],
-        "angry": [
-            "生气",
-            "愤怒",
-            "气死",
-            "讨厌",
-            "烦人",
-            "可恶",
-            "烦死了",
-            "恼火",
-            "暴躁",
-            "火大",
-            "愤怒",
-            "气炸了",
-            "angry",
-            "mad",
-            "annoyed",
-            "furious",
-            "pissed",
-            "hate",
-        ],
-        "crying": [
-            "哭泣",
-            "泪流",
-            "大哭",
-            "伤心欲绝",
-            "泪目",
-            "流泪",
-            "哭死",
-            "哭晕",
-            "想哭",
-            "泪崩",
-            "cry",
-            "crying",
-            "tears",
-            "sob",
-            "weep",
-        ],
-        "loving": [
-            "爱你",
-            "喜欢",
-            "爱",
-            "亲爱的",
-            "宝贝",
-            "么么哒",
-            "抱抱",
-            "想你",
-            "思念",
-            "最爱",
-            "亲亲",
-            "喜欢你",
-            "love",
-            "like",
-            "adore",
-            "darling",
-            "sweetie",
-            "honey",
-            "miss you",
-            "heart",
-        ],
-        "embarrassed": [
-            "尴尬",
-            "不好意思",
-            "害羞",
-            "脸红",
-            "难为情",
-            "社死",
-            "丢脸",
-            "出丑",
-            "embarrassed",
-            "awkward",
-            "shy",
-            "blush",
-        ],
-        "surprised": [
-            "惊讶",
-            "吃惊",
-            "天啊",
-            "哇塞",
-            "哇",
-            "居然",
-            "竟然",
-            "没想到",
-            "出乎意料",
-            "surprise",
-            "wow",
-            "omg",
-            "oh my god",
-            "amazing",
-            "unbelievable",
-        ],
-        "shocked": [
-            "震惊",
-            "吓到",
-            "惊呆了",
-            "不敢相信",
-            "震撼",
-            "吓死",
-            "恐怖",
-            "害怕",
-            "吓人",
-            "shocked",
-            "shocking",
-            "scared",
-            "frightened",
-            "terrified",
-            "horror",
-        ],
-        "thinking": [
-            "思考",
-            "考虑",
-            "想一下",
-            "琢磨",
-            "沉思",
-            "冥想",
-            "想",
-            "思考中",
-            "在想",
-            "think",
-            "thinking",
-            "consider",
-            "ponder",
-            "meditate",
-        ],
-        "winking": [
-            "调皮",
-            "眨眼",
-            "你懂的",
-            "坏笑",
-            "邪恶",
-            "奸笑",
-            "使眼色",
-            "wink",
-            "teasing",
-            "naughty",
-            "mischievous",
-        ],
-        "cool": [
-            "酷",
-            "帅",
-            "厉害",
-            "棒极了",
-            "真棒",
-            "牛逼",
-            "强",
-            "优秀",
-            "杰出",
-            "出色",
-            "完美",
-            "cool",
-            "awesome",
-            "amazing",
-            "great",
-            "impressive",
-            "perfect",
-        ],
-        "relaxed": [
-            "放松",
-            "舒服",
-            "惬意",
-            "悠闲",
-            "轻松",
-            "舒适",
-            "安逸",
-            "自在",
-            "relax",
-            "relaxed",
-            "comfortable",
-            "cozy",
-            "chill",
-            "peaceful",
-        ],
-        "delicious": [
-            "好吃",
-            "美味",
-            "香",
-            "馋",
-            "可口",
-            "香甜",
-            "大餐",
-            "大快朵颐",
-            "流口水",
-            "垂涎",
-            "delicious",
-            "yummy",
-            "tasty",
-            "yum",
-            "appetizing",
-            "mouthwatering",
-        ],
-        "kissy": [
-            "亲亲",
-            "么么",
-            "吻",
-            "mua",
-            "muah",
-            "亲一下",
-            "飞吻",
-            "kiss",
-            "xoxo",
-            "hug",
-            "muah",
-            "smooch",
-        ],
-        "confident": [
-            "自信",
-            "肯定",
-            "确定",
-            "毫无疑问",
-            "当然",
-            "必须的",
-            "毫无疑问",
-            "确信",
-            "坚信",
-            "confident",
-            "sure",
-            "certain",
-            "definitely",
-            "positive",
-        ],
-        "sleepy": [
-            "困",
-            "睡觉",
-            "晚安",
-            "想睡",
-            "好累",
-            "疲惫",
-            "疲倦",
-            "困了",
-            "想休息",
-            "睡意",
-            "sleep",
-            "sleepy",
-            "tired",
-            "exhausted",
-            "bedtime",
-            "good night",
-        ],
-        "silly": [
-            "傻",
-            "笨",
-            "呆",
-            "憨",
-            "蠢",
-            "二",
-            "憨憨",
-            "傻乎乎",
-            "呆萌",
-            "silly",
-            "stupid",
-            "dumb",
-            "foolish",
-            "goofy",
-            "ridiculous",
-        ],
-        "confused": [
-            "疑惑",
-            "不明白",
-            "不懂",
-            "困惑",
-            "疑问",
-            "为什么",
-            "怎么回事",
-            "啥意思",
-            "不清楚",
-            "confused",
-            "puzzled",
-            "doubt",
-            "question",
-            "what",
-            "why",
-            "how",
-        ],
-    }
-
-    # 特殊句型判断（中英文）
-    # 赞美他人
-    if any(
-        phrase in text
-        for phrase in [
-            "你真",
-            "你好",
-            "您真",
-            "你真棒",
-            "你好厉害",
-            "你太强了",
-            "你真好",
-            "你真聪明",
-            "you are",
-            "you're",
-            "you look",
-            "you seem",
-            "so smart",
-            "so kind",
-        ]
-    ):
-        return "loving"
-    # 自我赞美
-    if any(
-        phrase in text
-        for phrase in [
-            "我真",
-            "我最",
-            "我太棒了",
-            "我厉害",
-            "我聪明",
-            "我优秀",
-            "i am",
-            "i'm",
-            "i feel",
-            "so good",
-            "so happy",
-        ]
-    ):
-        return "cool"
-    # 晚安/睡觉相关
-    if any(
-        phrase in text
-        for phrase in [
-            "睡觉",
-            "晚安",
-            "睡了",
-            "好梦",
-            "休息了",
-            "去睡了",
-            "sleep",
-            "good night",
-            "bedtime",
-            "go to bed",
-        ]
-    ):
-        return "sleepy"
-    # 疑问句
-    if has_question and not has_exclamation:
-        return "thinking"
-    # 强烈情感（感叹号）
-    if has_exclamation and not has_question:
-        # 检查是否是积极内容
-        positive_words = (
-            emotion_keywords["happy"]
-            + emotion_keywords["laughing"]
-            + emotion_keywords["cool"]
-        )
-        if any(word in text for word in positive_words):
-            return "laughing"
-        # 检查是否是消极内容
-        negative_words = (
-            emotion_keywords["angry"]
-            + emotion_keywords["sad"]
-            + emotion_keywords["crying"]
-        )
-        if any(word in text for word in negative_words):
-            return "angry"
-        return "surprised"
-    # 省略号（表示犹豫或思考）
-    if has_ellipsis:
-        return "thinking"
-
-    # 关键词匹配（带权重）
-    emotion_scores = {emotion: 0 for emotion in emoji_map.keys()}
-
-    # 给匹配到的关键词加分
-    for emotion, keywords in emotion_keywords.items():
-        for keyword in keywords:
-            if keyword in text:
-                emotion_scores[emotion] += 1
-
-    # 给长文本中的重复关键词额外加分
-    if len(text) > 20:  # 长文本
-        for emotion, keywords in emotion_keywords.items():
-            for keyword in keywords:
-                emotion_scores[emotion] += text.count(keyword) * 0.5
-
-    # 根据分数选择最可能的情感
-    max_score = max(emotion_scores.values())
-    if max_score == 0:
-        return "happy"  # 默认
-
-    # 可能有多个情感同分，根据上下文选择最合适的
-    top_emotions = [e for e, s in emotion_scores.items() if s == max_score]
-
-    # 如果多个情感同分，使用以下优先级
-    priority_order = [
-        "laughing",
-        "crying",
-        "angry",
-        "surprised",
-        "shocked",  # 强烈情感优先
-        "loving",
-        "happy",
-        "funny",
-        "cool",  # 积极情感
-        "sad",
-        "embarrassed",
-        "confused",  # 消极情感
-        "thinking",
-        "winking",
-        "relaxed",  # 中性情感
-        "delicious",
-        "kissy",
-        "confident",
-        "sleepy",
-        "silly",  # 特殊场景
-    ]
-
-    for emotion in priority_order:
-        if emotion in top_emotions:
-            return emotion
-
-    return top_emotions[0]  # 如果都不在优先级列表里，返回第一个
-
-
 def audio_to_data(audio_file_path, is_opus=True):
     # 获取文件后缀名
     file_type = os.path.splitext(audio_file_path)[1]
     if file_type:
         file_type = file_type.lstrip(".")
-    # 读取音频文件，-nostdin 参数：不要从标准输入读取数据，否则FFmpeg会阻塞
-    audio = AudioSegment.from_file(
-        audio_file_path, format=file_type, parameters=["-nostdin"]
-    )
-
-    # 转换为单声道/16kHz采样率/16位小端编码（确保与编码器匹配）
-    audio = audio.set_channels(1).set_frame_rate(16000).set_sample_width(2)
-
-    # 音频时长(秒)
-    duration = len(audio) / 1000.0
-
-    # 获取原始PCM数据（16位小端）
-    raw_data = audio.raw_data
-    return pcm_to_data(raw_data, is_opus), duration
+    with open(audio_file_path, "rb") as f:
+        audio_bytes = f.read()
+    return audio_bytes_to_data(audio_bytes, file_type, is_opus)
 
 
 def audio_bytes_to_data(audio_bytes, file_type, is_opus=True):
     """
-    直接用音频二进制数据转为opus/pcm数据，支持wav、mp3、p3
+    直接用音频二进制数据转为opus/pcm数据，支持wav、mp3、p3、ogg opus等
     """
     if file_type == "p3":
         # 直接用p3解码
         return p3.decode_opus_from_bytes(audio_bytes)
-    else:
-        # 其他格式用pydub
-        audio = AudioSegment.from_file(
-            BytesIO(audio_bytes), format=file_type, parameters=["-nostdin"]
-        )
-        audio = audio.set_channels(1).set_frame_rate(16000).set_sample_width(2)
-        duration = len(audio) / 1000.0
-        raw_data = audio.raw_data
-        return pcm_to_data(raw_data, is_opus), duration
+
+    if is_opus:
+        # 60ms单声道的Ogg Opus直接使用原始数据包
+        opus_packets = audio_decoder.get_opus_passthrough(audio_bytes, file_type)
+        if opus_packets is not None:
+            return opus_packets, len(opus_packets) * 0.06
+
+    # 其他格式先解码为16kHz单声道16位PCM
+    raw_data = audio_decoder.decode_to_pcm(audio_bytes, file_type)
+    # 音频时长(秒)
+    duration = len(raw_data) / 2 / 16000
+    return pcm_to_data(raw_data, is_opus), duration
+
+
+# pcm_to_data 使用的编码参数：16kHz单声道，60ms一帧
+PCM_SAMPLE_RATE = 16000
+PCM_FRAME_SIZE = PCM_SAMPLE_RATE * 60 // 1000  # 960 samples/frame
+PCM_FRAME_BYTES = PCM_FRAME_SIZE * 2  # 16bit=2bytes/sample
+
+
+class OpusEncoderPool:
+    """Opus编码器池，编码器用完重置状态后放回，避免每句话都重新创建"""
+
+    def __init__(self, max_idle=16):
+        self.max_idle = max_idle
+        self._idle = []
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        with self._lock:
+            if self._idle:
+                return self._idle.pop()
+        return opuslib_next.Encoder(PCM_SAMPLE_RATE, 1, opuslib_next.APPLICATION_AUDIO)
+
+    def release(self, encoder):
+        encoder.reset_state()
+        with self._lock:
+            if len(self._idle) < self.max_idle:
+                self._idle.append(encoder)
+
+
+opus_encoder_pool = OpusEncoderPool()
+
+
+def iter_pcm_to_data(raw_data, is_opus=True, encoder=None):
+    """逐帧把16kHz单声道PCM转为opus/pcm数据，每编码完一帧就产出，无需等整句编码完成
+
+    传入encoder时使用调用方的编码器（保持跨调用的编码状态），否则从编码器池借用
+    """
+    view = memoryview(raw_data).cast("B")
+    full_length = len(view) - len(view) % PCM_FRAME_BYTES
+    pooled = is_opus and encoder is None
+    if pooled:
+        encoder = opus_encoder_pool.acquire()
+    try:
+        for i in range(0, full_length, PCM_FRAME_BYTES):
+            # opuslib只接受bytes，这里是每帧唯一的一次拷贝
+            chunk = view[i : i + PCM_FRAME_BYTES].tobytes()
+            yield encoder.encode(chunk, PCM_FRAME_SIZE) if is_opus else chunk
+
+        # 最后一帧不足时补零
+        if full_length < len(view):
+            last_frame = bytearray(PCM_FRAME_BYTES)
+            last_frame[: len(view) - full_length] = view[full_length:]
+            last_frame = bytes(last_frame)
+            yield encoder.encode(last_frame, PCM_FRAME_SIZE) if is_opus else last_frame
+    finally:
+        if pooled:
+            opus_encoder_pool.release(encoder)
 
 
 def pcm_to_data(raw_data, is_opus=True):
-    # 初始化Opus编码器
-    encoder = opuslib_next.Encoder(16000, 1, opuslib_next.APPLICATION_AUDIO)
-
-    # 编码参数
-    frame_duration = 60  # 60ms per frame
-    frame_size = int(16000 * frame_duration / 1000)  # 960 samples/frame
-
-    datas = []
-    # 按帧处理所有音频数据（包括最后一帧可能补零）
-    for i in range(0, len(raw_data), frame_size * 2):  # 16bit=2bytes/sample
-        # 获取当前帧的二进制数据
-        chunk = raw_data[i : i + frame_size * 2]
-
-        # 如果最后一帧不足，补零
-        if len(chunk) < frame_size * 2:
-            chunk += b"\x00" * (frame_size * 2 - len(chunk))
-
-        if is_opus:
-            # 转换为numpy数组处理
-            np_frame = np.frombuffer(chunk, dtype=np.int16)
-            # 编码Opus数据
-            frame_data = encoder.encode(np_frame.tobytes(), frame_size)
-        else:
-            frame_data = chunk if isinstance(chunk, bytes) else bytes(chunk)
-
-        datas.append(frame_data)
-
-    return datas
+    return list(iter_pcm_to_data(raw_data, is_opus))
+
+
+class PcmFrameEncoder:
+    """增量版的 pcm_to_data：可以分多次输入任意长度的PCM，凑满60ms就编码输出"""
+
+    def __init__(self, is_opus=True):
+        self.is_opus = is_opus
+        self.encoder = opus_encoder_pool.acquire() if is_opus else None
+        self.pending = bytearray()
+
+    def push(self, pcm_data):
+        self.pending += pcm_data
+        full_length = len(self.pending) - len(self.pending) % PCM_FRAME_BYTES
+        if not full_length:
+            return []
+        datas = list(
+            iter_pcm_to_data(self.pending[:full_length], self.is_opus, self.encoder)
+        )
+        del self.pending[:full_length]
+        return datas
+
+    def flush(self):
+        """输出剩余不足一帧的数据（补零）"""
+        datas = []
+        if self.pending:
+            datas = list(
+                iter_pcm_to_data(bytes(self.pending), self.is_opus, self.encoder)
+            )
+            self.pending.clear()
+        return datas
+
+    def close(self):
+        if self.encoder is not None:
+            opus_encoder_pool.release(self.encoder)
+            self.encoder = None
 
 
 def opus_datas_to_wav_bytes(opus_datas, sample_rate=16000, channels=1):
@@ -3,8 +3,17 @@ import re
 import yaml
 import time
 import hashlib
+import threading
 import portalocker
-from typing import Dict
+from typing import Dict, List, Optional, Tuple
+from config.logger import setup_logging
+from core.utils.util import audio_to_data, opus_datas_to_wav_bytes
+
+TAG = __name__
+logger = setup_logging()
+
+# 回复音频太短视为生成失败，约0.5秒，与原来wav文件不小于15KB的限制相当
+MIN_RESPONSE_PACKETS = 8
 
 
 class FileLock:
@@ -29,112 +38,162 @@ class FileLock:
 
 
 class WakeupWordsConfig:
+    """唤醒词回复缓存
+
+    回复配置和编码好的opus数据包常驻内存，唤醒时不读文件、不解析YAML、不加文件锁。
+    - 配置文件最多每秒检查一次修改时间，被其他进程改写时才重新加载
+    - 新生成的回复直接放入内存，wav文件和配置文件在后台线程写入
+    - 写入先写临时文件再替换，读取时不会读到写了一半的文件，因此读取无需加锁；
+      文件锁只用于多个进程同时写入时合并各自的修改
+    """
+
     def __init__(self):
         self.config_file = "data/.wakeup_words.yaml"
         self.assets_dir = "config/assets/wakeup_words"
         self._ensure_directories()
-        self._config_cache = None
-        self._last_load_time = 0
-        self._cache_ttl = 1  # 缓存有效期（秒）
+        self._config: Dict = {}
+        self._config_mtime = None
+        self._last_check_time = None
+        self._check_interval = 1  # 检查配置文件修改时间的间隔（秒）
         self._lock_timeout = 5  # 文件锁超时时间（秒）
+        # voice_hash -> (回复生成时间, opus数据包)
+        self._audio: Dict[str, Tuple[float, List[bytes]]] = {}
+        # 已放入内存、尚未写入文件的回复
+        self._pending: Dict[str, Dict] = {}
+        self._lock = threading.Lock()
+        self._save_lock = threading.Lock()
 
     def _ensure_directories(self):
         """确保必要的目录存在"""
         os.makedirs(os.path.dirname(self.config_file), exist_ok=True)
         os.makedirs(self.assets_dir, exist_ok=True)
 
-    def _load_config(self) -> Dict:
-        """加载配置文件，使用缓存机制"""
-        current_time = time.time()
-
-        # 如果缓存有效，直接返回缓存
-        if (
-            self._config_cache is not None
-            and current_time - self._last_load_time < self._cache_ttl
-        ):
-            return self._config_cache
+    def _get_mtime(self):
+        try:
+            return os.stat(self.config_file).st_mtime
+        except OSError:
+            return None
 
+    def _read_config_file(self) -> Dict:
         try:
-            with open(self.config_file, "a+") as f:
-                with FileLock(f, timeout=self._lock_timeout):
-                    f.seek(0)
-                    content = f.read()
-                    config = yaml.safe_load(content) if content else {}
-                    self._config_cache = config
-                    self._last_load_time = current_time
-                    return config
-        except (TimeoutError, IOError) as e:
-            print(f"加载配置文件失败: {e}")
-            return {}
-        except Exception as e:
-            print(f"加载配置文件时发生未知错误: {e}")
+            with open(self.config_file, "r", encoding="utf-8") as f:
+                return yaml.safe_load(f) or {}
+        except FileNotFoundError:
             return {}
 
-    def _save_config(self, config: Dict):
-        """保存配置到文件，使用文件锁保护"""
+    def _load_config(self) -> Dict:
+        """返回内存中的配置，配置文件被改写后重新加载"""
+        now = time.monotonic()
+        if (
+            self._last_check_time is not None
+            and now - self._last_check_time < self._check_interval
+        ):
+            return self._config
+        self._last_check_time = now
+
+        mtime = self._get_mtime()
+        if mtime == self._config_mtime:
+            return self._config
         try:
-            with open(self.config_file, "w") as f:
-                with FileLock(f, timeout=self._lock_timeout):
-                    yaml.dump(config, f, allow_unicode=True)
-                    self._config_cache = config
-                    self._last_load_time = time.time()
-        except (TimeoutError, IOError) as e:
-            print(f"保存配置文件失败: {e}")
-            raise
+            config = self._read_config_file()
         except Exception as e:
-            print(f"保存配置文件时发生未知错误: {e}")
-            raise
-
-    def get_wakeup_response(self, voice: str) -> Dict:
-        voice = hashlib.md5(voice.encode()).hexdigest()
+            logger.bind(tag=TAG).error(f"加载唤醒词配置文件失败: {e}")
+            return self._config
+        with self._lock:
+            config.update(self._pending)
+            self._config = config
+            self._config_mtime = mtime
+        return config
+
+    def _save_config(self):
+        """把尚未写入的回复合并到配置文件中，在后台线程中调用"""
+        with self._save_lock:
+            with self._lock:
+                pending = dict(self._pending)
+            if not pending:
+                return
+            tmp_file = self.config_file + ".tmp"
+            with open(self.config_file + ".lock", "a") as lock_file:
+                with FileLock(lock_file, timeout=self._lock_timeout):
+                    config = self._read_config_file()
+                    config.update(pending)
+                    with open(tmp_file, "w", encoding="utf-8") as f:
+                        yaml.dump(config, f, allow_unicode=True)
+                    os.replace(tmp_file, self.config_file)
+                    mtime = self._get_mtime()
+            with self._lock:
+                for voice_hash, response in pending.items():
+                    if self._pending.get(voice_hash) is response:
+                        del self._pending[voice_hash]
+                config.update(self._pending)
+                self._config = config
+                self._config_mtime = mtime
+
+    def get_wakeup_response(self, voice: str) -> Optional[Dict]:
         """获取唤醒词回复配置"""
+        voice_hash = hashlib.md5(voice.encode()).hexdigest()
         config = self._load_config()
+        if not config or voice_hash not in config:
+            return None
+        return config[voice_hash]
 
-        if not config or voice not in config:
+    def get_wakeup_audio(self, voice: str) -> Optional[Tuple[Dict, List[bytes]]]:
+        """获取唤醒词回复配置和编码好的opus数据包，没有可用的回复时返回None"""
+        response = self.get_wakeup_response(voice)
+        if not response or not response.get("file_path"):
             return None
+        voice_hash = hashlib.md5(voice.encode()).hexdigest()
+        cached = self._audio.get(voice_hash)
+        if cached is not None and cached[0] == response.get("time"):
+            return response, cached[1]
 
-        # 检查文件大小
-        file_path = config[voice]["file_path"]
+        # 服务启动后第一次使用，或其他进程更新了回复
+        file_path = response["file_path"]
         if not os.path.exists(file_path) or os.stat(file_path).st_size < (15 * 1024):
             return None
-
-        return config[voice]
-
-    def update_wakeup_response(self, voice: str, file_path: str, text: str):
-        """更新唤醒词回复配置"""
+        opus_packets, _ = audio_to_data(file_path)
+        self._audio[voice_hash] = (response.get("time"), opus_packets)
+        return response, opus_packets
+
+    def update_wakeup_response(
+        self, voice: str, file_path: str, text: str, opus_packets: List[bytes]
+    ):
+        """更新唤醒词回复，立即在内存中生效，音频和配置文件在后台线程写入"""
+        if len(opus_packets) < MIN_RESPONSE_PACKETS:
+            return
+        # 过滤表情符号
+        filtered_text = re.sub(
+            r"[\U0001F600-\U0001F64F\U0001F900-\U0001F9FF]", "", text
+        )
+        voice_hash = hashlib.md5(voice.encode()).hexdigest()
+        response = {
+            "voice": voice,
+            "file_path": file_path,
+            "time": time.time(),
+            "text": filtered_text,
+        }
+        with self._lock:
+            self._audio[voice_hash] = (response["time"], opus_packets)
+            self._pending[voice_hash] = response
+            self._config = {**self._config, voice_hash: response}
+        threading.Thread(
+            target=self._persist,
+            args=(file_path, opus_packets),
+            name="wakeup_words_save",
+            daemon=True,
+        ).start()
+
+    def _persist(self, file_path: str, opus_packets: List[bytes]):
         try:
-            # 过滤表情符号
-            filtered_text = re.sub(r'[\U0001F600-\U0001F64F\U0001F900-\U0001F9FF]', '', text)
-            
-            config = self._load_config()
-            voice_hash = hashlib.md5(voice.encode()).hexdigest()
-            config[voice_hash] = {
-                "voice": voice,
-                "file_path": file_path,
-                "time": time.time(),
-                "text": filtered_text,
-            }
-            self._save_config(config)
+            tmp_file = file_path + ".tmp"
+            with open(tmp_file, "wb") as f:
+                f.write(opus_datas_to_wav_bytes(opus_packets, sample_rate=16000))
+            os.replace(tmp_file, file_path)
+            self._save_config()
         except Exception as e:
-            print(f"更新唤醒词回复配置失败: {e}")
-            raise
+            logger.bind(tag=TAG).error(f"保存唤醒词回复失败: {e}")
 
     def generate_file_path(self, voice: str) -> str:
         """生成音频文件路径，使用voice的哈希值作为文件名"""
-        try:
-            # 生成voice的哈希值
-            voice_hash = hashlib.md5(voice.encode()).hexdigest()
-            file_path = os.path.join(self.assets_dir, f"{voice_hash}.wav")
-
-            # 如果文件已存在，先删除
-            if os.path.exists(file_path):
-                try:
-                    os.remove(file_path)
-                except Exception as e:
-                    print(f"删除已存在的音频文件失败: {e}")
-                    raise
-
-            return file_path
-        except Exception as e:
-            print(f"生成音频文件路径失败: {e}")
-            raise
+        voice_hash = hashlib.md5(voice.encode()).hexdigest()
+        return os.path.join(self.assets_dir, f"{voice_hash}.wav")
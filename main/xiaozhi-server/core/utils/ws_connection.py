@@ -0,0 +1,160 @@
+"""设备WebSocket连接的传输参数和流量统计
+
+websockets 默认在客户端提出时协商 permessage-deflate，服务端会逐帧压缩下发的opus音频，
+而opus已经是压缩数据，压不小，白白消耗CPU。这里统一从配置生成 serve() 的传输参数
+（默认关闭压缩），并用 MeteredServerConnection 统计每条连接实际收发的字节数，
+与消息本身的字节数对比得到压缩率，便于按实际流量调整配置。
+
+同一次发送产生的多个WebSocket帧合并成一次 transport.write，
+send_batch 可以把多条消息（如同一节拍内到期的多帧opus）一次写出，每条消息仍是独立的帧，
+客户端收到的消息与逐条发送时完全相同，只是少了系统调用和零碎的TCP报文段。
+"""
+
+import asyncio
+from typing import Any, Dict, List, Sequence
+from websockets.asyncio.server import ServerConnection
+from websockets.protocol import State
+
+COMPRESSION_OPTIONS = ("none", "deflate")
+
+
+def get_serve_options(server_config: Dict[str, Any]) -> Dict[str, Any]:
+    """根据 server.websocket_options 配置生成 websockets.serve 的参数"""
+    options = server_config.get("websocket_options", {}) or {}
+    compression = str(options.get("compression", "none")).lower()
+    if compression not in COMPRESSION_OPTIONS:
+        raise ValueError(
+            f"不支持的websocket压缩方式: {compression}，可选: {COMPRESSION_OPTIONS}"
+        )
+    write_limit_kb = options.get("write_limit_kb", 32)
+    ping_interval = options.get("ping_interval", 20)
+    ping_timeout = options.get("ping_timeout", 20)
+    return {
+        "compression": "deflate" if compression == "deflate" else None,
+        "max_size": int(options.get("max_size_kb", 1024)) * 1024,
+        "max_queue": int(options.get("max_queue", 16)),
+        "write_limit": int(write_limit_kb * 1024),
+        # 设置为0则不发送心跳
+        "ping_interval": float(ping_interval) if ping_interval else None,
+        "ping_timeout": float(ping_timeout) if ping_timeout else None,
+        "create_connection": MeteredServerConnection,
+    }
+
+
+class MeteredServerConnection(ServerConnection):
+    """统计收发字节数的服务端连接
+
+    wire 为实际在TCP上收发的字节数（含帧头，启用压缩时为压缩后的大小），
+    payload 为消息本身的字节数，frames_out 为发出的WebSocket帧数，
+    transport_writes 为写入传输层的次数。
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.wire_bytes_in = 0
+        self.wire_bytes_out = 0
+        self.payload_bytes_in = 0
+        self.payload_bytes_out = 0
+        self.messages_in = 0
+        self.messages_out = 0
+        self.frames_out = 0
+        self.transport_writes = 0
+
+    def data_received(self, data: bytes) -> None:
+        self.wire_bytes_in += len(data)
+        super().data_received(data)
+
+    def send_data(self) -> None:
+        # 与 websockets 的实现相同，只是把待发送的帧合并成一次写入，并统计写入的字节数
+        chunks: List[bytes] = []
+        for data in self.protocol.data_to_send():
+            if data:
+                chunks.append(data)
+                continue
+            self._write(chunks)
+            if self.transport.can_write_eof():
+                # 半关闭TCP连接
+                try:
+                    self.transport.write_eof()
+                except (OSError, RuntimeError):
+                    pass
+            else:
+                self.transport.close()
+        self._write(chunks)
+
+    def _write(self, chunks: List[bytes]):
+        if not chunks:
+            return
+        data = chunks[0] if len(chunks) == 1 else b"".join(chunks)
+        self.frames_out += len(chunks)
+        self.transport_writes += 1
+        self.wire_bytes_out += len(data)
+        self.transport.write(data)
+        chunks.clear()
+
+    async def send(self, message, text=None) -> None:
+        if isinstance(message, (bytes, bytearray, memoryview)):
+            self.payload_bytes_out += len(message)
+            self.messages_out += 1
+        elif isinstance(message, str):
+            self.payload_bytes_out += len(message.encode("utf-8"))
+            self.messages_out += 1
+        await super().send(message, text=text)
+
+    async def send_batch(self, messages: Sequence[bytes]) -> None:
+        """发送多条二进制消息，每条消息是独立的帧，全部帧一次写入传输层"""
+        # 与 send 相同，正在发送分片消息时等待其发送完毕
+        while self.fragmented_send_waiter is not None:
+            await asyncio.shield(self.fragmented_send_waiter)
+        self.payload_bytes_out += sum(len(message) for message in messages)
+        self.messages_out += len(messages)
+        async with self.send_context():
+            for message in messages:
+                self.protocol.send_binary(message)
+
+    def try_send_batch(self, messages: Sequence[bytes]) -> bool:
+        """不等待地发送二进制消息，写缓冲区已满、连接未打开或正在发送分片消息时返回False，
+        此时一条消息都没有发送，调用方应改用 send_batch 等待发送"""
+        if (
+            self.paused
+            or self.fragmented_send_waiter is not None
+            or self.protocol.state is not State.OPEN
+        ):
+            return False
+        self.payload_bytes_out += sum(len(message) for message in messages)
+        self.messages_out += len(messages)
+        for message in messages:
+            self.protocol.send_binary(message)
+        self.send_data()
+        return True
+
+    async def recv(self, decode=None):
+        message = await super().recv(decode)
+        self.messages_in += 1
+        self.payload_bytes_in += (
+            len(message.encode("utf-8")) if isinstance(message, str) else len(message)
+        )
+        return message
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "messages_in": self.messages_in,
+            "messages_out": self.messages_out,
+            "wire_bytes_in": self.wire_bytes_in,
+            "wire_bytes_out": self.wire_bytes_out,
+            "payload_bytes_in": self.payload_bytes_in,
+            "payload_bytes_out": self.payload_bytes_out,
+            "frames_out": self.frames_out,
+            "transport_writes": self.transport_writes,
+            # 实际发送字节数 / 消息字节数，小于1说明压缩有效，未压缩时略大于1（帧头开销）
+            "ratio_in": (
+                round(self.wire_bytes_in / self.payload_bytes_in, 3)
+                if self.payload_bytes_in
+                else None
+            ),
+            "ratio_out": (
+                round(self.wire_bytes_out / self.payload_bytes_out, 3)
+                if self.payload_bytes_out
+                else None
+            ),
+        }
@@ -0,0 +1,303 @@
+"""上游WebSocket连接池
+
+双流式TTS原来每轮对话都新建一条上游WebSocket，回复的第一个音频字节之前
+要先付出DNS、TLS、WebSocket升级的耗时，会话结束后再关闭。
+这里把已经建好（并完成鉴权）的连接按 key 缓存起来：
+- 协议允许在同一连接上开启多个会话的（火山），会话正常结束后归还连接，下一轮直接复用
+- 连接只能用一次的（MiniMax），取走连接时在后台预热一条新连接供下一轮使用
+- 空闲连接超过 idle_timeout 秒后关闭，空闲期间靠 WebSocket ping 保活并剔除失效连接
+- 记录握手耗时、复用次数等指标
+
+连接绑定在创建它的事件循环上，只在第一次使用连接池的事件循环（即服务主循环）中复用，
+其他事件循环调用时退化为每次新建连接。
+"""
+
+import time
+import asyncio
+import threading
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+import websockets
+from websockets.protocol import State
+from config.logger import setup_logging
+
+TAG = __name__
+logger = setup_logging()
+
+OnConnected = Callable[[Any], Awaitable[None]]
+
+
+class PooledConnection:
+    """连接池中的一条连接"""
+
+    def __init__(self, key: Tuple, ws, handshake_ms: float):
+        self.key = key
+        self.ws = ws
+        self.handshake_ms = handshake_ms
+        self.created_at = time.monotonic()
+        self.last_used = self.created_at
+        self.sessions = 0  # 已承载的会话数
+        self.reused = False  # 本次取出是否为复用的连接
+
+    @property
+    def is_open(self) -> bool:
+        return self.ws is not None and self.ws.state is State.OPEN
+
+
+class UpstreamWebSocketPool:
+    def __init__(
+        self,
+        enabled: bool = True,
+        max_idle_per_key: int = 4,
+        idle_timeout: float = 60,
+        heartbeat_interval: float = 20,
+        share_across_devices: bool = True,
+    ):
+        self.enabled = enabled
+        self.max_idle_per_key = max_idle_per_key
+        self.idle_timeout = idle_timeout
+        self.heartbeat_interval = heartbeat_interval
+        self.share_across_devices = share_across_devices
+
+        self._idle: Dict[Tuple, List[PooledConnection]] = {}
+        self._prewarming: Dict[Tuple, asyncio.Task] = {}
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._sweeper: Optional[asyncio.Task] = None
+
+        self.connects = 0
+        self.reuses = 0
+        self.prewarm_hits = 0
+        self.connect_failures = 0
+        self.evicted_idle = 0
+        self.dropped_dead = 0
+        self.handshake_total_ms = 0.0
+        self.handshake_max_ms = 0.0
+        self.handshake_last_ms = 0.0
+
+    def make_key(self, *parts, owner: Any = None) -> Tuple:
+        """连接池key，不跨设备共享时把连接所属的提供者实例也放进key"""
+        if not self.share_across_devices and owner is not None:
+            parts = parts + (id(owner),)
+        return parts
+
+    async def acquire(
+        self,
+        key: Tuple,
+        url: str,
+        headers: Dict[str, Any],
+        on_connected: Optional[OnConnected] = None,
+        prewarm: bool = False,
+        fresh: bool = False,
+    ) -> PooledConnection:
+        """取出一条可用连接，没有空闲连接时新建
+
+        on_connected: 新连接建立后的初始化（如等待鉴权成功事件），计入握手耗时
+        prewarm: 连接只能使用一次时置为True，取走后在后台补充一条空闲连接
+        fresh: 跳过空闲连接直接新建，用于复用连接失败后的重试
+        """
+        if not self._is_pool_loop():
+            return await self._connect(key, url, headers, on_connected)
+
+        if not fresh:
+            conn = self._pop_idle(key)
+            if conn is not None:
+                conn.reused = True
+                conn.last_used = time.monotonic()
+                self.reuses += 1
+                if conn.sessions == 0:
+                    self.prewarm_hits += 1
+                if prewarm:
+                    self._schedule_prewarm(key, url, headers, on_connected)
+                return conn
+
+        conn = await self._connect(key, url, headers, on_connected)
+        if prewarm:
+            self._schedule_prewarm(key, url, headers, on_connected)
+        return conn
+
+    def release(self, conn: Optional[PooledConnection]):
+        """会话正常结束后归还连接，连接已失效或空闲连接已满时直接关闭"""
+        if conn is None:
+            return
+        conn.sessions += 1
+        conn.reused = False
+        conn.last_used = time.monotonic()
+        if not self._is_pool_loop() or not conn.is_open:
+            self._close_later(conn)
+            return
+        idle = self._idle.setdefault(conn.key, [])
+        if len(idle) >= self.max_idle_per_key:
+            self._close_later(conn)
+            return
+        idle.append(conn)
+        self._ensure_sweeper()
+
+    async def discard(self, conn: Optional[PooledConnection]):
+        """关闭连接，不再放回连接池（会话被打断、协议状态未知等情况）"""
+        if conn is None or conn.ws is None:
+            return
+        try:
+            await conn.ws.close()
+        except Exception:
+            pass
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "connects": self.connects,
+            "reuses": self.reuses,
+            "prewarm_hits": self.prewarm_hits,
+            "connect_failures": self.connect_failures,
+            "idle_connections": sum(len(v) for v in self._idle.values()),
+            "evicted_idle": self.evicted_idle,
+            "dropped_dead": self.dropped_dead,
+            "handshake_last_ms": round(self.handshake_last_ms, 1),
+            "handshake_max_ms": round(self.handshake_max_ms, 1),
+            "handshake_avg_ms": (
+                round(self.handshake_total_ms / self.connects, 1)
+                if self.connects
+                else 0.0
+            ),
+        }
+
+    def _is_pool_loop(self) -> bool:
+        if not self.enabled:
+            return False
+        loop = asyncio.get_running_loop()
+        if self._loop is None or self._loop.is_closed():
+            self._loop = loop
+            self._idle.clear()
+            self._prewarming.clear()
+            self._sweeper = None
+        return loop is self._loop
+
+    async def _connect(
+        self,
+        key: Tuple,
+        url: str,
+        headers: Dict[str, Any],
+        on_connected: Optional[OnConnected],
+    ) -> PooledConnection:
+        start = time.perf_counter()
+        try:
+            ws = await websockets.connect(
+                url,
+                additional_headers=headers,
+                max_size=1000000000,
+                ping_interval=self.heartbeat_interval or None,
+                ping_timeout=self.heartbeat_interval or None,
+            )
+        except Exception:
+            self.connect_failures += 1
+            raise
+        try:
+            if on_connected is not None:
+                await on_connected(ws)
+        except Exception:
+            self.connect_failures += 1
+            try:
+                await ws.close()
+            except Exception:
+                pass
+            raise
+        handshake_ms = (time.perf_counter() - start) * 1000
+        self.connects += 1
+        self.handshake_total_ms += handshake_ms
+        self.handshake_last_ms = handshake_ms
+        self.handshake_max_ms = max(self.handshake_max_ms, handshake_ms)
+        logger.bind(tag=TAG).info(f"上游WebSocket握手耗时: {handshake_ms:.0f}ms")
+        return PooledConnection(key, ws, handshake_ms)
+
+    def _pop_idle(self, key: Tuple) -> Optional[PooledConnection]:
+        idle = self._idle.get(key)
+        while idle:
+            conn = idle.pop()  # 优先取最近归还的连接
+            if conn.is_open:
+                return conn
+            self.dropped_dead += 1
+        return None
+
+    def _schedule_prewarm(
+        self,
+        key: Tuple,
+        url: str,
+        headers: Dict[str, Any],
+        on_connected: Optional[OnConnected],
+    ):
+        if self._idle.get(key):
+            return
+        task = self._prewarming.get(key)
+        if task is not None and not task.done():
+            return
+
+        async def prewarm():
+            try:
+                conn = await self._connect(key, url, headers, on_connected)
+            except Exception as e:
+                logger.bind(tag=TAG).warning(f"预热上游WebSocket连接失败: {e}")
+                return
+            finally:
+                self._prewarming.pop(key, None)
+            idle = self._idle.setdefault(key, [])
+            if len(idle) >= self.max_idle_per_key:
+                await self.discard(conn)
+                return
+            idle.append(conn)
+            self._ensure_sweeper()
+
+        self._prewarming[key] = asyncio.create_task(prewarm())
+
+    def _close_later(self, conn: PooledConnection):
+        try:
+            asyncio.get_running_loop().create_task(self.discard(conn))
+        except RuntimeError:
+            pass
+
+    def _ensure_sweeper(self):
+        if self._sweeper is None or self._sweeper.done():
+            self._sweeper = asyncio.create_task(self._sweep())
+
+    async def _sweep(self):
+        """定期关闭超时的空闲连接、剔除已断开的连接，没有空闲连接后退出"""
+        interval = max(1.0, min(self.idle_timeout, self.heartbeat_interval or 30) / 2)
+        while any(self._idle.values()):
+            await asyncio.sleep(interval)
+            now = time.monotonic()
+            expired = []
+            for key in list(self._idle.keys()):
+                keep = []
+                for conn in self._idle[key]:
+                    if not conn.is_open:
+                        self.dropped_dead += 1
+                    elif now - conn.last_used > self.idle_timeout:
+                        self.evicted_idle += 1
+                        expired.append(conn)
+                    else:
+                        keep.append(conn)
+                if keep:
+                    self._idle[key] = keep
+                else:
+                    del self._idle[key]
+            for conn in expired:
+                await self.discard(conn)
+
+
+_ws_pool: Optional[UpstreamWebSocketPool] = None
+_ws_pool_lock = threading.Lock()
+
+
+def get_ws_pool(config: Dict[str, Any] = None) -> UpstreamWebSocketPool:
+    """获取全局上游WebSocket连接池，首次调用时按配置创建"""
+    global _ws_pool
+    if _ws_pool is None:
+        with _ws_pool_lock:
+            if _ws_pool is None:
+                pool_config = (config or {}).get("tts_ws_pool", {}) or {}
+                _ws_pool = UpstreamWebSocketPool(
+                    enabled=bool(pool_config.get("enabled", True)),
+                    max_idle_per_key=int(pool_config.get("max_idle_per_key", 4)),
+                    idle_timeout=float(pool_config.get("idle_timeout", 60)),
+                    heartbeat_interval=float(pool_config.get("heartbeat_interval", 20)),
+                    share_across_devices=bool(
+                        pool_config.get("share_across_devices", True)
+                    ),
+                )
+    return _ws_pool
@@ -4,7 +4,10 @@ from config.logger import setup_logging
 from core.connection import ConnectionHandler
 from config.config_loader import get_config_from_api
 from core.utils.modules_initialize import initialize_modules
+from plugins_func.loadplugins import reload_plugins
 from core.utils.util import check_vad_update, check_asr_update
+from core.utils.ws_connection import get_serve_options
+from core.utils.timer_wheel import TimerWheel
 
 TAG = __name__
 
@@ -31,6 +34,8 @@ class WebSocketServer:
         self._memory = modules["memory"] if "memory" in modules else None
 
         self.active_connections = set()
+        # 全部连接共用的定时器，用于连接空闲超时关闭
+        self.timer_wheel = TimerWheel()
 
     async def start(self):
         server_config = self.config["server"]
@@ -38,7 +43,11 @@ class WebSocketServer:
         port = int(server_config.get("port", 8000))
 
         async with websockets.serve(
-            self._handle_connection, host, port, process_request=self._http_response
+            self._handle_connection,
+            host,
+            port,
+            process_request=self._http_response,
+            **get_serve_options(server_config),
         ):
             await asyncio.Future()
 
@@ -62,6 +71,14 @@ class WebSocketServer:
         finally:
             # 确保从活动连接集合中移除
             self.active_connections.discard(handler)
+            if hasattr(websocket, "get_stats"):
+                self.logger.bind(tag=TAG).info(
+                    f"连接流量统计 {handler.device_id}: {websocket.get_stats()}"
+                )
+            self.logger.bind(tag=TAG).debug(
+                f"当前连接数: {len(self.active_connections)}, "
+                f"待触发定时器数: {self.timer_wheel.pending}"
+            )
             # 强制关闭连接（如果还没有关闭的话）
             try:
                 # 安全地检查WebSocket状态并关闭
@@ -108,6 +125,8 @@ class WebSocketServer:
                 )
                 # 更新配置
                 self.config = new_config
+                # 重新加载插件，刷新全局函数注册表
+                reload_plugins("plugins_func.functions")
                 # 重新初始化组件
                 modules = initialize_modules(
                     self.logger,
@@ -0,0 +1,676 @@
+"""热点路径微基准测试
+
+不依赖任何外部服务，用于对比优化前后的单次耗时。
+用法：
+    python performance_tester_micro.py            # 运行全部用例
+    python performance_tester_micro.py tts_loop   # 只运行指定用例
+"""
+
+import sys
+import time
+import asyncio
+import logging
+from typing import Callable, Dict, List
+
+from tabulate import tabulate
+
+# 设置全局日志级别为WARNING，抑制INFO级别日志
+logging.basicConfig(level=logging.WARNING)
+
+BENCHMARKS: Dict[str, Callable[[], List[list]]] = {}
+
+
+def benchmark(name: str):
+    """注册基准测试用例，用例返回 [[名称, 次数, 单次耗时(us)], ...]"""
+
+    def decorator(func):
+        BENCHMARKS[name] = func
+        return func
+
+    return decorator
+
+
+def measure(func: Callable[[], object], number: int) -> float:
+    """返回单次调用的平均耗时(us)"""
+    func()  # 预热
+    start = time.perf_counter()
+    for _ in range(number):
+        func()
+    return (time.perf_counter() - start) / number * 1_000_000
+
+
+@benchmark("tts_loop")
+def bench_tts_loop():
+    """每句新建事件循环 vs 线程常驻事件循环"""
+    import aiohttp
+    from core.utils.thread_loop import run_in_thread_loop, get_thread_http_session
+
+    async def synthesize():
+        await asyncio.sleep(0)
+
+    async def new_session():
+        async with aiohttp.ClientSession():
+            await asyncio.sleep(0)
+
+    async def shared_session():
+        get_thread_http_session()
+        await asyncio.sleep(0)
+
+    number = 2000
+    return [
+        ["asyncio.run", number, measure(lambda: asyncio.run(synthesize()), number)],
+        [
+            "run_in_thread_loop",
+            number,
+            measure(lambda: run_in_thread_loop(synthesize()), number),
+        ],
+        [
+            "asyncio.run + 新建会话",
+            number,
+            measure(lambda: asyncio.run(new_session()), number),
+        ],
+        [
+            "run_in_thread_loop + 复用会话",
+            number,
+            measure(lambda: run_in_thread_loop(shared_session()), number),
+        ],
+    ]
+
+
+def _streaming_pcm_chunks(seconds: int = 10, seed: int = 0) -> List[bytes]:
+    """模拟双流式TTS推送的PCM分片：以几百字节的小分片为主，夹杂少量大分片和奇数字节分片"""
+    import random
+
+    rng = random.Random(seed)
+    total = 16000 * 2 * seconds
+    chunks = []
+    while total > 0:
+        r = rng.random()
+        if r < 0.6:
+            size = rng.randint(64, 640)
+        elif r < 0.9:
+            size = rng.randint(640, 4096)
+        else:
+            size = rng.randint(4096, 16384)
+        if rng.random() < 0.1:
+            size |= 1
+        size = min(size, total)
+        chunks.append(bytes(rng.getrandbits(8) for _ in range(size)))
+        total -= size
+    return chunks
+
+
+@benchmark("opus_encoder_buffer")
+def bench_opus_encoder_buffer():
+    """OpusEncoderUtils分帧缓冲：np.append 追加 vs 固定缓冲区（不含编码耗时，以及含编码的完整流程）"""
+    import numpy as np
+    from core.utils.opus_encoder_utils import OpusEncoderUtils
+
+    chunks = _streaming_pcm_chunks()
+    frame_size = 960
+
+    def legacy_buffering():
+        # 优化前的实现：每次追加都重新分配，偶数字节对齐由调用方保证
+        buffer = np.array([], dtype=np.int16)
+        for chunk in chunks:
+            chunk = chunk[: len(chunk) & ~1]
+            buffer = np.append(buffer, np.frombuffer(chunk, dtype=np.int16))
+            offset = 0
+            while offset <= len(buffer) - frame_size:
+                buffer[offset : offset + frame_size].tobytes()
+                offset += frame_size
+            buffer = buffer[offset:]
+
+    no_encode = OpusEncoderUtils(16000, 1, 60)
+    no_encode._encode = lambda frame: frame.tobytes()
+
+    def ring_buffering():
+        no_encode.reset_state()
+        for chunk in chunks:
+            no_encode.encode_pcm_to_opus(chunk, end_of_stream=False)
+        no_encode.encode_pcm_to_opus(b"", end_of_stream=True)
+
+    encoder = OpusEncoderUtils(16000, 1, 60)
+
+    def full_encode():
+        encoder.reset_state()
+        for chunk in chunks:
+            encoder.encode_pcm_to_opus(chunk, end_of_stream=False)
+        encoder.encode_pcm_to_opus(b"", end_of_stream=True)
+
+    return [
+        [f"np.append 分帧 ({len(chunks)}个分片)", 20, measure(legacy_buffering, 20)],
+        [f"固定缓冲区分帧 ({len(chunks)}个分片)", 20, measure(ring_buffering, 20)],
+        ["固定缓冲区 + opus编码(10秒音频)", 5, measure(full_encode, 5)],
+    ]
+
+
+@benchmark("text_segmenter")
+def bench_text_segmenter():
+    """流式分句：每个token重新拼接全文并rfind vs 增量扫描（逐token喂入一段长回复）"""
+    from core.utils.text_segmenter import StreamingSegmenter
+
+    punctuations = ("。", "？", "?", "！", "!", "；", ";", "：")
+    first_punctuations = ("，", "～", "~", "、", ",") + punctuations
+    reply = "好的，这个问题我来详细解释一下。" + "首先需要说明的是，" * 20
+    reply += "这是一段很长的回复，包含逗号和句号。" * 100
+    tokens = [reply[i : i + 2] for i in range(0, len(reply), 2)]
+
+    def legacy_segment():
+        # 优化前的实现
+        buff, processed, first = [], 0, True
+        for token in tokens:
+            buff.append(token)
+            current = "".join(buff)[processed:]
+            last = -1
+            for punct in first_punctuations if first else punctuations:
+                pos = current.rfind(punct)
+                if pos != -1 and (last == -1 or pos < last):
+                    last = pos
+            if last != -1:
+                processed += last + 1
+                first = False
+
+    segmenter = StreamingSegmenter(punctuations, first_punctuations)
+
+    def incremental_segment():
+        segmenter.reset()
+        for token in tokens:
+            segmenter.push(token)
+        segmenter.flush()
+
+    return [
+        [f"拼接全文 + rfind ({len(reply)}字)", 20, measure(legacy_segment, 20)],
+        [f"StreamingSegmenter ({len(reply)}字)", 20, measure(incremental_segment, 20)],
+    ]
+
+
+@benchmark("text_cleaning")
+def bench_text_cleaning():
+    """TTS片段文本清理：逐个正则 + 逐字符区间判断 vs 预计算字符集 + 按需执行正则"""
+    from core.utils import textUtils
+    from core.utils.tts import MarkdownCleaner
+
+    segments = [
+        "好的，我来帮你查一下今天的天气😊",
+        "今天北京晴，最高气温二十五度，最低气温十五度。",
+        "**注意**：出门记得带伞！",
+        "1. 第一步，打开设置；\n2. 第二步，选择网络。",
+        "【提示】你可以说“播放音乐”来听歌～～",
+    ]
+
+    def legacy_is_punctuation_or_emoji(char):
+        # 优化前的实现：每次调用都重建标点集合和区间列表
+        punctuation_set = {"，", ",", "。", ".", "！", "!", "-", "－", "、"}
+        punctuation_set.update({"[", "]", "【", "】"})
+        if char.isspace() or char in punctuation_set:
+            return True
+        code_point = ord(char)
+        return any(start <= code_point <= end for start, end in textUtils.EMOJI_RANGES)
+
+    def legacy_strip(s):
+        chars = list(s)
+        start = 0
+        while start < len(chars) and legacy_is_punctuation_or_emoji(chars[start]):
+            start += 1
+        end = len(chars) - 1
+        while end >= start and legacy_is_punctuation_or_emoji(chars[end]):
+            end -= 1
+        return "".join(chars[start : end + 1])
+
+    def legacy_clean(text):
+        for regex, replacement, _ in MarkdownCleaner.REGEXES:
+            text = regex.sub(replacement, text)
+        return text.strip()
+
+    def legacy_pipeline():
+        for segment in segments:
+            legacy_clean(legacy_strip(segment))
+
+    def pipeline():
+        for segment in segments:
+            MarkdownCleaner.clean_markdown(
+                textUtils.get_string_no_punctuation_or_emoji(segment)
+            )
+
+    number = 20000
+    return [
+        [
+            "去除首尾标点表情(优化前)",
+            number,
+            measure(lambda: [legacy_strip(s) for s in segments], number)
+            / len(segments),
+        ],
+        [
+            "去除首尾标点表情",
+            number,
+            measure(
+                lambda: [
+                    textUtils.get_string_no_punctuation_or_emoji(s) for s in segments
+                ],
+                number,
+            )
+            / len(segments),
+        ],
+        [
+            "Markdown清理(优化前)",
+            number,
+            measure(lambda: [legacy_clean(s) for s in segments], number)
+            / len(segments),
+        ],
+        [
+            "Markdown清理",
+            number,
+            measure(
+                lambda: [MarkdownCleaner.clean_markdown(s) for s in segments], number
+            )
+            / len(segments),
+        ],
+        [
+            "单个片段完整清理(优化前)",
+            number,
+            measure(legacy_pipeline, number) / len(segments),
+        ],
+        ["单个片段完整清理", number, measure(pipeline, number) / len(segments)],
+    ]
+
+
+@benchmark("music_search")
+def bench_music_search():
+    """点歌匹配：difflib逐首比较 vs 倒排索引取候选 + difflib精排（2万首曲库）"""
+    import os
+    import random
+    import difflib
+    from core.utils.music_index import MusicIndex
+
+    rng = random.Random(0)
+    chars = "的一是在不了有和人这中大为上个国我以要他时来用们生到作地于出就分对成会可主发年动同工也能下过子说产种面而方后多定行学法所民得经十三之进着等部度家电力里如水化高自二理起小物现实加量都两体制机当使点从业本去把性好应开它合还因由其些然前外天政四日那社义事平形相全表间样与关各重新线内数正心反你明看原又么利比或但质气第向道命此变条只没结解问意建月公无系军很情者最立代想已通并提直题党程展五果料象员革位入常文总次品式活设及管特件长求老头基资边流路级少图山统接知较将组见计别她手角期根论运农指几九区强放决西被干做必战先回则任取据处府研队南给色光门即保治北造百规热领七海口东导器压志世金增争济阶油思术极交受联什认六共权收证改清己美再采转更单风切打白教速花带安场身车例真务具万每目至达走积示议声报斗完类八离华名确才科张信马节话米整空元况今集温传土许步群广石记需段研界拉林律叫且究观越织装影算低持音众书布复容儿须际商非验连断深难近矿千周委素技备半办青省列习响约支般史感劳便团往酸历市克何除消构府称太准精值号率族维划选标写存候毛亲快效斯院查江型眼王按格养易置派层片始却专状育厂京识适属圆包火住调满县局照参红细引听该铁价严龙飞"
+    files = [
+        f"歌手{i % 500}/"
+        + "".join(rng.choice(chars) for _ in range(rng.randint(2, 8)))
+        + ".mp3"
+        for i in range(20000)
+    ]
+    queries = [os.path.splitext(os.path.basename(f))[0] for f in rng.sample(files, 50)]
+    names = [os.path.splitext(f)[0] for f in files]
+
+    def legacy_search():
+        # 优化前的实现
+        for query in queries:
+            best_match, highest_ratio = None, 0
+            for music_file, song_name in zip(files, names):
+                ratio = difflib.SequenceMatcher(None, query, song_name).ratio()
+                if ratio > highest_ratio and ratio > 0.4:
+                    highest_ratio = ratio
+                    best_match = music_file
+
+    index = MusicIndex(".", (".mp3",))
+    index.update(files)
+
+    def indexed_search():
+        for query in queries:
+            index.search(query)
+
+    return [
+        [
+            f"difflib逐首比较 ({len(files)}首)",
+            1,
+            measure(legacy_search, 1) / len(queries),
+        ],
+        [
+            f"倒排索引 + 精排 ({len(files)}首)",
+            100,
+            measure(indexed_search, 100) / len(queries),
+        ],
+    ]
+
+
+@benchmark("audio_pacing")
+def bench_audio_pacing():
+    """多连接同时播放：每条连接逐帧sleep vs 全局节拍器（300条连接各播放1.5秒，统计每帧CPU耗时）"""
+    from core.utils.audio_pacer import AudioPacer
+
+    connections, frames = 300, 25
+    packets = [b"\x00" * 120] * frames
+
+    class FakeWebSocket:
+        async def send(self, message):
+            pass
+
+        def try_send_batch(self, messages):
+            # 与 MeteredServerConnection 相同，写缓冲区未满时直接写入
+            return True
+
+    class FakeConn:
+        def __init__(self):
+            self.websocket = FakeWebSocket()
+            self.client_abort = False
+            self.last_activity_time = 0
+
+    async def legacy_send(conn):
+        # 优化前的实现
+        start_time = time.perf_counter()
+        play_position = 0
+        for opus_packet in packets:
+            conn.last_activity_time = time.time() * 1000
+            delay = start_time + (play_position / 1000) - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            await conn.websocket.send(opus_packet)
+            play_position += 60
+
+    def run(play):
+        async def main():
+            await asyncio.gather(*(play(FakeConn()) for _ in range(connections)))
+
+        start = time.process_time()
+        asyncio.run(main())
+        return (time.process_time() - start) / (connections * frames) * 1_000_000
+
+    legacy_us = run(legacy_send)
+    pacer = AudioPacer()
+    pacer_us = run(lambda conn: pacer.play(conn, packets))
+    stats = pacer.get_stats()
+    return [
+        ["逐帧sleep", connections * frames, legacy_us],
+        [
+            f"全局节拍器 (节拍{stats['ticks']}次, 迟发{stats['late_frames']}帧, "
+            f"最大抖动{stats['max_jitter_ms']}ms)",
+            connections * frames,
+            pacer_us,
+        ],
+    ]
+
+
+@benchmark("emotion")
+def bench_emotion():
+    """句子情感分析：逐情感逐关键词子串查找 vs Aho-Corasick自动机一次扫描，以及重复句子命中缓存"""
+    from core.utils import emotion
+
+    sentences = [
+        "好的，我来帮你查一下今天的天气。",
+        "哈哈哈，这个笑话太好笑了，笑死我了！",
+        "别难过啦，明天一定会更好的，我一直陪着你呢。",
+        "你知道为什么天空是蓝色的吗？",
+        "嗯……让我想一下这个问题应该怎么回答比较好。",
+        "今天中午吃了一顿大餐，红烧肉特别香，真是太好吃了，到现在还在流口水呢。",
+        "Good night, sleep well and have sweet dreams.",
+    ]
+
+    def legacy_analyze(text):
+        # 优化前的实现：每次调用都重建关键词表，逐个关键词查找
+        emotion_keywords = {k: list(v) for k, v in emotion.EMOTION_KEYWORDS.items()}
+        original_text = text
+        text = text.lower().strip()
+        for name, emoji in emotion.emoji_map.items():
+            if emoji in original_text:
+                return name
+        has_exclamation = "!" in original_text or "！" in original_text
+        has_question = "?" in original_text or "？" in original_text
+        has_ellipsis = "..." in original_text or "…" in original_text
+        if any(p in text for p in list(emotion.PRAISE_OTHERS_PHRASES)):
+            return "loving"
+        if any(p in text for p in list(emotion.PRAISE_SELF_PHRASES)):
+            return "cool"
+        if any(p in text for p in list(emotion.SLEEP_PHRASES)):
+            return "sleepy"
+        if has_question and not has_exclamation:
+            return "thinking"
+        if has_exclamation and not has_question:
+            positive = sum(
+                (emotion_keywords[e] for e in ("happy", "laughing", "cool")), []
+            )
+            if any(word in text for word in positive):
+                return "laughing"
+            negative = sum(
+                (emotion_keywords[e] for e in ("angry", "sad", "crying")), []
+            )
+            if any(word in text for word in negative):
+                return "angry"
+            return "surprised"
+        if has_ellipsis:
+            return "thinking"
+        scores = {name: 0 for name in emotion.emoji_map.keys()}
+        for name, keywords in emotion_keywords.items():
+            for keyword in keywords:
+                if keyword in text:
+                    scores[name] += 1
+        if len(text) > 20:
+            for name, keywords in emotion_keywords.items():
+                for keyword in keywords:
+                    scores[name] += text.count(keyword) * 0.5
+        max_score = max(scores.values())
+        if max_score == 0:
+            return "happy"
+        top = [e for e, s in scores.items() if s == max_score]
+        for name in emotion.PRIORITY_ORDER:
+            if name in top:
+                return name
+        return top[0]
+
+    for sentence in sentences:
+        assert legacy_analyze(sentence) == emotion.analyze_emotion(sentence), sentence
+
+    number = 5000
+    return [
+        [
+            "逐关键词查找",
+            number,
+            measure(lambda: [legacy_analyze(s) for s in sentences], number)
+            / len(sentences),
+        ],
+        [
+            "Aho-Corasick",
+            number,
+            measure(
+                lambda: [emotion._analyze_emotion.__wrapped__(s) for s in sentences],
+                number,
+            )
+            / len(sentences),
+        ],
+        [
+            "Aho-Corasick + 缓存命中",
+            number,
+            measure(lambda: [emotion.analyze_emotion(s) for s in sentences], number)
+            / len(sentences),
+        ],
+    ]
+
+
+@benchmark("ws_batch_send")
+def bench_ws_batch_send():
+    """本机WebSocket播放：逐帧写入 vs 同一节拍内到期的帧合并写入（100条连接，节拍120ms，开头提前5帧）"""
+    import websockets
+    from websockets.asyncio.client import connect
+    from core.utils.audio_pacer import AudioPacer
+    from core.utils.ws_connection import MeteredServerConnection
+
+    connections, frames = 100, 25
+    packets = [b"\x00" * 120] * frames
+
+    class FakeConn:
+        def __init__(self, websocket):
+            self.websocket = websocket
+            self.client_abort = False
+            self.last_activity_time = 0
+
+    def run(batch_send):
+        pacer = AudioPacer(tick_ms=120, batch_send=batch_send)
+        server_conns = []
+
+        async def handler(websocket):
+            server_conns.append(websocket)
+            await pacer.play(FakeConn(websocket), packets, lead_frames=5)
+            await websocket.close()
+
+        async def client(port):
+            async with connect(f"ws://127.0.0.1:{port}") as websocket:
+                return len([message async for message in websocket])
+
+        async def main():
+            async with websockets.serve(
+                handler,
+                "127.0.0.1",
+                0,
+                compression=None,
+                create_connection=MeteredServerConnection,
+            ) as server:
+                port = server.sockets[0].getsockname()[1]
+                received = await asyncio.gather(
+                    *(client(port) for _ in range(connections))
+                )
+            assert received == [frames] * connections
+
+        start = time.process_time()
+        asyncio.run(main())
+        cpu_us = (time.process_time() - start) / (connections * frames) * 1_000_000
+        writes = sum(conn.transport_writes for conn in server_conns)
+        return writes, pacer.get_stats(), cpu_us
+
+    rows = []
+    for name, batch_send in (("逐帧写入", False), ("合并写入", True)):
+        writes, stats, cpu_us = run(batch_send)
+        rows.append(
+            [
+                f"{name} (写入{writes}次, 每秒少写入{stats['writes_saved_per_sec']}次)",
+                connections * frames,
+                cpu_us,
+            ]
+        )
+    return rows
+
+
+@benchmark("idle_timeout")
+def bench_idle_timeout():
+    """空闲连接超时检查：每条连接一个轮询任务 vs 全局时间轮（2000条空闲连接，检查间隔缩短为50ms，运行1秒）"""
+    from core.utils.timer_wheel import TimerWheel
+
+    connections, interval, duration = 2000, 0.05, 1.0
+    timeout_seconds = 180
+
+    async def legacy_check(state):
+        # 优化前的实现：每条连接循环sleep，醒来比较最后活动时间
+        while not state["stop"]:
+            if (
+                time.time() * 1000 - state["last_activity_time"]
+                > timeout_seconds * 1000
+            ):
+                break
+            await asyncio.sleep(interval)
+
+    async def run_legacy():
+        state = {"stop": False, "last_activity_time": time.time() * 1000}
+        tasks = [asyncio.create_task(legacy_check(state)) for _ in range(connections)]
+        await asyncio.sleep(duration)
+        state["stop"] = True
+        await asyncio.gather(*tasks)
+
+    async def run_wheel():
+        wheel = TimerWheel(tick=interval)
+        for _ in range(connections):
+            wheel.schedule(timeout_seconds, lambda: None)
+        await asyncio.sleep(duration)
+
+    def run(main):
+        start = time.process_time()
+        asyncio.run(main())
+        return (time.process_time() - start) / connections * 1_000_000
+
+    wheel = TimerWheel()
+
+    async def reschedule():
+        handle = wheel.schedule(timeout_seconds, lambda: None)
+        for _ in range(100000):
+            handle.reschedule(timeout_seconds)
+
+    start = time.perf_counter()
+    asyncio.run(reschedule())
+    reschedule_us = (time.perf_counter() - start) / 100000 * 1_000_000
+
+    return [
+        ["每连接轮询任务（每连接每秒CPU）", connections, run(run_legacy)],
+        ["全局时间轮（每连接每秒CPU）", connections, run(run_wheel)],
+        ["时间轮重设定时器", 100000, reschedule_us],
+    ]
+
+
+@benchmark("tool_handler_init")
+def bench_tool_handler_init():
+    """每条连接初始化插件工具：扫描插件包 + 重建工具定义 vs 进程级注册表 + 按配置过滤"""
+    import importlib
+    import pkgutil
+    from core.providers.tools.base import ToolType, ToolDefinition
+    from core.providers.tools.server_plugins.plugin_executor import (
+        ServerPluginExecutor,
+    )
+    from plugins_func.loadplugins import auto_import_modules
+    from plugins_func.register import all_function_registry
+
+    package_name = "plugins_func.functions"
+    auto_import_modules(package_name)
+
+    class FakeConn:
+        def __init__(self):
+            self.config = {
+                "selected_module": {"Intent": "function_call"},
+                "Intent": {
+                    "function_call": {
+                        "functions": ["get_weather", "play_music", "change_role"]
+                    }
+                },
+            }
+
+    conn = FakeConn()
+
+    def legacy_init():
+        # 优化前的实现：每条连接扫描插件包并重建工具定义
+        package = importlib.import_module(package_name)
+        for _, module_name, _ in pkgutil.iter_modules(package.__path__):
+            importlib.import_module(f"{package_name}.{module_name}")
+
+        config = conn.config
+        necessary_functions = ["handle_exit_intent", "get_time", "get_lunar"]
+        config_functions = config["Intent"][config["selected_module"]["Intent"]].get(
+            "functions", []
+        )
+        tools = {}
+        for func_name in list(set(necessary_functions + config_functions)):
+            func_item = all_function_registry.get(func_name)
+            if func_item:
+                tools[func_name] = ToolDefinition(
+                    name=func_name,
+                    description=func_item.description,
+                    tool_type=ToolType.SERVER_PLUGIN,
+                )
+        return tools
+
+    def filtered_init():
+        executor = ServerPluginExecutor(conn)
+        return executor.get_tools()
+
+    number = 2000
+    return [
+        ["扫描插件包 + 重建工具定义", number, measure(legacy_init, number)],
+        ["全局注册表 + 按配置过滤", number, measure(filtered_init, number)],
+    ]
+
+
+def main():
+    names = sys.argv[1:] or list(BENCHMARKS.keys())
+    for name in names:
+        if name not in BENCHMARKS:
+            print(f"未知用例: {name}，可选: {', '.join(BENCHMARKS.keys())}")
+            continue
+        rows = BENCHMARKS[name]()
+        print(f"\n{name}: {BENCHMARKS[name].__doc__}")
+        print(
+            tabulate(
+                [[r[0], r[1], f"{r[2]:.1f}"] for r in rows],
+                headers=["实现", "次数", "单次耗时(us)"],
+                tablefmt="github",
+            )
+        )
+
+
+if __name__ == "__main__":
+    main()
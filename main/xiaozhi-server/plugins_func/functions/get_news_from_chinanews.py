@@ -4,6 +4,7 @@ import xml.etree.ElementTree as ET
 from bs4 import BeautifulSoup
 from config.logger import setup_logging
 from plugins_func.register import register_function, ToolType, ActionResponse, Action
+from core.utils.ttl_cache import ttl_cache
 
 TAG = __name__
 logger = setup_logging()
@@ -40,6 +41,7 @@ GET_NEWS_FROM_CHINANEWS_FUNCTION_DESC = {
 }
 
 
+@ttl_cache("chinanews_rss", ttl=300, maxsize=64, stale_ttl=900, persist=True)
 def fetch_news_from_rss(rss_url):
     """从RSS源获取新闻列表"""
     try:
@@ -82,6 +84,13 @@ def fetch_news_from_rss(rss_url):
         return []
 
 
+@ttl_cache(
+    "chinanews_detail",
+    ttl=3600,
+    maxsize=256,
+    persist=True,
+    should_cache=lambda content: bool(content) and content != "无法获取详细内容",
+)
 def fetch_news_detail(url):
     """获取新闻详情页内容并总结"""
     try:
@@ -143,6 +152,8 @@ def map_category(category_text):
     "get_news_from_chinanews",
     GET_NEWS_FROM_CHINANEWS_FUNCTION_DESC,
     ToolType.SYSTEM_CTL,
+    timeout=20,
+    max_concurrency=4,
 )
 def get_news_from_chinanews(
     conn, category: str = None, detail: bool = False, lang: str = "zh_CN"
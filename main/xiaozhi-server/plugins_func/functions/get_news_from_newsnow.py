@@ -3,6 +3,7 @@ import requests
 import json
 from config.logger import setup_logging
 from plugins_func.register import register_function, ToolType, ActionResponse, Action
+from core.utils.ttl_cache import ttl_cache
 from markitdown import MarkItDown
 
 TAG = __name__
@@ -125,22 +126,35 @@ def fetch_news_from_api(conn, source="thepaper"):
         ]["get_news_from_newsnow"].get("url"):
             api_url = conn.config["plugins"]["get_news_from_newsnow"]["url"] + source
 
-        response = requests.get(api_url, timeout=10)
-        response.raise_for_status()
-
-        data = response.json()
-
-        if "items" in data:
-            return data["items"]
-        else:
-            logger.bind(tag=TAG).error(f"获取新闻API响应格式错误: {data}")
-            return []
+        return fetch_news_items(api_url)
 
     except Exception as e:
         logger.bind(tag=TAG).error(f"获取新闻API失败: {e}")
         return []
 
 
+@ttl_cache("newsnow_items", ttl=300, maxsize=64, stale_ttl=900, persist=True)
+def fetch_news_items(api_url):
+    """请求新闻API，返回新闻条目列表"""
+    response = requests.get(api_url, timeout=10)
+    response.raise_for_status()
+
+    data = response.json()
+
+    if "items" in data:
+        return data["items"]
+    else:
+        logger.bind(tag=TAG).error(f"获取新闻API响应格式错误: {data}")
+        return []
+
+
+@ttl_cache(
+    "newsnow_detail",
+    ttl=3600,
+    maxsize=256,
+    persist=True,
+    should_cache=lambda content: bool(content) and content != "无法获取详细内容",
+)
 def fetch_news_detail(url):
     """获取新闻详情页内容并使用MarkItDown清理HTML"""
     try:
@@ -169,6 +183,8 @@ def fetch_news_detail(url):
     "get_news_from_newsnow",
     GET_NEWS_FROM_NEWSNOW_FUNCTION_DESC,
     ToolType.SYSTEM_CTL,
+    timeout=20,
+    max_concurrency=4,
 )
 def get_news_from_newsnow(
     conn, source: str = "澎湃新闻", detail: bool = False, lang: str = "zh_CN"
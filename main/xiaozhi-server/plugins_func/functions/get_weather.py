@@ -3,6 +3,7 @@ from bs4 import BeautifulSoup
 from config.logger import setup_logging
 from plugins_func.register import register_function, ToolType, ActionResponse, Action
 from core.utils.util import get_ip_info
+from core.utils.ttl_cache import ttl_cache
 
 TAG = __name__
 logger = setup_logging()
@@ -107,6 +108,14 @@ WEATHER_CODE_MAP = {
 }
 
 
+@ttl_cache(
+    "weather_city_info",
+    ttl=7 * 24 * 3600,
+    maxsize=1024,
+    persist=True,
+    # 城市名不区分大小写
+    key_func=lambda location, api_key, api_host: (str(location).lower(), api_host),
+)
 def fetch_city_info(location, api_key, api_host):
     url = f"https://{api_host}/geo/v2/city/lookup?key={api_key}&location={location}&lang=zh"
     response = requests.get(url, headers=HEADERS).json()
@@ -118,6 +127,15 @@ def fetch_weather_page(url):
     return BeautifulSoup(response.text, "html.parser") if response.ok else None
 
 
+@ttl_cache("weather_info", ttl=600, maxsize=512, stale_ttl=1800, persist=True)
+def fetch_weather_info(url):
+    """获取并解析天气页面，返回 (城市名, 当前天气, 详细参数, 7天预报)"""
+    soup = fetch_weather_page(url)
+    if not soup:
+        return None
+    return parse_weather_info(soup)
+
+
 def parse_weather_info(soup):
     city_name = soup.select_one("h1.c-submenu__location").get_text(strip=True)
 
@@ -149,7 +167,13 @@ def parse_weather_info(soup):
     return city_name, current_abstract, current_basic, temps_list
 
 
-@register_function("get_weather", GET_WEATHER_FUNCTION_DESC, ToolType.SYSTEM_CTL)
+@register_function(
+    "get_weather",
+    GET_WEATHER_FUNCTION_DESC,
+    ToolType.SYSTEM_CTL,
+    timeout=15,
+    max_concurrency=8,
+)
 def get_weather(conn, location: str = None, lang: str = "zh_CN"):
     api_host = conn.config["plugins"]["get_weather"].get("api_host", "mj7p3y7naa.re.qweatherapi.com")
     api_key = conn.config["plugins"]["get_weather"].get("api_key", "a861d0d5e7bf4ee1a83d9a9e4f96d4da")
@@ -170,10 +194,10 @@ def get_weather(conn, location: str = None, lang: str = "zh_CN"):
         return ActionResponse(
             Action.REQLLM, f"未找到相关的城市: {location}，请确认地点是否正确", None
         )
-    soup = fetch_weather_page(city_info["fxLink"])
-    if not soup:
+    weather_info = fetch_weather_info(city_info["fxLink"])
+    if not weather_info:
         return ActionResponse(Action.REQLLM, None, "请求失败")
-    city_name, current_abstract, current_basic, temps_list = parse_weather_info(soup)
+    city_name, current_abstract, current_basic, temps_list = weather_info
 
     weather_report = f"您查询的位置是：{city_name}\n\n当前天气: {current_abstract}\n"
 
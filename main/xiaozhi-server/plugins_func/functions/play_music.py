@@ -4,10 +4,10 @@ import re
 import time
 import random
 import asyncio
-import difflib
 import traceback
-from pathlib import Path
 from core.utils import p3
+from core.utils.audio_transcoder import get_audio_transcoder
+from core.utils.music_index import MusicIndex, get_index_file
 from core.handle.sendAudioHandle import send_stt_message
 from plugins_func.register import register_function, ToolType, ActionResponse, Action
 from core.utils.dialogue import Message
@@ -16,6 +16,8 @@ from core.providers.tts.dto.dto import TTSMessageDTO, SentenceType, ContentType
 TAG = __name__
 
 MUSIC_CACHE = {}
+# 首次构建音乐索引时，并发的调用等待同一次构建完成
+_music_init_lock = asyncio.Lock()
 
 play_music_function_desc = {
     "type": "function",
@@ -85,42 +87,23 @@ def _extract_song_name(text):
     return None
 
 
-def _find_best_match(potential_song, music_files):
-    """查找最匹配的歌曲"""
-    best_match = None
-    highest_ratio = 0
-
-    for music_file in music_files:
-        song_name = os.path.splitext(music_file)[0]
-        ratio = difflib.SequenceMatcher(None, potential_song, song_name).ratio()
-        if ratio > highest_ratio and ratio > 0.4:
-            highest_ratio = ratio
-            best_match = music_file
-    return best_match
-
-
-def get_music_files(music_dir, music_ext):
-    music_dir = Path(music_dir)
-    music_files = []
-    music_file_names = []
-    for file in music_dir.rglob("*"):
-        # 判断是否是文件
-        if file.is_file():
-            # 获取文件扩展名
-            ext = file.suffix.lower()
-            # 判断扩展名是否在列表中
-            if ext in music_ext:
-                # 添加相对路径
-                music_files.append(str(file.relative_to(music_dir)))
-                music_file_names.append(
-                    os.path.splitext(str(file.relative_to(music_dir)))[0]
-                )
-    return music_files, music_file_names
-
-
-def initialize_music_handler(conn):
+def _refresh_music_files():
+    """增量刷新音乐索引，目录没有变化时只检查各目录的修改时间"""
+    music_index = MUSIC_CACHE["music_index"]
+    if music_index.refresh() or "music_files" not in MUSIC_CACHE:
+        MUSIC_CACHE["music_files"] = music_index.files
+        MUSIC_CACHE["music_file_names"] = music_index.names
+        _submit_transcode(MUSIC_CACHE["music_files"])
+    MUSIC_CACHE["scan_time"] = time.time()
+
+
+async def initialize_music_handler(conn):
     global MUSIC_CACHE
-    if MUSIC_CACHE == {}:
+    if "scan_time" in MUSIC_CACHE:
+        return MUSIC_CACHE
+    async with _music_init_lock:
+        if "scan_time" in MUSIC_CACHE:
+            return MUSIC_CACHE
         if "play_music" in conn.config["plugins"]:
             MUSIC_CACHE["music_config"] = conn.config["plugins"]["play_music"]
             MUSIC_CACHE["music_dir"] = os.path.abspath(
@@ -132,20 +115,40 @@ def initialize_music_handler(conn):
             MUSIC_CACHE["refresh_time"] = MUSIC_CACHE["music_config"].get(
                 "refresh_time", 60
             )
+            MUSIC_CACHE["transcode_p3"] = MUSIC_CACHE["music_config"].get(
+                "transcode_p3", True
+            )
         else:
             MUSIC_CACHE["music_dir"] = os.path.abspath("./music")
             MUSIC_CACHE["music_ext"] = (".mp3", ".wav", ".p3")
             MUSIC_CACHE["refresh_time"] = 60
-        # 获取音乐文件列表
-        MUSIC_CACHE["music_files"], MUSIC_CACHE["music_file_names"] = get_music_files(
-            MUSIC_CACHE["music_dir"], MUSIC_CACHE["music_ext"]
-        )
-        MUSIC_CACHE["scan_time"] = time.time()
+            MUSIC_CACHE["transcode_p3"] = True
+        # 首次构建要读取索引文件、扫描全部目录并计算拼音，放到线程中执行，不阻塞事件循环
+        await asyncio.to_thread(_build_music_index)
     return MUSIC_CACHE
 
 
+def _build_music_index():
+    """创建音乐索引并获取音乐文件列表"""
+    MUSIC_CACHE["music_index"] = MusicIndex(
+        MUSIC_CACHE["music_dir"], MUSIC_CACHE["music_ext"], get_index_file()
+    )
+    _refresh_music_files()
+
+
+def _submit_transcode(music_files):
+    """把尚未转码的音乐交给后台转码，转码完成后播放无需整首解码"""
+    if not MUSIC_CACHE.get("transcode_p3"):
+        return
+    get_audio_transcoder().submit_all(
+        os.path.join(MUSIC_CACHE["music_dir"], music_file)
+        for music_file in music_files
+        if not music_file.endswith(".p3")
+    )
+
+
 async def handle_music_command(conn, text):
-    initialize_music_handler(conn)
+    await initialize_music_handler(conn)
     global MUSIC_CACHE
 
     """处理音乐播放指令"""
@@ -156,14 +159,11 @@ async def handle_music_command(conn, text):
     if os.path.exists(MUSIC_CACHE["music_dir"]):
         if time.time() - MUSIC_CACHE["scan_time"] > MUSIC_CACHE["refresh_time"]:
             # 刷新音乐文件列表
-            MUSIC_CACHE["music_files"], MUSIC_CACHE["music_file_names"] = (
-                get_music_files(MUSIC_CACHE["music_dir"], MUSIC_CACHE["music_ext"])
-            )
-            MUSIC_CACHE["scan_time"] = time.time()
+            await asyncio.to_thread(_refresh_music_files)
 
         potential_song = _extract_song_name(clean_text)
         if potential_song:
-            best_match = _find_best_match(potential_song, MUSIC_CACHE["music_files"])
+            best_match = MUSIC_CACHE["music_index"].search(potential_song)
             if best_match:
                 conn.logger.bind(tag=TAG).info(f"找到最匹配的歌曲: {best_match}")
                 await play_local_music(conn, specific_file=best_match)
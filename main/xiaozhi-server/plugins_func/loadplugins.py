@@ -1,25 +1,68 @@
+import sys
 import importlib
 import pkgutil
+import threading
 from config.logger import setup_logging
 
 TAG = __name__
 
 logger = setup_logging()
 
-def auto_import_modules(package_name):
+# 已完成插件发现的包，避免每个连接重复扫描包目录
+_loaded_packages = set()
+_load_lock = threading.Lock()
+
+
+def auto_import_modules(package_name, force=False):
     """
     自动导入指定包内的所有模块。
 
+    同一个包只会在进程内扫描一次，后续调用直接返回；
+    如需重新加载插件，请使用 reload_plugins。
+
     Args:
         package_name (str): 包的名称，如 'functions'。
+        force (bool): 是否忽略已加载标记，重新扫描包目录。
+    """
+    if not force and package_name in _loaded_packages:
+        return
+
+    with _load_lock:
+        if not force and package_name in _loaded_packages:
+            return
+
+        # 获取包的路径
+        package = importlib.import_module(package_name)
+        package_path = package.__path__
+
+        # 遍历包内的所有模块
+        for _, module_name, _ in pkgutil.iter_modules(package_path):
+            # 导入模块
+            full_module_name = f"{package_name}.{module_name}"
+            importlib.import_module(full_module_name)
+            #logger.bind(tag=TAG).info(f"模块 '{full_module_name}' 已加载")
+
+        _loaded_packages.add(package_name)
+
+
+def reload_plugins(package_name="plugins_func.functions"):
+    """
+    重新加载指定包内的所有插件模块，插件通过装饰器重新注册到全局函数注册表。
+
+    Args:
+        package_name (str): 包的名称，如 'plugins_func.functions'。
     """
-    # 获取包的路径
-    package = importlib.import_module(package_name)
-    package_path = package.__path__
-
-    # 遍历包内的所有模块
-    for _, module_name, _ in pkgutil.iter_modules(package_path):
-        # 导入模块
-        full_module_name = f"{package_name}.{module_name}"
-        importlib.import_module(full_module_name)
-        #logger.bind(tag=TAG).info(f"模块 '{full_module_name}' 已加载")
\ No newline at end of file
+    with _load_lock:
+        package = importlib.import_module(package_name)
+        for _, module_name, _ in pkgutil.iter_modules(package.__path__):
+            full_module_name = f"{package_name}.{module_name}"
+            try:
+                module = sys.modules.get(full_module_name)
+                if module is None:
+                    importlib.import_module(full_module_name)
+                else:
+                    importlib.reload(module)
+            except Exception as e:
+                logger.bind(tag=TAG).error(f"模块 '{full_module_name}' 重新加载失败: {e}")
+        _loaded_packages.add(package_name)
+    logger.bind(tag=TAG).info(f"插件包 '{package_name}' 已重新加载")
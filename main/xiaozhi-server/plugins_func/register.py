@@ -42,11 +42,15 @@ class ActionResponse:
 
 
 class FunctionItem:
-    def __init__(self, name, description, func, type):
+    def __init__(
+        self, name, description, func, type, timeout=None, max_concurrency=None
+    ):
         self.name = name
         self.description = description
         self.func = func
         self.type = type
+        self.timeout = timeout  # 执行超时时间（秒），None表示使用默认值
+        self.max_concurrency = max_concurrency  # 最大并发数，None表示使用默认值
 
 
 class DeviceTypeRegistry:
@@ -77,13 +81,28 @@ class DeviceTypeRegistry:
 
 # 初始化函数注册字典
 all_function_registry = {}
+# 注册表版本号，每次注册函数时递增，用于各连接判断缓存的工具定义是否过期
+_registry_version = 0
 
 
-def register_function(name, desc, type=None):
-    """注册函数到函数注册字典的装饰器"""
+def get_registry_version():
+    """获取全局函数注册表的版本号"""
+    return _registry_version
+
+
+def register_function(name, desc, type=None, timeout=None, max_concurrency=None):
+    """注册函数到函数注册字典的装饰器
+
+    被装饰的函数可以是普通函数，也可以是async函数；
+    普通函数会在插件线程池中执行，async函数直接在事件循环中执行。
+    """
 
     def decorator(func):
-        all_function_registry[name] = FunctionItem(name, desc, func, type)
+        global _registry_version
+        all_function_registry[name] = FunctionItem(
+            name, desc, func, type, timeout, max_concurrency
+        )
+        _registry_version += 1
         logger.bind(tag=TAG).debug(f"函数 '{name}' 已加载，可以注册使用")
         return func
 